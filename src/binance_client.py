@@ -1,6 +1,8 @@
 from binance import AsyncClient
 from binance.enums import *
 import math
+import asyncio
+from rest_scheduler import RestScheduler, PRIORITY_ORDER, PRIORITY_BALANCE, PRIORITY_METRICS
 
 class BinanceExecutionEngine:
     def __init__(self, api_key, api_secret, testnet=False):
@@ -8,12 +10,14 @@ class BinanceExecutionEngine:
         self.api_secret = api_secret
         self.testnet = testnet
         self.client = None
+        self.rest = None  # Ağırlık bilinçli REST kuyruğu (connect'te kurulur)
         self.symbol_info = {} 
 
     async def connect(self):
         try:
             self.client = await AsyncClient.create(self.api_key, self.api_secret, testnet=self.testnet)
-            info = await self.client.futures_exchange_info()
+            self.rest = RestScheduler(self.client)
+            info = await self.rest.call("futures_exchange_info", priority=PRIORITY_METRICS)
             for s in info['symbols']:
                 filters = {f['filterType']: f for f in s['filters']}
                 try:
@@ -66,8 +70,8 @@ class BinanceExecutionEngine:
         
         try:
             # 1. Kaldıraç ve Fiyat
-            await self.client.futures_change_leverage(symbol=sym, leverage=leverage)
-            ticker = await self.client.futures_symbol_ticker(symbol=sym)
+            await self.rest.call("futures_change_leverage", priority=PRIORITY_ORDER, symbol=sym, leverage=leverage)
+            ticker = await self.rest.call("futures_symbol_ticker", priority=PRIORITY_ORDER, symbol=sym)
             current_market_price = float(ticker['price'])
             
             # 2. Temel Miktar Hesapla
@@ -101,7 +105,8 @@ class BinanceExecutionEngine:
 
             # 3. İşlemi Aç
             side_enum = SIDE_BUY if side == 'LONG' else SIDE_SELL
-            order = await self.client.futures_create_order(
+            order = await self.rest.call(
+                "futures_create_order", priority=PRIORITY_ORDER,
                 symbol=sym, side=side_enum, type=ORDER_TYPE_MARKET, quantity=qty
             )
             
@@ -149,7 +154,8 @@ class BinanceExecutionEngine:
             # --- STOP LOSS EMRI (STOP_MARKET) ---
             # closePosition=True dediğimiz için miktar (quantity) göndermiyoruz.
             # workingType='MARK_PRICE' iğnelerden korur.
-            await self.client.futures_create_algo_order(
+            await self.rest.call(
+                "futures_create_algo_order", priority=PRIORITY_ORDER,
                 symbol=symbol, 
                 side=close_side, 
                 type='STOP_MARKET', 
@@ -161,7 +167,8 @@ class BinanceExecutionEngine:
             
             # --- TAKE PROFIT EMRI (ALGO ENDPOINT) ---
             # DÜZELTME: stopPrice -> triggerPrice
-            await self.client.futures_create_algo_order(
+            await self.rest.call(
+                "futures_create_algo_order", priority=PRIORITY_ORDER,
                 symbol=symbol, 
                 side=close_side, 
                 type='TAKE_PROFIT_MARKET', 
@@ -185,24 +192,38 @@ class BinanceExecutionEngine:
         if not self.client: return
         sym = symbol.upper()
         try:
-            await self.client.futures_cancel_all_open_orders(symbol=sym)
-            positions = await self.client.futures_position_information(symbol=sym)
+            await self.rest.call("futures_cancel_all_open_orders", priority=PRIORITY_ORDER, symbol=sym)
+            positions = await self.rest.call("futures_position_information", priority=PRIORITY_ORDER, symbol=sym)
             for p in positions:
                 amt = float(p['positionAmt'])
                 if amt != 0:
                     side = SIDE_SELL if amt > 0 else SIDE_BUY
-                    await self.client.futures_create_order(symbol=sym, side=side, type=ORDER_TYPE_MARKET, quantity=abs(amt))
+                    await self.rest.call("futures_create_order", priority=PRIORITY_ORDER, symbol=sym, side=side, type=ORDER_TYPE_MARKET, quantity=abs(amt))
                     print(f"🚨 [API] {sym} Pozisyon Kapatıldı.")
         except Exception as e: print(f"❌ [KAPATMA HATA] {e}")
 
+    @staticmethod
+    def _parse_klines(klines):
+        # (open_time_sec, open, high, low, close, quote_volume)
+        return [
+            (int(k[0]) / 1000, float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[7]))
+            for k in klines
+        ]
+
     async def fetch_missing_data(self, symbol):
-        if not self.client: return None, 0.0
+        """
+        Bayat sembol için OHLCV backfill.
+        Dönüş: (1m mumlar [son 4 saat, 5m/15m barları besler], 1h mumlar [24h değişim/hacim])
+        """
+        if not self.client: return None, None
         try:
-            klines = await self.client.futures_klines(symbol=symbol.upper(), interval=KLINE_INTERVAL_1MINUTE, limit=60)
-            data = [(float(k[4]), int(k[0])/1000) for k in klines]
-            ticker = await self.client.futures_ticker(symbol=symbol.upper())
-            return data, float(ticker['priceChangePercent'])
-        except: return None, 0.0
+            # İki istek paralel: Haber yolundaki backfill tek round-trip bekler
+            klines, hourly = await asyncio.gather(
+                self.rest.call("futures_klines", symbol=symbol.upper(), interval=KLINE_INTERVAL_1MINUTE, limit=240),
+                self.rest.call("futures_klines", symbol=symbol.upper(), interval=KLINE_INTERVAL_1HOUR, limit=24),
+            )
+            return self._parse_klines(klines), self._parse_klines(hourly)
+        except: return None, None
     
     async def get_usdt_balance(self):
         """
@@ -215,7 +236,7 @@ class BinanceExecutionEngine:
             
         try:
             # Futures hesabındaki tüm varlıkları çek
-            balances = await self.client.futures_account_balance()
+            balances = await self.rest.call("futures_account_balance", priority=PRIORITY_BALANCE)
             
             for asset in balances:
                 if asset['asset'] == 'USDT':
@@ -235,17 +256,19 @@ class BinanceExecutionEngine:
             print(f"❌ [BAKİYE HATASI] {e}")
             return 0.0, 0.0
 
-    async def get_extended_metrics(self, symbol):
+    async def get_extended_metrics(self, symbol, volume_usdt=None):
         """
         Gelişmiş analiz için 24h Hacim ve Fonlama Oranını çeker.
+        volume_usdt: Hafızadaki 1h barlardan hesaplanmışsa ticker çağrısı yapılmaz.
         """
         if not self.client: return "Unknown", 0.0
 
         try:
             # 1. 24 Saatlik Veriler (Hacim için)
             # quoteVolume = USDT cinsinden hacim
-            ticker_stats = await self.client.futures_ticker(symbol=symbol.upper())
-            volume_usdt = float(ticker_stats.get('quoteVolume', 0))
+            if volume_usdt is None:
+                ticker_stats = await self.rest.call("futures_ticker", symbol=symbol.upper())
+                volume_usdt = float(ticker_stats.get('quoteVolume', 0))
             
             # Formatla (Milyar/Milyon)
             if volume_usdt > 1_000_000_000:
@@ -255,7 +278,7 @@ class BinanceExecutionEngine:
 
             # 2. Fonlama Oranı (Funding Rate)
             # premiumIndex endpoint'i anlık fonlamayı verir
-            premium_index = await self.client.futures_mark_price(symbol=symbol.upper())
+            premium_index = await self.rest.call("futures_mark_price", symbol=symbol.upper())
             funding_rate = float(premium_index.get('lastFundingRate', 0)) * 100 # Yüzdeye çevir
             
             return vol_str, funding_rate
@@ -272,7 +295,7 @@ class BinanceExecutionEngine:
         
         try:
             # DÜZELTME: futures_depth Yerine futures_order_book kullanıyoruz
-            depth = await self.client.futures_order_book(symbol=symbol.upper(), limit=limit)
+            depth = await self.rest.call("futures_order_book", symbol=symbol.upper(), limit=limit)
             
             total_bids = sum([float(x[1]) for x in depth['bids']])
             total_asks = sum([float(x[1]) for x in depth['asks']])
@@ -17,14 +17,18 @@ from config import (
     LLM_CONFIG
 )
 from utils import search_web_sync, coin_categories
+from llm_cache import LLMCache
 
 class AgentBrain:
-    def __init__(self, use_groqcloud=True, api_key=None, groqcloud_model="google/gemini-2.0-flash-exp:free", use_gemini = False, google_api_key = None, gemini_model = "gemma-3-27b-it"):
+    def __init__(self, use_groqcloud=True, api_key=None, groqcloud_model="google/gemini-2.0-flash-exp:free", use_gemini = False, google_api_key = None, gemini_model = "gemma-3-27b-it", cache=None):
         self.use_groqcloud = use_groqcloud
         self.model = groqcloud_model
         self.ollama_model = "LlamaTrader"  # Fallback
         self.api_key = api_key
         self.coin_cache = {} # Cache
+        self.llm_cache = cache if cache is not None else LLMCache() # Response cache (RAM LRU + disk)
+        self._inflight = {} # Single-flight: key -> shared future of the running call
+        self.coalesced = 0
         self.last_request_time = 0
         # 60s for 1 request per minute limit. 62s for safety.
         self.MIN_REQUEST_INTERVAL = 0
@@ -106,9 +110,92 @@ class AgentBrain:
         except Exception:
             return text.strip()
 
-    async def _submit_to_llm(self, prompt, temperature=0.1, json_mode=True, max_tokens=1024, use_system_prompt=True, reasoning_mode="none", compound_custom=None):
+    def _model_name(self, compound_custom=None):
+        """Model that will actually answer (same branch order as _request_llm)."""
+        if self.use_groqcloud:
+            return self.gemini_model if compound_custom else self.model
+        if self.use_gemini:
+            return self.gemini_model
+        return self.ollama_model
+
+    async def _single_flight(self, key, factory):
+        """
+        Coalesces concurrent identical calls: the first caller starts factory(), later callers
+        with the same key await that same future instead of sending another request.
+        Shielded: a cancelled caller does not cancel the shared request for the others.
+        """
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(factory())
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda f: self._flight_done(key, f))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(fut)
+
+    def _flight_done(self, key, fut):
+        self._inflight.pop(key, None)
+        # If every caller was cancelled nobody reads the error -> mark it retrieved
+        if not fut.cancelled():
+            fut.exception()
+
+    async def _submit_to_llm(self, prompt, temperature=0.1, json_mode=True, max_tokens=1024, use_system_prompt=True, reasoning_mode="none", compound_custom=None, cache_kind=None, rate_limited=False):
         """
         Central LLM Call Function
+        cache_kind: Call type for the response cache (TTL from LLM_CACHE_TTL_SEC). None -> no caching.
+        Identical calls with a cache_kind that are in flight at the same time share one request.
+        rate_limited: Wait for the request interval first (only when a request is actually sent, not on cache hits).
+        """
+        async def send():
+            if rate_limited:
+                await self._wait_for_rate_limit()
+            response = await self._request_llm(prompt, temperature, json_mode, max_tokens, use_system_prompt, reasoning_mode, compound_custom)
+            if rate_limited:
+                self.last_request_time = time.time()
+            return response
+
+        if not cache_kind:
+            return await send()
+
+        key = LLMCache.make_key(
+            self._model_name(compound_custom), prompt, temperature, json_mode,
+            LLM_CONFIG['system_prompt'] if use_system_prompt else None,
+            max_tokens, reasoning_mode, compound_custom,
+        )
+        if self.llm_cache is not None:
+            cached = await self.llm_cache.aget(key)
+            if cached is not None:
+                return cached
+
+        async def request():
+            response = await send()
+            if self.llm_cache is not None and self._is_cacheable(cache_kind, response, json_mode):
+                self.llm_cache.put(cache_kind, key, response)
+            return response
+
+        return await self._single_flight(("llm", key), request)
+
+    @staticmethod
+    def _is_cacheable(kind, response, json_mode):
+        """
+        Only valid responses are cached: failed (None) or empty calls, JSON that does not parse,
+        and decisions without an action would otherwise be replayed until the TTL expires.
+        """
+        if not isinstance(response, str) or not response.strip():
+            return False
+        if not json_mode:
+            return True
+        try:
+            parsed = json.loads(response)
+        except ValueError:
+            return False
+        if not isinstance(parsed, dict):
+            return False
+        return kind not in ("analyze", "backtest") or "action" in parsed
+
+    async def _request_llm(self, prompt, temperature=0.1, json_mode=True, max_tokens=1024, use_system_prompt=True, reasoning_mode="none", compound_custom=None):
+        """
+        Sends the prompt to the active backend (429 retries included).
         """
         retries = 0
         max_retries = 3
@@ -201,14 +288,15 @@ class AgentBrain:
                         print(f"❌ [ERROR] LLM Request Failed: {e}")
                         return None
 
-    async def analyze_specific(self, news, symbol, price, changes, search_context="", coin_full_name="Unknown", market_cap_str="", rsi_val=0, btc_trend=0, volume_24h="", funding_rate=0):
-        # 1. Profile Info
-        await self._wait_for_rate_limit()
-        coin_category = await self.get_coin_profile(symbol)
+    async def analyze_specific(self, news, symbol, price, changes, search_context="", coin_full_name="Unknown", market_cap_str="", rsi_val=0, btc_trend=0, volume_24h="", funding_rate=0, technicals=None, coin_category=None):
+        # 1. Profile Info (Caller may have fetched it in parallel)
+        if coin_category is None:
+            coin_category = await self.get_coin_profile(symbol)
         current_time_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
         print(f"🐛 [DEBUG] {symbol} Category: '{coin_category}'")
         print(f"🐛 [DEBUG] Price: {price}, Changes: {changes}")
 
+        technicals = technicals or {}
         prompt = ANALYZE_SPECIFIC_PROMPT.format(
             symbol=symbol.upper(),
             coin_full_name=coin_full_name,
@@ -224,11 +312,14 @@ class AgentBrain:
             change_10m=changes['10m'],
             change_1h=changes['1h'],
             change_24h=changes['24h'],
+            atr_5m=technicals.get("atr_5m", 0.0),
+            volatility_1h=technicals.get("volatility_1h", 0.0),
+            volume_spike=technicals.get("volume_spike", 0.0),
             news=news,
             search_context=search_context
         )
 
-        response_text = await self._submit_to_llm(prompt, temperature=0.1, json_mode=True, max_tokens=2048, use_system_prompt=True, reasoning_mode="default")
+        response_text = await self._submit_to_llm(prompt, temperature=0.1, json_mode=True, max_tokens=2048, use_system_prompt=True, reasoning_mode="default", cache_kind="analyze", rate_limited=True)
         
         try:
             return json.loads(response_text)
@@ -242,7 +333,7 @@ class AgentBrain:
                 "enabled_tools":["web_search","code_interpreter","visit_website"]
             }
         }
-        response_text = await self._submit_to_llm(prompt, temperature=0.0, json_mode=True, use_system_prompt=False, compound_custom=compound_custom)
+        response_text = await self._submit_to_llm(prompt, temperature=0.0, json_mode=True, use_system_prompt=False, compound_custom=compound_custom, cache_kind="detect_symbol")
         
         try:
             res_json = json.loads(response_text)
@@ -258,7 +349,7 @@ class AgentBrain:
         )
         
         # Higher temperature
-        response_text = await self._submit_to_llm(prompt, temperature=0.7, json_mode=False, max_tokens=64, use_system_prompt=False, reasoning_mode="none")
+        response_text = await self._submit_to_llm(prompt, temperature=0.7, json_mode=False, max_tokens=64, use_system_prompt=False, reasoning_mode="none", cache_kind="search_query")
         return response_text.strip()
 
     async def get_coin_profile(self, symbol):
@@ -272,7 +363,10 @@ class AgentBrain:
         if sym in self.coin_cache:
             return self.coin_cache[sym]
 
-        # 3. INTERNET SEARCH & LLM
+        # 3. INTERNET SEARCH & LLM (One research per symbol even if several pairs ask at once)
+        return await self._single_flight(("profile", sym), lambda: self._research_coin_profile(sym, symbol))
+
+    async def _research_coin_profile(self, sym, symbol):
         print(f"🔍 [BRAIN] {sym} unknown, researching...")
         query = f"what is {sym} crypto category sector utility"
         
@@ -285,7 +379,7 @@ class AgentBrain:
             )
             
             # JSON mode off
-            category = await self._submit_to_llm(profile_prompt, temperature=0.0, json_mode=False, max_tokens=256, use_system_prompt=False)
+            category = await self._submit_to_llm(profile_prompt, temperature=0.0, json_mode=False, max_tokens=256, use_system_prompt=False, cache_kind="coin_profile")
             category = category.strip()
             
             # Cache
@@ -297,16 +391,19 @@ class AgentBrain:
             print(f"Profile Error: {e}")
             return "Unknown"
 
-    async def analyze_specific_no_research(self, news, symbol, price, changes, coin_full_name="Unknown", market_cap_str="", rsi_val=0, btc_trend=0, volume_24h="", funding_rate=0):
-        """İnternet araştırması yapmadan, sadece teknik verilerle karar verir."""
-        await self._wait_for_rate_limit()
+    async def analyze_specific_no_research(self, news, symbol, price, changes, coin_full_name="Unknown", market_cap_str="", rsi_val=0, btc_trend=0, volume_24h="", funding_rate=0, technicals=None, current_time=None):
+        """
+        İnternet araştırması yapmadan, sadece teknik verilerle karar verir.
+        current_time: Haberin zamanı (Backtest). Verilirse prompt deterministik -> Tekrar koşumlar önbellekten gelir.
+        """
         # Kategori bilgisini cache'den veya statik listeden çek (Araştırma yapma!)
         sym_clean = symbol.upper().replace('USDT', '')
         coin_category = coin_categories.get(sym_clean, "Unknown")
         
-        current_time_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+        current_time_str = (current_time or datetime.now(timezone.utc)).astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
 
         # Prompt'u research_context olmadan dolduruyoruz
+        technicals = technicals or {}
         prompt = ANALYZE_SPECIFIC_PROMPT.format(
             symbol=symbol.upper(),
             coin_full_name=coin_full_name,
@@ -322,6 +419,9 @@ class AgentBrain:
             change_10m=changes['10m'],
             change_1h=changes['1h'],
             change_24h=changes['24h'],
+            atr_5m=technicals.get("atr_5m", 0.0),
+            volatility_1h=technicals.get("volatility_1h", 0.0),
+            volume_spike=technicals.get("volume_spike", 0.0),
             news=news,
             search_context="RESEARCH DISABLED FOR BACKTESTING. DECIDE BASED ON NEWS AND TECH DATA ONLY."
         )
@@ -331,8 +431,7 @@ class AgentBrain:
                 "enabled_tools":["web_search","code_interpreter","visit_website"]
             }
         }
-        response_text = await self._submit_to_llm(prompt, temperature=0.1, json_mode=True, max_tokens=1024, compound_custom = compound_custom)
-        self.last_request_time = time.time()
+        response_text = await self._submit_to_llm(prompt, temperature=0.1, json_mode=True, max_tokens=1024, compound_custom = compound_custom, cache_kind="backtest", rate_limited=True)
         
         try:
             return json.loads(response_text)
@@ -26,6 +26,17 @@ LLM_CONFIG = {
     "max_tokens": 256,
 }
 
+# --- LLM Response Cache ---
+LLM_CACHE_TTL_SEC = {              # Çağrı türüne göre önbellek süresi (Olmayan tür önbelleğe alınmaz)
+    "analyze": 120,                # Prompt fiyat ve dakikayı içerir -> Sadece aynı anın tekrarları
+    "backtest": 30 * 24 * 3600,    # Geçmiş haber kararları (Tekrar koşumlar LLM'e gitmez)
+    "detect_symbol": 24 * 3600,
+    "search_query": 3600,
+    "coin_profile": 7 * 24 * 3600,
+}
+LLM_CACHE_MAX_ENTRIES = 2048       # RAM katmanı (LRU)
+LLM_CACHE_PATH = "llm_cache.sqlite"  # Disk katmanı (None: Sadece RAM)
+
 # --- Exchange Configuration ---
 USE_MAINNET = True
 REAL_TRADING_ENABLED = False
@@ -41,6 +52,41 @@ else:
 
 BASE_URL = os.getenv('BASE_URL', "wss://stream.binance.com:9443/ws")
 WEBSOCKET_URL = BASE_URL
+# Combined stream ({"stream": ..., "data": ...}) -> Tek bağlantıda çoklu abonelik
+COMBINED_STREAM_URL = os.getenv('COMBINED_STREAM_URL', BASE_URL.rsplit('/ws', 1)[0] + '/stream')
+
+# --- Websocket Stream Limits ---
+WS_MAX_STREAMS_PER_CONN = 200     # Bağlantı başına stream (Dolunca yeni bağlantı açılır)
+WS_MAX_PARAMS_PER_MESSAGE = 50    # Tek SUBSCRIBE mesajındaki stream sayısı
+WS_MAX_MESSAGES_PER_SEC = 5       # Borsaya gönderilen kontrol mesajı limiti
+WS_STREAM_ALL_TARGETS = True      # Takip edilen tüm pariteleri sürekli dinle
+INGEST_MAX_PENDING_SYMBOLS = 2048  # Ingest tamponunda bekleyebilecek sembol sayısı (Aşılırsa drop)
+
+# --- REST Rate Limits (Binance Futures IP ağırlığı) ---
+REST_WEIGHT_LIMIT_1M = 2400        # Dakikalık ağırlık limiti
+REST_WEIGHT_SAFETY = 0.9           # Limitin bu oranına kadar kullanılır (Diğer süreçler için pay)
+REST_BULK_WEIGHT_SHARE = 0.7       # Toplu geçmiş indirme (HISTORY) dakikalık bütçenin en fazla bu kadarını kullanır
+REST_MAX_CONCURRENCY = 10          # Aynı anda uçuşta olabilecek istek (Emirler hariç)
+
+# --- News Pipeline (detect -> enrich -> decide -> execute) ---
+NEWS_STAGE_WORKERS = {             # Aşama başına eşzamanlı worker
+    "detect": 2,
+    "enrich": 4,                   # REST + web araştırması
+    "decide": 2,                   # LLM çağrısı
+    "execute": 1,                  # Emirler sırayla (Bakiye bazlı pozisyon büyüklüğü)
+}
+NEWS_STAGE_BUDGET_SEC = {          # Aşama başına süre bütçesi (Aşılırsa iş iptal, sebep kaydedilir)
+    "detect": 15,
+    "enrich": 20,
+    "decide": 45,                  # LLM + 429 tekrarları
+    "execute": None,               # Gönderilmiş emir yarıda kesilmez (Yaş kontrolü emirden önce)
+}
+NEWS_OPTIONAL_BUDGET_SEC = 8       # Web araştırması/coin profili en fazla bu kadar beklenir, sonra atlanır
+NEWS_TRADE_MAX_AGE_SEC = 90        # Haberden bu kadar sonra emir gönderilmez (Fiyat çoktan tepki verdi)
+NEWS_QUEUE_MAX = 256               # Aşama kuyruğu sınırı (Dolunca en düşük öncelikli atılır)
+NEWS_MAX_AGE_SEC = 120             # Bundan eski haber hiçbir aşamada işlenmez
+NEWS_HELD_PRIORITY_SEC = 60        # Açık pozisyonu olan paritenin öncelik bonusu (sn "tazelik")
+NEWS_CAP_PRIORITY_SEC = 30         # Büyük market cap öncelik bonusu (1T cap'te tam)
 
 # --- Target Configuration ---
 TARGET_CHANNELS = ['cointelegraph', 'wublockchainenglish', 'CryptoRankNews', 'TheBlockNewsLite', 'coindesk', 'arkhamintelligence', 'glassnode'] 
@@ -63,6 +109,10 @@ STARTING_BALANCE = 1000
 LEVERAGE = 10 
 FIXED_TRADE_AMOUNT = 8
 
+# --- Database Configuration ---
+DECISION_RETENTION_DAYS = 30   # Bundan eski kararlar/işlemler arşive taşınır
+RETENTION_INTERVAL_SEC = 3600  # Retention görevinin çalışma aralığı
+
 # --- Filter Constants ---
 IGNORE_KEYWORDS = [
     'daily', 'digest', 'recap', 'summary', 'analysis', 'price analysis', 
@@ -3,6 +3,9 @@ import asyncio
 import time
 import config  # Panic button için gerekli
 from services import update_system_balance
+from stream_manager import StreamManager
+
+REPORT_PAGE_SIZE = 100
 
 
 # --- YARDIMCI FONKSİYONLAR ---
@@ -87,12 +90,7 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                 ctx.log_ui(log_msg, color)
                 if config.REAL_TRADING_ENABLED:
                     await ctx.real_exchange.close_position_market(symbol)
-                unsubscribe_msg = {
-                    "method": "UNSUBSCRIBE",
-                    "params": [f"{symbol.lower()}@kline_1m"],
-                    "id": int(time.time()),
-                }
-                await ctx.stream_command_queue.put(unsubscribe_msg)
+                ctx.streams.unsubscribe([StreamManager.kline_stream(symbol)], owner="positions")
                 asyncio.create_task(update_system_balance(ctx, last_pnl=pnl))
             except Exception as e:
                 ctx.log_ui(f"⚠️ Kapatma Hatası ({symbol}): {e}", "error")
@@ -193,9 +191,15 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                     "text-lg font-bold text-white"
                 )
 
-                # Raporu Yenileme Butonu
-                async def refresh_report():
-                    full_story = ctx.memory.get_full_trade_story()
+                # Raporu Yenileme Butonu (Sayfalı: Her basışta REPORT_PAGE_SIZE satır)
+                report_state = {"offset": 0}
+
+                async def refresh_report(load_more=False):
+                    offset = report_state["offset"] if load_more else 0
+                    full_story = await ctx.memory.get_full_trade_story(
+                        offset=offset, limit=REPORT_PAGE_SIZE
+                    )
+                    report_state["offset"] = offset + len(full_story)
                     
                     # ROI ve Diğer Hesaplamaları Tabloya Gitmeden Önce Yapalım
                     for row in full_story:
@@ -217,13 +221,20 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                         row['exit_price'] = f"{exit:.4f}" if exit else "-"
                         row['peak_price'] = f"{peak:.4f}" if peak else "-"
                     
-                    report_table.rows = full_story
+                    report_table.rows = (report_table.rows + full_story) if load_more else full_story
                     report_table.update()
                     ui.notify("Strateji Raporu Güncellendi.", type="info")
 
-                ui.button(
-                    "RAPORU YENİLE", icon="refresh", on_click=refresh_report
-                ).props("outline size=sm")
+                async def load_more_report():
+                    await refresh_report(load_more=True)
+
+                with ui.row().classes("gap-2"):
+                    ui.button(
+                        "DAHA FAZLA", icon="expand_more", on_click=load_more_report
+                    ).props("outline size=sm")
+                    ui.button(
+                        "RAPORU YENİLE", icon="refresh", on_click=refresh_report
+                    ).props("outline size=sm")
 
             # Tablo Yapısı
             columns = [
@@ -265,6 +276,8 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
             ui.label("📡 CANLI PİYASA VERİLERİ (MEMORY)").classes(
                 "text-lg font-bold mb-4 text-white"
             )
+            ingest_label = ui.label("").classes("text-xs font-mono text-gray-500 mb-2")
+            news_label = ui.label("").classes("text-xs font-mono text-gray-500 mb-2")
             market_grid = ui.grid(columns=5).classes("w-full gap-3")
 
         # --- TAB 5: İŞLEM GEÇMİŞİ ---
@@ -383,17 +396,31 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                         ui.label(d.get('news_snippet', 'N/A')).classes('col-span-3 text-gray-500 truncate italic').tooltip(d.get('news_snippet'))
 
             # 4. MARKET
+            ing = ctx.ingest.stats()
+            ingest_label.set_text(
+                f"INGEST  kuyruk: {ing['depth']} (max {ing['max_depth']}) | alınan: {ing['received']} | "
+                f"uygulanan: {ing['applied']} | birleştirilen: {ing['coalesced']} | düşürülen: {ing['dropped']}"
+            )
+            if getattr(ctx, "news", None) is not None:
+                nw = ctx.news.stats()
+                depth = " ".join(f"{k}:{v}/{nw['busy'][k]}" for k, v in nw["depth"].items())
+                stage_p50 = " ".join(f"{k}:{v:.1f}s" for k, v in nw["stage_p50"].items())
+                last = nw["last_abort"]
+                news_label.set_text(
+                    f"HABER  kuyruk/çalışan: {depth} | alınan: {nw['received']} | iptal: {nw['aborted']} | "
+                    f"taşan: {nw['dropped']} | hata: {nw['failed']} | aşama p50: {stage_p50} | "
+                    f"karar süresi p50/max: {nw['latency_p50']:.1f}s/{nw['latency_max']:.1f}s"
+                    + (f" | son iptal: {last[1]} {last[2]} - {last[3]}" if last else "")
+                )
             market_grid.clear()
             with market_grid:
-                active_coins = {
-                    k: v for k, v in ctx.market_memory.items() if v.current_price > 0
-                }
+                # (sembol, fiyat, 1h değişim) -> Tek vektörel sorgu
+                active_coins = ctx.market_memory.snapshot(minutes=60)
                 if not active_coins:
                     ui.label("Veri toplanıyor...").classes(
                         "col-span-5 text-center text-gray-500"
                     )
-                for pair, buffer in active_coins.items():
-                    change_1h = buffer.get_change(60)
+                for pair, current_price, change_1h in active_coins:
                     bg_col = "bg-green-900/30" if change_1h >= 0 else "bg-red-900/30"
                     txt_col = "text-green-400" if change_1h >= 0 else "text-red-400"
                     with ui.card().classes(
@@ -402,7 +429,7 @@ def create_dashboard(ctx, on_manual_submit, existing_logs=None):
                         ui.label(pair.upper().replace("USDT", "")).classes(
                             "font-bold text-xs text-gray-300"
                         )
-                        ui.label(f"{buffer.current_price:.4f}").classes(
+                        ui.label(f"{current_price:.4f}").classes(
                             "font-mono text-sm text-white"
                         )
                         ui.label(f"%{change_1h:.2f}").classes(f"text-xs {txt_col}")
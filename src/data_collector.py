@@ -41,9 +41,10 @@ class TrainingDataCollector:
                 continue
 
             pair = event['pair']
-            if pair not in current_prices: continue # Fiyat yoksa geç
+            price_key = pair.lower() # MarketMemory anahtarları küçük harf
+            if price_key not in current_prices: continue # Fiyat yoksa geç
 
-            exit_price = current_prices[pair]
+            exit_price = current_prices[price_key]
             entry_price = event['entry_price']
             
             # Gerçekleşen Değişim (%)
@@ -1,12 +1,16 @@
 import asyncio
 import os
-import pandas as pd
+import glob
+import json
+import time
+import numpy as np
 import sys
 from binance import AsyncClient
-from datetime import datetime, timedelta, timezone
 
 # Kendi modüllerinden
 from utils import get_top_100_map, check_is_stablecoin
+from kline_store import KlineStore
+from rest_scheduler import RestScheduler, PRIORITY_HISTORY
 COIN_MAP = get_top_100_map()
 MANUAL_BINANCE_FUTURES_TICKERS = [
     # Ana Coinler
@@ -29,85 +33,143 @@ MANUAL_BINANCE_FUTURES_TICKERS = [
 ]
 BASE_DIR = "data/market_cache"
 KLINES_DIR = f"{BASE_DIR}/klines"
-FUNDING_DIR = f"{BASE_DIR}/funding"
 
-for d in [KLINES_DIR, FUNDING_DIR]:
+HISTORY_DAYS = 365
+PAGE_LIMIT = 1500            # futures_klines tek sayfa üst sınırı
+FUNDING_PAGE_LIMIT = 1000    # futures_funding_rate tek sayfa üst sınırı
+MINUTE_MS = 60_000
+MERGE_CHUNK_ROWS = 50_000    # Boşluk doldururken bu kadar satırda bir diske yaz
+STATE_FILE = "download_state.json"
+
+for d in [KLINES_DIR]:
     if not os.path.exists(d): os.makedirs(d)
 
-async def download_symbol_data(client, symbol):
-    """Bir coin için 1 yıllık kline ve funding verisini eksiksiz indirir."""
+def migrate_pickles(store):
+    """Eski {symbol}_1m.pkl dosyalarını kolonlu depoya aktarır (Depoda olmayanlar)."""
+    for file in glob.glob(f"{KLINES_DIR}/*_1m.pkl"):
+        symbol = os.path.basename(file).split("_")[0]
+        if symbol not in store:
+            rows = store.import_pickle(symbol, file)
+            print(f"📦 {symbol}: {rows} mum depoya aktarıldı.")
+
+# --- İNDİRME DURUMU (CHECKPOINT) ---
+# İlerlemenin kendisi depo kataloğunda (Her sayfadan sonra kaydedilir).
+# Bu dosya sadece borsada gerçekten verisi olmayan aralıkları tutar (Tekrar tekrar istenmesin).
+def load_state(store):
+    path = os.path.join(store.path, STATE_FILE)
+    if not os.path.exists(path): return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(store, state):
+    os.makedirs(store.path, exist_ok=True)
+    path = os.path.join(store.path, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+async def fetch_range(rest, symbol, start_ms, end_ms):
+    """
+    [start_ms, end_ms] aralığındaki KAPANMIŞ 1m mumları sayfa sayfa üretir (Bellekte tek sayfa).
+    Her sayfa: numpy dizisi [ts, o, h, l, c, quote_vol]
+    """
+    now_ms = int(time.time() * 1000)
+    while start_ms <= end_ms:
+        page = await rest.call(
+            "futures_klines", priority=PRIORITY_HISTORY,
+            symbol=symbol, interval="1m", startTime=start_ms, endTime=end_ms, limit=PAGE_LIMIT
+        )
+        if not page: return
+        # Açık (henüz kapanmamış) mum kaydedilmez, bir sonraki çalıştırmada tamamlanır
+        rows = [[int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[7])]
+                for k in page if int(k[6]) < now_ms]
+        if rows:
+            yield np.array(rows, dtype=np.float64)
+        if len(page) < PAGE_LIMIT: return
+        start_ms = int(page[-1][0]) + MINUTE_MS
+
+async def fetch_funding(rest, symbol, start_ms, end_ms):
+    """[start_ms, end_ms] aralığındaki funding kayıtlarını ileriye doğru sayfa sayfa üretir: (ts, rates)"""
+    while start_ms <= end_ms:
+        page = await rest.call(
+            "futures_funding_rate", priority=PRIORITY_HISTORY,
+            symbol=symbol, startTime=start_ms, endTime=end_ms, limit=FUNDING_PAGE_LIMIT
+        )
+        if not page: return
+        yield (np.array([int(f['fundingTime']) for f in page], dtype=np.int64),
+               np.array([float(f['fundingRate']) for f in page], dtype=np.float64))
+        if len(page) < FUNDING_PAGE_LIMIT: return
+        start_ms = int(page[-1]['fundingTime']) + 1
+
+def _columns(arr):
+    return arr[:, 0].astype(np.int64), arr[:, 1], arr[:, 2], arr[:, 3], arr[:, 4], arr[:, 5]
+
+async def download_symbol_data(rest, store, state, symbol):
+    """
+    Bir coin için 1 yıllık kline ve funding verisini artımlı indirir:
+    1) Depodaki son mumdan bugüne kadar eksik kısmı ekler (Yoksa 1 yıl öncesinden başlar)
+    2) Depodaki boşlukları (gap) tespit edip doldurur
+    3) Funding geçmişini son kayıttan itibaren tamamlar
+    Her sayfa geldiği anda diske yazılır; yarıda kalan çalışma kaldığı yerden devam eder.
+    """
     try:
         # 1. MUM VERİLERİ (1m Klines)
-        kline_path = f"{KLINES_DIR}/{symbol}_1m.pkl"
-        if not os.path.exists(kline_path):
-            klines = []
-            # HATA BURADAYDI: Generator'ı await etmemiz gerekiyor
-            gen = await client.futures_historical_klines_generator(symbol, "1m", "1 year ago UTC")
-            async for k in gen:
-                klines.append([int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[7])])
-            
-            if klines:
-                df_k = pd.DataFrame(klines, columns=['ts', 'o', 'h', 'l', 'c', 'v'])
-                df_k.to_pickle(kline_path)
-        
-        # 2. FUNDING RATE (Full Year Paging)
-        """
-        funding_path = f"{FUNDING_DIR}/{symbol}_funding.pkl"
-        if not os.path.exists(funding_path):
-            all_funding = []
-            # Bir yıl önceki zaman damgası
-            target_ts = int((datetime.now(timezone.utc) - timedelta(days=365)).timestamp() * 1000)
-            end_ts = int(datetime.now(timezone.utc).timestamp() * 1000)
-            
-            while True:
-                # Geriye doğru (endTime kullanarak) 1000'erli çekiyoruz
-                f_data = await client.futures_funding_rate(symbol=symbol, endTime=end_ts, limit=1000)
-                if not f_data: break
-                
-                for f in f_data:
-                    all_funding.append([int(f['fundingTime']), float(f['fundingRate'])])
-                
-                # En eski kaydın zamanını yeni 'end_ts' yapıyoruz (paging)
-                new_end_ts = int(f_data[0]['fundingTime']) - 1
-                if new_end_ts <= target_ts or new_end_ts == end_ts:
-                    break
-                end_ts = new_end_ts
-                await asyncio.sleep(0.1) # Rate limit koruması
-
-            if all_funding:
-                df_f = pd.DataFrame(all_funding, columns=['ts', 'rate']).sort_values('ts')
-                df_f.to_pickle(funding_path)
-                """
-        return True
+        now_ms = int(time.time() * 1000)
+        last = store.last_ts(symbol)
+        start_ms = last + MINUTE_MS if last is not None else now_ms - HISTORY_DAYS * 24 * 60 * MINUTE_MS
+        added = 0
+        async for arr in fetch_range(rest, symbol, start_ms, now_ms):
+            added += store.append(symbol, *_columns(arr))
+
+        # 1b. BOŞLUK DOLDURMA (Daha önce boş döndüğü bilinen aralıklar atlanır)
+        known_empty = {tuple(g) for g in state.get(symbol, {}).get("empty_gaps", [])}
+        for gap in store.gaps(symbol):
+            if gap in known_empty: continue
+            chunk, filled = [], 0
+            async for arr in fetch_range(rest, symbol, gap[0], gap[1]):
+                chunk.append(arr)
+                if sum(len(a) for a in chunk) >= MERGE_CHUNK_ROWS:
+                    filled += store.merge(symbol, *_columns(np.concatenate(chunk)))
+                    chunk = []
+            if chunk:
+                filled += store.merge(symbol, *_columns(np.concatenate(chunk)))
+            added += filled
+            if not filled:
+                # Borsada bu aralıkta veri yok (Bakım/delist): Bir daha sorma
+                state.setdefault(symbol, {}).setdefault("empty_gaps", []).append(list(gap))
+                save_state(store, state)
+
+        # 2. FUNDING RATE (Madenciler haber anındaki oranı depodan okur, ağ çağrısı yok)
+        last_f = store.funding_last_ts(symbol)
+        start_ms = last_f + 1 if last_f is not None else now_ms - HISTORY_DAYS * 24 * 60 * MINUTE_MS
+        async for ts, rates in fetch_funding(rest, symbol, start_ms, now_ms):
+            store.append_funding(symbol, ts, rates)
+        return added
     except Exception as e:
         print(f"\n💥 {symbol} Hatası: {e}")
-        return False
+        return 0
 
 async def main():
     client = await AsyncClient.create()
-    symbols = MANUAL_BINANCE_FUTURES_TICKERS
-    total_symbols = len(symbols)
-    print(f"🚀 {total_symbols} coin için 1 yıllık veri madenciliği başladı...")
-    for symbol in symbols:
-        kline_path = f"{KLINES_DIR}/{symbol}_1m.pkl"
-        if os.path.exists(kline_path):
-            symbols.remove(symbol)
+    store = KlineStore()
+    migrate_pickles(store)
+    state = load_state(store)
+    # Listede tekrar eden semboller bir kez indirilir
+    symbols = list(dict.fromkeys(MANUAL_BINANCE_FUTURES_TICKERS))
     total_symbols = len(symbols)
-    print(f"🚀 {total_symbols} coin için 1 yıllık veri madenciliği başladı...")    
+    print(f"🚀 {total_symbols} coin için veri güncellemesi başladı (Eksik aralıklar + boşluklar)...")
 
-    batch_size = 3 # Ban riskine karşı hızı kontrollü tutuyoruz
-    for i in range(0, total_symbols, batch_size):
-        batch = symbols[i : i + batch_size]
-        tasks = [download_symbol_data(client, s) for s in batch]
-        await asyncio.gather(*tasks)
+    # Eşzamanlılık ve hız REST kuyruğunda: Ağırlık bütçesinin izin verdiği kadar paralel
+    rest = RestScheduler(client)
+    tasks = [download_symbol_data(rest, store, state, s) for s in symbols]
+    added = 0
+    for progress, task in enumerate(asyncio.as_completed(tasks), 1):
+        added += await task
         
         # İlerleme Göstergesi
-        progress = min(i + batch_size, total_symbols)
         percent = (progress / total_symbols) * 100
-        sys.stdout.write(f"\r📦 İlerleme: %{percent:.2f} [{progress}/{total_symbols}]")
+        sys.stdout.write(f"\r📦 İlerleme: %{percent:.2f} [{progress}/{total_symbols}] | Yeni mum: {added} | Ağırlık: {rest.used}")
         sys.stdout.flush()
-        
-        await asyncio.sleep(0.5)
 
     await client.close_connection()
     print("\n🏁 Operasyon başarıyla tamamlandı. Veriler RAM'e yüklenmeye hazır!")
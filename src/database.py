@@ -1,21 +1,79 @@
 import sqlite3
 import time
+import os
+import gzip
 import json
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import re
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from news_index import NewsIndex
+from exchange import ClosedTrade
+
+DEDUP_WINDOW_SEC = 24 * 60 * 60
+WRITE_BATCH_SIZE = 256  # Tek commit'te yazılacak en fazla kayıt
+
+# Şema göçleri: (versiyon, SQL listesi). PRAGMA user_version hangisinin uygulandığını tutar.
+SCHEMA_MIGRATIONS = [
+    (1, [
+        # get_full_trade_story JOIN'i ve filtreleri için
+        'CREATE INDEX IF NOT EXISTS idx_trades_decision_id ON trades (decision_id, pnl, entry_price, exit_price, peak_price, reason)',
+        'CREATE INDEX IF NOT EXISTS idx_decisions_action ON decisions (action, id)',
+        'CREATE INDEX IF NOT EXISTS idx_decisions_symbol ON decisions (symbol, id)',
+        # Zaman aralığı sorguları ve retention için
+        'CREATE INDEX IF NOT EXISTS idx_decisions_created_at ON decisions (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_trades_created_at ON trades (created_at)',
+    ]),
+    (2, [
+        # created_at'ten önceki kayıtlar: Kararın zamanı, snippet'i (msg[:60] + "...") eşleşen haberden
+        'CREATE INDEX IF NOT EXISTS idx_news_prefix ON news (substr(content, 1, 60), timestamp)',
+        '''UPDATE decisions SET created_at = (
+               SELECT MAX(n.timestamp) FROM news n
+               WHERE substr(n.content, 1, 60) = substr(decisions.news_snippet, 1, length(decisions.news_snippet) - 3)
+           ) WHERE created_at IS NULL''',
+        'DROP INDEX IF EXISTS idx_news_prefix',
+        # Trade'in zamanı bağlı kararınkinden
+        '''UPDATE trades SET created_at = (
+               SELECT d.created_at FROM decisions d WHERE d.id = trades.decision_id
+           ) WHERE created_at IS NULL AND decision_id IS NOT NULL''',
+    ]),
+]
 
 class MemoryManager:
-    def __init__(self, db_path="nexus_db.sqlite"):
+    def __init__(self, db_path="nexus_db.sqlite", archive_dir="archive"):
         self.db_path = db_path
+        self.archive_dir = archive_dir
+
+        # Tek, uzun ömürlü bağlantı (WAL). Yazıcı thread ve okuyucular paylaşır, lock ile korunur.
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.lock = threading.Lock()
         self._init_db()
-        self.vectorizer = TfidfVectorizer(stop_words='english')
+
+        # Karar ID'leri bellekte dağıtılır, log_decision DB'yi beklemeden ID döner
+        self._next_decision_id = self._load_last_decision_id() + 1
+        self._id_lock = threading.Lock()
+
+        # Write-behind kuyruğu: Event loop INSERT/commit (fsync) beklemez
+        self.write_queue = queue.Queue()
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self.writer_thread.start()
+
+        # Okuyucu: Ayrı bağlantı + tek thread. Raporlar event loop'u ve yazıcıyı bekletmez (WAL)
+        self.reader_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-reader")
+        self.reader_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.reader_conn.row_factory = sqlite3.Row
+
+        # Haber tekrar kontrolü artık her seferinde TF-IDF fit etmiyor, kalıcı indeks kullanıyor
+        self.news_index = NewsIndex(window_sec=DEDUP_WINDOW_SEC)
+        self.rebuild_news_index()
 
     def _init_db(self):
         """Veritabanı tablolarını oluşturur."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.conn
         cursor = conn.cursor()
-        
+
         # 1. TABLO: HABERLER (Eskisi gibi)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS news (
@@ -50,7 +108,7 @@ class MemoryManager:
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS trades (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                decision_id INTEGER, 
+                decision_id INTEGER,
                 timestamp TEXT,
                 symbol TEXT,
                 side TEXT,
@@ -62,119 +120,328 @@ class MemoryManager:
                 FOREIGN KEY(decision_id) REFERENCES decisions(id)
             )
         ''')
-        
+
+        # Zaman aralığı sorguları için epoch kolonları (timestamp TEXT sadece saat tutuyor)
+        self._ensure_column('decisions', 'created_at', 'REAL')
+        self._ensure_column('trades', 'created_at', 'REAL')
+
         conn.commit()
-        conn.close()
+        self._migrate_db()
 
-    # --- ESKİ HABER FONKSİYONLARI (Aynen Korundu) ---
-    def clean_text(self, text):
-        text = text.lower()
-        text = re.sub(r'http\S+', '', text)
-        text = re.sub(r'[^\w\s]', '', text)
-        return text
+    def _ensure_column(self, table, column, col_type):
+        cursor = self.conn.cursor()
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {col_type}')
 
-    def is_duplicate(self, new_text, threshold=0.75):
-        clean_new = self.clean_text(new_text)
-        if not clean_new.strip(): return True, 1.0
+    def _migrate_db(self):
+        """Eksik şema göçlerini sırayla uygular."""
+        cursor = self.conn.cursor()
+        current = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for version, statements in SCHEMA_MIGRATIONS:
+            if version <= current: continue
+            for sql in statements:
+                cursor.execute(sql)
+            cursor.execute(f'PRAGMA user_version = {version}')
+            self.conn.commit()
+            print(f"🧱 DB Şeması Güncellendi: v{version}")
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        limit_time = time.time() - (24 * 60 * 60)
-        cursor.execute('SELECT content FROM news WHERE timestamp > ? ORDER BY id DESC LIMIT 100', (limit_time,))
-        rows = cursor.fetchall()
-        conn.close()
+        # Retention sonrası boşalan sayfaları parça parça geri vermek için (Tek seferlik tam VACUUM)
+        if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            self.conn.commit()
+            self.conn.execute('VACUUM')
 
-        if not rows: return False, 0.0
+    def _load_last_decision_id(self):
+        # AUTOINCREMENT sayacı silinen kayıtları da hatırlar, ikisinin büyüğünü al
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM decisions")
+        max_id = cursor.fetchone()[0]
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'decisions'")
+        row = cursor.fetchone()
+        return max(max_id, row[0] if row else 0)
 
-        past_news = [self.clean_text(row[0]) for row in rows]
-        try:
-            corpus = past_news + [clean_new]
-            tfidf_matrix = self.vectorizer.fit_transform(corpus)
-            similarities = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])
-            max_sim = similarities.flatten().max() if similarities.size > 0 else 0.0
-            
-            if max_sim >= threshold:
-                print(f"🛑 [BENZERLİK] Tespit edildi: {max_sim:.2f}")
-                return True, max_sim
-            return False, max_sim
-        except:
-            return False, 0.0
+    # --- WRITE-BEHIND KUYRUĞU ---
+    def _enqueue(self, sql, params, error_label):
+        self.write_queue.put((sql, params, error_label))
 
-    def add_news(self, source, content):
+    def _writer_loop(self):
+        """Kuyruktaki INSERT'leri gruplar halinde yazar, her grup için tek commit."""
+        while True:
+            batch = [self.write_queue.get()]
+            # Birikmiş ne varsa aynı commit'e dahil et
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self.write_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            with self.lock:
+                for entry in batch:
+                    if entry is None:
+                        stop = True
+                        continue
+                    sql, params, error_label = entry
+                    try:
+                        self.conn.execute(sql, params)
+                    except Exception as e:
+                        print(f"❌ {error_label}: {e}")
+                try:
+                    self.conn.commit()
+                except Exception as e:
+                    print(f"❌ DB Commit Hatası: {e}")
+
+            for _ in batch:
+                self.write_queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Kuyruktaki tüm yazmaların diske inmesini bekler (Senkron)."""
+        self.write_queue.join()
+
+    def close(self):
+        """Kuyruğu boşaltır ve bağlantıyı kapatır (Kapanışta çağrılır)."""
+        if self.writer_thread.is_alive():
+            self.write_queue.put(None)
+            self.writer_thread.join()
+        with self.lock:
+            self.conn.close()
+        self.reader_executor.shutdown(wait=True)
+        self.reader_conn.close()
+
+    # --- RETENTION / COMPACTION ---
+    def _archive_rows(self, table, rows, ts_key):
+        """Satırları aylık sıkıştırılmış JSONL dosyalarına ekler: archive/{table}_YYYY-MM.jsonl.gz"""
+        by_month = {}
+        for row in rows:
+            month = time.strftime("%Y-%m", time.gmtime(row[ts_key] or 0))
+            by_month.setdefault(month, []).append(row)
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for month, month_rows in by_month.items():
+            path = os.path.join(self.archive_dir, f"{table}_{month}.jsonl.gz")
+            # 'ab' modu yeni bir gzip üyesi ekler, gzip.open hepsini sırayla okur
+            with gzip.open(path, "ab") as f:
+                for row in month_rows:
+                    f.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def _fetch_dicts(self, query, params=()):
+        cursor = self.conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+    def run_retention(self, decision_retention_days=30, batch_size=500, vacuum_pages=2000):
+        """
+        Eski kayıtları arşivler ve siler, sonra DB'yi parça parça küçültür.
+        - news: Dedup penceresinden (24s) eski haberler
+        - decisions (+ bağlı trades): decision_retention_days'ten eski kararlar
+          (created_at'i olmayan eski kayıtlar göçte doldurulamadıysa süresi dolmuş sayılır)
+        Her batch kendi lock/commit'i ile çalışır, yazıcı thread uzun süre beklemez.
+        Senkron çalışır -> asyncio.to_thread ile çağrılmalı.
+        """
+        now = time.time()
+        counts = {"news": 0, "decisions": 0, "trades": 0}
+
+        # 1. HABERLER
+        news_cutoff = now - DEDUP_WINDOW_SEC
+        while True:
+            with self.lock:
+                rows = self._fetch_dicts(
+                    'SELECT * FROM news WHERE timestamp < ? ORDER BY id LIMIT ?', (news_cutoff, batch_size)
+                )
+                if not rows: break
+                self._archive_rows("news", rows, "timestamp")
+                self.conn.execute('DELETE FROM news WHERE id <= ? AND timestamp < ?', (rows[-1]["id"], news_cutoff))
+                self.conn.commit()
+            counts["news"] += len(rows)
+
+        # 2. KARARLAR VE BAĞLI İŞLEMLER
+        decision_cutoff = now - decision_retention_days * 24 * 60 * 60
+        while True:
+            with self.lock:
+                decisions = self._fetch_dicts(
+                    'SELECT * FROM decisions WHERE created_at IS NULL OR created_at < ? ORDER BY id LIMIT ?',
+                    (decision_cutoff, batch_size)
+                )
+                if not decisions: break
+                ids = [d["id"] for d in decisions]
+                marks = ",".join("?" * len(ids))
+                trades = self._fetch_dicts(f'SELECT * FROM trades WHERE decision_id IN ({marks})', ids)
+                # Trade'in kendi zamanı yoksa kararın zamanıyla arşivle
+                decision_ts = {d["id"]: d["created_at"] for d in decisions}
+                for t in trades:
+                    t["created_at"] = t["created_at"] or decision_ts.get(t["decision_id"])
+
+                self._archive_rows("decisions", decisions, "created_at")
+                self._archive_rows("trades", trades, "created_at")
+                self.conn.execute(f'DELETE FROM trades WHERE decision_id IN ({marks})', ids)
+                self.conn.execute(f'DELETE FROM decisions WHERE id IN ({marks})', ids)
+                self.conn.commit()
+            counts["decisions"] += len(decisions)
+            counts["trades"] += len(trades)
+
+        # 3. KARARA BAĞLI OLMAYAN ESKİ İŞLEMLER
+        with self.lock:
+            orphans = self._fetch_dicts(
+                'SELECT * FROM trades WHERE decision_id IS NULL AND (created_at IS NULL OR created_at < ?)',
+                (decision_cutoff,)
+            )
+            if orphans:
+                self._archive_rows("trades", orphans, "created_at")
+                self.conn.execute(
+                    'DELETE FROM trades WHERE decision_id IS NULL AND (created_at IS NULL OR created_at < ?)',
+                    (decision_cutoff,)
+                )
+                self.conn.commit()
+            counts["trades"] += len(orphans)
+
+        # 4. INCREMENTAL VACUUM (Boş sayfaları dosya sisteme geri ver)
+        if any(counts.values()):
+            with self.lock:
+                self.conn.execute(f'PRAGMA incremental_vacuum({int(vacuum_pages)})')
+                self.conn.commit()
+        return counts
+
+    # --- HABER FONKSİYONLARI ---
+    def clean_text(self, text):
+        return self.news_index.clean_text(text)
+
+    def rebuild_news_index(self):
+        """Son 24 saatin haberlerini DB'den okuyup indeksi yeniden kurar (Açılışta)."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('INSERT INTO news (source, content, timestamp) VALUES (?, ?, ?)', 
-                          (source, content, time.time()))
-            conn.commit()
-            conn.close()
+            limit_time = time.time() - DEDUP_WINDOW_SEC
+            with self.lock:
+                cursor = self.conn.cursor()
+                cursor.execute('SELECT content, timestamp FROM news WHERE timestamp > ?', (limit_time,))
+                rows = cursor.fetchall()
+            self.news_index.rebuild(rows)
+            print(f"♻️ Haber İndeksi Kuruldu: {len(self.news_index)} haber.")
         except Exception as e:
-            print(f"❌ DB Yazma Hatası: {e}")
+            print(f"❌ Haber İndeksi Hatası: {e}")
+
+    def is_duplicate(self, new_text, threshold=0.75):
+        max_sim = self.news_index.query(new_text)
+        if max_sim is None: return True, 1.0
+
+        if max_sim >= threshold:
+            print(f"🛑 [BENZERLİK] Tespit edildi: {max_sim:.2f}")
+            return True, max_sim
+        return False, max_sim
+
+    def add_news(self, source, content):
+        now = time.time()
+        self.news_index.add(content, now)
+        self._enqueue('INSERT INTO news (source, content, timestamp) VALUES (?, ?, ?)',
+                      (source, content, now), "DB Yazma Hatası")
 
     # --- YENİ: KARAR VE TRADE KAYIT FONKSİYONLARI ---
 
     def log_decision(self, record):
         """
         AI Kararını DB'ye kaydeder ve ID'sini döner.
+        ID bellekte ayrılır, INSERT arka planda yazılır (Event loop beklemez).
         record: dict
         """
         decision_id = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO decisions (timestamp, symbol, action, confidence, reason, price, news_snippet, validity, tp_pct, sl_pct, raw_data)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            with self._id_lock:
+                decision_id = self._next_decision_id # Bu ID'yi Trade açarken kullanacağız
+                self._next_decision_id += 1
+            self._enqueue('''
+                INSERT INTO decisions (id, timestamp, symbol, action, confidence, reason, price, news_snippet, validity, tp_pct, sl_pct, raw_data, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
-                record['time'], record['symbol'], record['action'], record['confidence'], 
-                record['reason'], record['price'], record['news_snippet'], record['validity'], record['tp_pct'], record['sl_pct'], json.dumps(record)
-            ))
-            decision_id = cursor.lastrowid # Bu ID'yi Trade açarken kullanacağız
-            conn.commit()
-            conn.close()
+                decision_id, record['time'], record['symbol'], record['action'], record['confidence'],
+                record['reason'], record['price'], record['news_snippet'], record['validity'], record['tp_pct'], record['sl_pct'], json.dumps(record),
+                time.time()
+            ), "DB Decision Log Hatası")
         except Exception as e:
             print(f"❌ DB Decision Log Hatası: {e}")
         return decision_id
 
+    def update_decision(self, decision_id, action, reason):
+        """Kaydedilmiş kararın aksiyonunu/sebebini günceller (Örn. bayat karar iptali). Write-behind."""
+        if decision_id is None:
+            return
+        self._enqueue('UPDATE decisions SET action = ?, reason = ? WHERE id = ?',
+                      (action, reason, decision_id), "DB Decision Update Hatası")
+
     def log_trade(self, record, decision_id=None):
         """
-        Kapanan işlemi DB'ye kaydeder.
+        Kapanan işlemi DB'ye kaydeder (Write-behind kuyruğu üzerinden).
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO trades (decision_id, timestamp, symbol, side, entry_price, exit_price, pnl, reason, peak_price)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            self._enqueue('''
+                INSERT INTO trades (decision_id, timestamp, symbol, side, entry_price, exit_price, pnl, reason, peak_price, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
-                    decision_id, 
-                    record.get('time'), 
-                    record.get('symbol'), 
+                    decision_id,
+                    record.get('time'),
+                    record.get('symbol'),
                     record.get('side'),
-                    record.get('entry'), 
-                    record.get('exit'), 
-                    record.get('pnl'), 
-                    record.get('reason'), 
-                    record.get('peak', 0) # <--- Tutarlılık sağlandı
-                ))
-            conn.commit()
-            conn.close()
+                    record.get('entry'),
+                    record.get('exit'),
+                    record.get('pnl'),
+                    record.get('reason'),
+                    record.get('peak', 0), # <--- Tutarlılık sağlandı
+                    time.time()
+                ), "DB Trade Log Hatası")
         except Exception as e:
             print(f"❌ DB Trade Log Hatası: {e}")
 
-    # --- YENİ: YÜKLEME VE RAPORLAMA ---
+    # --- YÜKLEME VE RAPORLAMA (ASYNC OKUMA) ---
+
+    async def _read(self, query, params=()):
+        """Sorguyu okuyucu thread'inde çalıştırır, event loop sadece sonucu bekler."""
+        def run():
+            cursor = self.reader_conn.cursor()
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.reader_executor, run)
+
+    @staticmethod
+    def _time_filter(column, since, until, conditions, params):
+        # since/until: epoch saniye (created_at kolonu üzerinden)
+        if since is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append(f"{column} < ?")
+            params.append(until)
 
-    def load_recent_history(self, ctx):
+    async def get_decisions(self, offset=0, limit=100, since=None, until=None, action=None):
+        """Kararları yeniden eskiye sayfalı döndürür."""
+        conditions, params = [], []
+        if action:
+            conditions.append("action = ?")
+            params.append(action)
+        self._time_filter("created_at", since, until, conditions, params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return await self._read(
+            f'SELECT * FROM decisions {where} ORDER BY id DESC LIMIT ? OFFSET ?',
+            (*params, limit, offset)
+        )
+
+    async def get_trades(self, offset=0, limit=50, since=None, until=None):
+        """Kapanmış işlemleri yeniden eskiye sayfalı döndürür."""
+        conditions, params = [], []
+        self._time_filter("created_at", since, until, conditions, params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return await self._read(
+            f'SELECT * FROM trades {where} ORDER BY id DESC LIMIT ? OFFSET ?',
+            (*params, limit, offset)
+        )
+
+    async def load_recent_history(self, ctx):
         """
         Program açılışında son 100 kararı ve işlemi hafızaya yükler.
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row # Dict gibi erişmek için
-        cursor = conn.cursor()
-        
         # 1. Kararları Yükle
-        cursor.execute('SELECT * FROM decisions ORDER BY id DESC LIMIT 100')
-        decisions = cursor.fetchall()
+        decisions = await self.get_decisions(limit=100)
         for d in reversed(decisions): # Eskiden yeniye ekle (Deque yapısı için)
             rec = {
                 "time": d['timestamp'], "symbol": d['symbol'], "action": d['action'],
@@ -184,37 +451,29 @@ class MemoryManager:
             ctx.ai_decisions.append(rec)
 
         # 2. İşlemleri Yükle
-        cursor.execute('SELECT * FROM trades ORDER BY id DESC LIMIT 50')
-        trades = cursor.fetchall()
+        trades = await self.get_trades(limit=50)
         for t in reversed(trades):
-            rec = {
-                'time': t['timestamp'], 'symbol': t['symbol'], 'side': t['side'],
-                'pnl': t['pnl'], 'reason': t['reason'], 'entry': t['entry_price'],
-                'exit': t['exit_price']
-            }
-            ctx.exchange.history.append(rec)
-            
-        conn.close()
+            ctx.exchange.history.append(ClosedTrade(
+                t['timestamp'], t['symbol'], t['side'], t['entry_price'],
+                t['exit_price'], t['pnl'], t['peak_price'] or 0.0, t['reason'],
+            ))
+
         print(f"♻️ Hafıza Tazelendi: {len(decisions)} Karar, {len(trades)} İşlem yüklendi.")
 
-    def get_full_trade_story(self):
-        """Hangi Karar -> Hangi İşleme -> Hangi Sonuca yol açtı? (Genişletilmiş)"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
+    async def get_full_trade_story(self, offset=0, limit=100, since=None, until=None):
+        """Hangi Karar -> Hangi İşleme -> Hangi Sonuca yol açtı? (Genişletilmiş, sayfalı)"""
+        conditions, params = ["d.action IN ('LONG', 'SHORT')"], []
+        self._time_filter("d.created_at", since, until, conditions, params)
+
         # peak_price, entry_price ve exit_price verilerini de çekiyoruz
-        query = '''
-            SELECT 
+        query = f'''
+            SELECT
                 d.timestamp as time, d.symbol, d.action, d.confidence, d.reason as ai_reason,
                 t.entry_price, t.exit_price, t.pnl, t.reason as close_reason, t.peak_price
             FROM decisions d
             LEFT JOIN trades t ON t.decision_id = d.id
-            WHERE d.action IN ('LONG', 'SHORT')
+            WHERE {' AND '.join(conditions)}
             ORDER BY d.id DESC
-            LIMIT 100
+            LIMIT ? OFFSET ?
         '''
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
\ No newline at end of file
+        return await self._read(query, (*params, limit, offset))
@@ -1,13 +1,245 @@
 import time 
+import heapq
+from bisect import bisect_right
+import numpy as np
+
+# Trailing stop eşikleri (ROI %) -> Trigger index bu seviyeleri fiyat olarak tutar
+TRAIL_BREAKEVEN_ROI = 0.8
+TRAIL_LOCK_ROI = 1.5
+# Float yuvarlamasına karşı: Seviyeye bu kadar yaklaşan tick tam kontrole düşer
+_LEVEL_EPS = 1e-9
+
+_NO_EVENT = (None, None, None, 0.0, 0.0, None)
+
+# settle_paths çıkış kodları -> Kapanış nedeni
+EXIT_NONE, EXIT_TP, EXIT_SL, EXIT_TIME = 0, 1, 2, 3
+EXIT_REASONS = (None, "TAKE PROFIT 💰", "STOP LOSS 🛑", "TIME LIMIT ⏳")
+
+
+def settle_paths(prices, ticks, entry, is_long, tp, sl, expiry, lengths=None):
+    """
+    Çok sayıda pozisyonu tick yolları üzerinde tek seferde kapatır (Satır = pozisyon).
+    prices/ticks: (n, m) fiyat ve zaman matrisleri. entry/is_long/tp/sl/expiry: (n,) dizileri.
+    lengths: Satır başına geçerli tick sayısı (Kısa pencereler için, varsayılan m).
+    Mantık check_positions ile birebir aynıdır (Trailing stop -> TP/SL -> Süre).
+    Dönüş: (end, code, sl_end, peak) -> Çıkış/son tick indeksi, EXIT_* kodu, o andaki SL, görülen en iyi fiyat.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    ticks = np.asarray(ticks, dtype=np.float64)
+    entry = np.asarray(entry, dtype=np.float64)
+    is_long = np.asarray(is_long, dtype=bool)
+    tp = np.asarray(tp, dtype=np.float64)
+    sl = np.asarray(sl, dtype=np.float64)
+    n, m = prices.shape
+    rows = np.arange(n)
+    col = np.arange(m)
+    long_ = is_long[:, None]
+    if lengths is None:
+        valid = np.ones((n, m), dtype=bool)
+        last = np.full(n, m - 1)
+    else:
+        lengths = np.asarray(lengths)
+        valid = col < lengths[:, None]
+        last = np.maximum(lengths - 1, 0)
+
+    # --- TRAILING STOP: Eşiğin ilk aşıldığı tick'ten itibaren SL kademeli değişir ---
+    roi = np.where(long_, prices - entry[:, None], entry[:, None] - prices) / entry[:, None] * 100
+    sl_path = np.broadcast_to(sl[:, None], (n, m))
+
+    hit = (roi > TRAIL_BREAKEVEN_ROI) & valid
+    armed = hit.any(axis=1) & np.where(is_long, sl < entry, sl > entry)
+    after = armed[:, None] & (col >= hit.argmax(axis=1)[:, None])
+    sl_path = np.where(after, np.where(is_long, entry * 1.0015, entry * 0.9985)[:, None], sl_path)
+
+    hit = (roi > TRAIL_LOCK_ROI) & valid
+    after = hit.any(axis=1)[:, None] & (col >= hit.argmax(axis=1)[:, None])
+    lock = np.where(is_long, entry * 1.01, entry * 0.99)[:, None]
+    sl_path = np.where(after, np.where(long_, np.maximum(sl_path, lock), np.minimum(sl_path, lock)), sl_path)
+
+    # --- ÇIKIŞ NEDENLERİ ---
+    tp_hit = np.where(long_, prices >= tp[:, None], prices <= tp[:, None])
+    sl_hit = np.where(long_, prices <= sl_path, prices >= sl_path)
+    time_hit = ticks > np.asarray(expiry, dtype=np.float64)[:, None]
+    exits = (tp_hit | sl_hit | time_hit) & valid
+
+    exited = exits.any(axis=1)
+    end = np.where(exited, exits.argmax(axis=1), last)
+    code = np.where(time_hit[rows, end], EXIT_TIME, np.where(tp_hit[rows, end], EXIT_TP, EXIT_SL))
+    code = np.where(exited, code, EXIT_NONE)
+
+    seen = col <= end[:, None]
+    peak = np.where(
+        is_long,
+        np.where(seen, prices, -np.inf).max(axis=1),
+        np.where(seen, prices, np.inf).min(axis=1),
+    )
+    return end, code, sl_path[rows, end], peak
+
+
+class _Record:
+    """
+    __slots__ kayıtları için sözlük uyumlu görünüm (UI ve DB kodu pos['pnl'], .get() kullanır).
+    Sıcak yolda attribute erişimi kullanılır.
+    """
+    __slots__ = ()
+    _fields = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self._fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self._fields
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in self._fields]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+class Position(_Record):
+    """Açık pozisyon. pnl ve peak_price, current_price'tan türetilir (Tick başına hesap yok)."""
+    __slots__ = (
+        'entry', 'current_price', 'highest_price', 'lowest_price', 'side', 'margin', 'qty', 'lev',
+        'tp', 'sl', 'start_time', 'validity', 'expiry_time', 'decision_id',
+    )
+    _fields = __slots__ + ('pnl',)
+
+    def __init__(self, entry, side, margin, qty, lev, tp, sl, start_time, validity, decision_id):
+        self.entry = entry
+        self.current_price = entry   # Başlangıçta aynı
+        self.highest_price = entry   # Peak takibi için
+        self.lowest_price = entry    # Peak takibi için
+        self.side = side
+        self.margin = margin
+        self.qty = qty
+        self.lev = lev
+        self.tp = tp
+        self.sl = sl
+        self.start_time = start_time
+        self.validity = validity
+        self.expiry_time = start_time + validity * 60
+        self.decision_id = decision_id
+
+    @property
+    def pnl(self):
+        if self.side == 'LONG':
+            return (self.current_price - self.entry) * self.qty
+        return (self.entry - self.current_price) * self.qty
+
+    @property
+    def peak_price(self):
+        return self.highest_price if self.side == 'LONG' else self.lowest_price
+
+
+class ClosedTrade(_Record):
+    """Kapanmış işlem kaydı (history)."""
+    __slots__ = ('time', 'symbol', 'side', 'entry', 'exit', 'pnl', 'peak', 'reason', 'closed_at')
+    _fields = __slots__
+
+    def __init__(self, time, symbol, side, entry, exit, pnl, peak=0.0, reason="", closed_at=None):
+        self.time = time
+        self.symbol = symbol
+        self.side = side
+        self.entry = entry
+        self.exit = exit
+        self.pnl = pnl
+        self.peak = peak
+        self.reason = reason
+        self.closed_at = closed_at  # Epoch saniye (Backtest raporları için)
+
+
+class SimulatedClock:
+    """Backtest saati: PaperExchange(clock=SimulatedClock()) -> Canlı mantık, replay zamanıyla."""
+    __slots__ = ("now",)
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def set(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
 
 class PaperExchange:
-    def __init__(self, balance):
+    """
+    Sanal cüzdan ve pozisyon motoru.
+    clock: Zaman kaynağı (Varsayılan time.time). Backtest SimulatedClock verir,
+    böylece canlı ve test aynı kod yolunu çalıştırır.
+    """
+
+    def __init__(self, balance, clock=time.time):
         self.balance = balance
         self.positions = {} 
         self.total_pnl = 0.0
         self.history = []
+        self.clock = clock
 
+        # Trigger index: sembol -> (alt, üst) fiyat bandı. Band içindeki tick hiçbir seviyeyi geçemez.
+        self.trigger_bands = {}
+        # Süre dolumu için min-heap: (expiry_time, sembol)
+        self.expiry_heap = []
 
+    # --- TRIGGER INDEX ---
+    def _trigger_levels(self, pos):
+        """Pozisyonun şu an tetiklenebilecek fiyat seviyeleri (sıralı)."""
+        entry, sl = pos.entry, pos.sl
+        levels = [pos.tp, sl]
+        if pos.side == 'LONG':
+            if sl < entry: levels.append(entry * (1 + TRAIL_BREAKEVEN_ROI / 100))
+            if sl < entry * 1.01: levels.append(entry * (1 + TRAIL_LOCK_ROI / 100))
+        else:
+            if sl > entry: levels.append(entry * (1 - TRAIL_BREAKEVEN_ROI / 100))
+            if sl > entry * 0.99: levels.append(entry * (1 - TRAIL_LOCK_ROI / 100))
+        levels.sort()
+        return levels
+
+    def _index_position(self, symbol, price):
+        """Fiyatın içinde bulunduğu seviye aralığını (bandı) hesaplar: O(log n)"""
+        levels = self._trigger_levels(self.positions[symbol])
+        i = bisect_right(levels, price)
+        lo = levels[i - 1] * (1 + _LEVEL_EPS) if i > 0 else float('-inf')
+        hi = levels[i] * (1 - _LEVEL_EPS) if i < len(levels) else float('inf')
+        self.trigger_bands[symbol] = (lo, hi)
+
+    def _register_position(self, symbol):
+        pos = self.positions[symbol]
+        self._index_position(symbol, pos.entry)
+        heapq.heappush(self.expiry_heap, (pos.expiry_time, symbol))
+
+    def pop_expired(self, now=None):
+        """Süresi dolmuş açık pozisyonların sembolleri (Tüm pozisyonları taramadan)."""
+        now = now or self.clock()
+        expired = []
+        heap = self.expiry_heap
+        while heap and heap[0][0] < now:
+            expiry_time, symbol = heapq.heappop(heap)
+            pos = self.positions.get(symbol)
+            # Kapanmış/yeniden açılmış pozisyonun eski kaydı olabilir (Lazy silme)
+            if pos is not None and pos.expiry_time == expiry_time:
+                expired.append(symbol)
+        return expired
+
+    # --- POZİSYON YÖNETİMİ ---
     def open_position(self, symbol, side, price, tp_pct, sl_pct, amount_usdt, leverage, validity, app_state, decision_id):
         if not app_state.is_running:
             return "Bot duraklatıldı.", "warning"
@@ -33,261 +265,148 @@ class PaperExchange:
             tp = price * (1 - tp_pct/100)
             sl = price * (1 + sl_pct/100)
 
-        self.positions[symbol] = {
-            'entry': price,
-            'current_price': price, # Başlangıçta aynı
-            'highest_price': price, # Peak takibi için
-            'lowest_price': price,  # Peak takibi için
-            'side': side,
-            'margin': margin,
-            'qty': qty,
-            'lev': leverage,
-            'tp': tp,
-            'sl': sl,
-            'pnl': 0.0,             # Başlangıçta 0
-            'start_time': time.time(),
-            'validity': validity,
-            'expiry_time': time.time() + validity * 60,
-            'decision_id': decision_id
-        }
+        self.positions[symbol] = Position(
+            price, side, margin, qty, leverage, tp, sl, self.clock(), validity, decision_id
+        )
+        self._register_position(symbol)
         
         self.balance -= margin
         return f"🔵 POZİSYON AÇILDI: {symbol.upper()} {side} | Giriş: {price} | TP: {tp_pct} | SL: {sl_pct} | VM: {validity}", "info"
     
     def check_positions(self, symbol, current_price):
-        if symbol not in self.positions:
-            return None, None, None, 0.0, 0.0, None
+        pos = self.positions.get(symbol)
+        if pos is None:
+            return _NO_EVENT
+
+        now = self.clock()
+
+        # --- 0. HIZLI YOL: Fiyat hiçbir TP/SL/Trailing seviyesini geçmediyse ---
+        lo, hi = self.trigger_bands[symbol]
+        pos.current_price = current_price # PnL buradan türetilir
+        if lo < current_price < hi and now <= pos.expiry_time:
+            if pos.side == 'LONG':
+                if current_price > pos.highest_price: pos.highest_price = current_price
+            elif current_price < pos.lowest_price: pos.lowest_price = current_price
+            return _NO_EVENT
 
-        pos = self.positions[symbol]
-        side = pos['side']
-        entry = pos['entry']
-        
         # --- 1. REKOR TAKİBİ (PEAK PRICE) ---
-        peak_price = entry
-        if side == 'LONG':
-            current_high = pos.get('highest_price', entry)
-            if current_price > current_high:
-                pos['highest_price'] = current_price
-            peak_price = pos['highest_price']
+        if pos.side == 'LONG':
+            if current_price > pos.highest_price:
+                pos.highest_price = current_price
         else:
-            current_low = pos.get('lowest_price', entry)
-            if pos.get('lowest_price', 0) == 0 or current_price < current_low:
-                pos['lowest_price'] = current_price
-            peak_price = pos['lowest_price']
+            if pos.lowest_price == 0 or current_price < pos.lowest_price:
+                pos.lowest_price = current_price
 
-        # --- 2. PNL HESAPLAMA ---
-        if side == 'LONG':
-            pnl = (current_price - entry) * pos['qty']
-        else:
-            pnl = (entry - current_price) * pos['qty']
-            
-        pos['pnl'] = pnl # UI görsün diye kaydet
+        # --- 2. TRAILING STOP ---
+        self._apply_trailing(pos, current_price)
 
-        # --- 3. TRAILING STOP ---
-        roi = 0.0
-        if side == 'LONG':
-            roi = (current_price - entry) / entry * 100
-            if roi > 0.8 and pos['sl'] < entry: pos['sl'] = entry * 1.0015 
-            if roi > 1.5:
-                new_sl = entry * 1.01 
-                if pos['sl'] < new_sl: pos['sl'] = new_sl
-        elif side == 'SHORT':
-            roi = (entry - current_price) / entry * 100
-            if roi > 0.8 and pos['sl'] > entry: pos['sl'] = entry * 0.9985
-            if roi > 1.5:
-                new_sl = entry * 0.99
-                if pos['sl'] > new_sl: pos['sl'] = new_sl
-
-        # --- 4. ÇIKIŞ NEDENLERİ (TIME LIMIT DAHİL) ---
-        close_reason = None
-        
-        # TP/SL Kontrolü
-        if side == 'LONG':
-            if current_price >= pos['tp']: close_reason = "TAKE PROFIT 💰"
-            elif current_price <= pos['sl']: close_reason = "STOP LOSS 🛑"
-        else:
-            if current_price <= pos['tp']: close_reason = "TAKE PROFIT 💰"
-            elif current_price >= pos['sl']: close_reason = "STOP LOSS 🛑"
+        # --- 3. ÇIKIŞ NEDENLERİ (TIME LIMIT DAHİL) ---
+        close_reason = self._exit_reason(pos, current_price)
 
         # SÜRE KONTROLÜ (SENİN İSTEDİĞİN EXPIRY MANTIĞI)
-        # Eğer expiry_time anahtarı yoksa hata vermesin diye .get kullanıyoruz
-        if time.time() > pos.get('expiry_time', time.time() + 999999):
+        if now > pos.expiry_time:
             close_reason = "TIME LIMIT ⏳"
 
         if close_reason:
-            # Pozisyonu Kapatmadan önce log verilerini hazırla
-
-            decision_id = pos.get('decision_id') # <--- ID'Yİ ÇEK
-
-            log_msg = f"🏁 KAPANDI: {symbol.upper()} ({close_reason}) | PnL: {pnl:.2f} USDT | Enter: {entry} | Close: {current_price} | Peak Seen: {peak_price}"
-            color = "success" if pnl > 0 else "error"
-            
-            # Kapatma işlemini çağır (Geçmişe kaydeder ve siler)
-            self.close_position(symbol, close_reason, pnl)
-            
-            return log_msg, color, symbol, pnl, peak_price, decision_id
+            return self._close_event(symbol, pos, close_reason, now)
 
-        return None, None, None, 0.0, 0.0, None
-    
-    def close_position(self, symbol, reason, pnl):
-        # --- DÜZELTME: ZORUNLU KÜÇÜK HARF ---
-        symbol = symbol.lower()
-        # ------------------------------------
+        # Seviye geçildi ama kapanmadı (Trailing SL güncellendi) -> Yeni bandı kur
+        self._index_position(symbol, current_price)
+        return _NO_EVENT
 
-        if symbol not in self.positions: 
-            return "Hata: Pozisyon bulunamadı", "error"
-        
-        pos = self.positions[symbol]
-        
-        # Bakiyeyi güncelle
-        self.balance += pos['margin'] + pnl
-        self.total_pnl += pnl
-        
-        peak_price = 0.0
-
-        if pos['side'] == 'LONG': peak_price = pos.get('highest_price', pos['entry'])
-        elif pos['side'] == 'SHORT': peak_price = pos.get('lowest_price', pos['entry'])
-        # GEÇMİŞ KAYDI (Burası sende vardı ama PnL 0 geliyordu, artık düzelecek)
-        record = {
-            'time': time.strftime("%H:%M:%S"),
-            'symbol': symbol.upper(),
-            'side': pos['side'],
-            'entry': pos['entry'],
-            'exit': pos.get('current_price', 0),
-            'pnl': pnl,
-            'peak': peak_price, # <--- BURASI EKLENDİ
-            'reason': reason
-        }
-        self.history.append(record)
-        
-        del self.positions[symbol]
-        
-        color = "success" if pnl > 0 else "error"
-        return f"🏁 KAPANDI: {symbol.upper()} ({reason}) | PnL: {pnl:.2f} USDT", color
-    
-    def open_position_test(self, symbol, side, price, tp_pct, sl_pct, amount_usdt, leverage, validity, app_state, decision_id, now_ts):
-        """Sistem saati yerine dışarıdan gelen now_ts (timestamp) ile işlem açar."""
-        if not app_state.is_running:
-            return "Bot duraklatıldı.", "warning"
+    def settle_candles(self, symbol, times, opens, highs, lows, closes, tick_sec=15):
+        """
+        Bir mum dizisini pozisyona TEK çağrıda uygular (Backtest).
+        Her mum O->H->L->C sırasıyla tick_sec arayla 4 tick sayılır; sonuç bu tick'lerle
+        check_positions'ı tek tek çağırmakla aynıdır. Dönüş: check_positions ile aynı tuple.
+        """
+        pos = self.positions.get(symbol)
+        if pos is None or len(closes) == 0:
+            return _NO_EVENT
 
-        symbol = symbol.lower()
-        if symbol in self.positions:
-            return f"{symbol.upper()} zaten açık!", "warning"
+        prices = np.column_stack((opens, highs, lows, closes)).astype(np.float64).ravel()
+        ticks = (np.asarray(times, dtype=np.float64)[:, None] + np.arange(4) * tick_sec).ravel()
+        end, code, sl, peak = settle_paths(
+            prices[None, :], ticks[None, :], [pos.entry], [pos.side == 'LONG'], [pos.tp], [pos.sl], [pos.expiry_time],
+        )
+        end, code = int(end[0]), int(code[0])
 
-        margin = amount_usdt
-        qty = (amount_usdt * leverage) / price
-        
-        if side == 'LONG':
-            tp = price * (1 + tp_pct/100)
-            sl = price * (1 - sl_pct/100)
+        if pos.side == 'LONG':
+            pos.highest_price = max(pos.highest_price, float(peak[0]))
         else:
-            tp = price * (1 - tp_pct/100)
-            sl = price * (1 + sl_pct/100)
+            pos.lowest_price = min(pos.lowest_price, float(peak[0]))
+        pos.current_price = float(prices[end])
+        pos.sl = float(sl[0])
 
-        self.positions[symbol] = {
-            'entry': price,
-            'current_price': price,
-            'highest_price': price,
-            'lowest_price': price,
-            'side': side,
-            'margin': margin,
-            'qty': qty,
-            'lev': leverage,
-            'tp': tp,
-            'sl': sl,
-            'pnl': 0.0,
-            'start_time': now_ts,
-            'validity': validity,
-            'expiry_time': now_ts + (validity * 60), # Saniyeye çevrildi
-            'decision_id': decision_id
-        }
-        
-        self.balance -= margin
-        return f"🧪 [TEST] POZİSYON AÇILDI: {symbol.upper()} {side} | Giriş: {price}", "info"
-
-    def check_positions_test(self, symbol, current_price, now_ts):
-        """Sistem saati yerine dışarıdan gelen now_ts ile kontrol yapar."""
-        symbol = symbol.lower()
-        if symbol not in self.positions:
-            return None, None, None, 0.0, 0.0, None
+        if code == EXIT_NONE:
+            self._index_position(symbol, pos.current_price)
+            return _NO_EVENT
+        return self._close_event(symbol, pos, EXIT_REASONS[code], float(ticks[end]))
 
-        pos = self.positions[symbol]
-        side = pos['side']
-        entry = pos['entry']
-        
-        # Peak Price Takibi
-        if side == 'LONG':
-            if current_price > pos.get('highest_price', entry):
-                pos['highest_price'] = current_price
-            peak_price = pos['highest_price']
-            pnl = (current_price - entry) * pos['qty']
-        else:
-            if current_price < pos.get('lowest_price', entry):
-                pos['lowest_price'] = current_price
-            peak_price = pos['lowest_price']
-            pnl = (entry - current_price) * pos['qty']
-                
-        pos['pnl'] = pnl
-
-        # --- 3. TRAILING STOP ---
-        roi = 0.0
-        if side == 'LONG':
+    @staticmethod
+    def _apply_trailing(pos, current_price):
+        entry = pos.entry
+        if pos.side == 'LONG':
             roi = (current_price - entry) / entry * 100
-            if roi > 0.8 and pos['sl'] < entry: pos['sl'] = entry * 1.0015 
-            if roi > 1.5:
+            if roi > TRAIL_BREAKEVEN_ROI and pos.sl < entry: pos.sl = entry * 1.0015 
+            if roi > TRAIL_LOCK_ROI:
                 new_sl = entry * 1.01 
-                if pos['sl'] < new_sl: pos['sl'] = new_sl
-        elif side == 'SHORT':
+                if pos.sl < new_sl: pos.sl = new_sl
+        elif pos.side == 'SHORT':
             roi = (entry - current_price) / entry * 100
-            if roi > 0.8 and pos['sl'] > entry: pos['sl'] = entry * 0.9985
-            if roi > 1.5:
+            if roi > TRAIL_BREAKEVEN_ROI and pos.sl > entry: pos.sl = entry * 0.9985
+            if roi > TRAIL_LOCK_ROI:
                 new_sl = entry * 0.99
-                if pos['sl'] > new_sl: pos['sl'] = new_sl
+                if pos.sl > new_sl: pos.sl = new_sl
 
-        close_reason = None
+    @staticmethod
+    def _exit_reason(pos, current_price):
         # TP/SL Kontrolü
-        if side == 'LONG':
-            if current_price >= pos['tp']: close_reason = "TAKE PROFIT 💰"
-            elif current_price <= pos['sl']: close_reason = "STOP LOSS 🛑"
+        if pos.side == 'LONG':
+            if current_price >= pos.tp: return "TAKE PROFIT 💰"
+            if current_price <= pos.sl: return "STOP LOSS 🛑"
         else:
-            if current_price <= pos['tp']: close_reason = "TAKE PROFIT 💰"
-            elif current_price >= pos['sl']: close_reason = "STOP LOSS 🛑"
+            if current_price <= pos.tp: return "TAKE PROFIT 💰"
+            if current_price >= pos.sl: return "STOP LOSS 🛑"
+        return None
 
-        # Süre Kontrolü (Simülasyon Zamanı ile)
-        if now_ts > pos.get('expiry_time', 0):
-            close_reason = "TIME LIMIT ⏳"
+    def _close_event(self, symbol, pos, close_reason, now):
+        # Pozisyonu Kapatmadan önce log verilerini hazırla
+        pnl = pos.pnl
+        peak_price = pos.peak_price
+        decision_id = pos.decision_id # <--- ID'Yİ ÇEK
 
-        if close_reason:
-            decision_id = pos.get('decision_id')
-            log_msg, color = self.close_position_test(symbol, close_reason, pnl, now_ts)
-            return log_msg, color, symbol, pnl, peak_price, decision_id
+        log_msg = f"🏁 KAPANDI: {symbol.upper()} ({close_reason}) | PnL: {pnl:.2f} USDT | Enter: {pos.entry} | Close: {pos.current_price} | Peak Seen: {peak_price}"
+        color = "success" if pnl > 0 else "error"
 
-        return None, None, None, 0.0, 0.0, None
+        # Kapatma işlemini çağır (Geçmişe kaydeder ve siler)
+        self.close_position(symbol, close_reason, pnl, now)
 
-    def close_position_test(self, symbol, reason, pnl, now_ts):
-        """Geçmişe kayıt atarken simülasyon saatini kullanır."""
+        return log_msg, color, symbol, pnl, peak_price, decision_id
+    
+    def close_position(self, symbol, reason, pnl, now=None):
+        # --- DÜZELTME: ZORUNLU KÜÇÜK HARF ---
         symbol = symbol.lower()
+        # ------------------------------------
+
         if symbol not in self.positions: 
             return "Hata: Pozisyon bulunamadı", "error"
         
         pos = self.positions[symbol]
-        self.balance += pos['margin'] + pnl
+        now = self.clock() if now is None else now
+        
+        # Bakiyeyi güncelle
+        self.balance += pos.margin + pnl
         self.total_pnl += pnl
         
-        # Simülasyon saatini formatla
-        readable_time = time.strftime("%H:%M:%S", time.gmtime(now_ts))
+        # GEÇMİŞ KAYDI
+        self.history.append(ClosedTrade(
+            time.strftime("%H:%M:%S", time.localtime(now)), symbol.upper(), pos.side, pos.entry,
+            pos.current_price, pnl, pos.peak_price, reason, now,
+        ))
         
-        record = {
-            'time': readable_time,
-            'symbol': symbol.upper(),
-            'side': pos['side'],
-            'entry': pos['entry'],
-            'exit': pos.get('current_price', 0),
-            'pnl': pnl,
-            'peak': pos.get('highest_price') if pos['side'] == 'LONG' else pos.get('lowest_price'),
-            'reason': reason
-        }
-        self.history.append(record)
         del self.positions[symbol]
+        self.trigger_bands.pop(symbol, None)
         
-        return f"🏁 [TEST] KAPANDI: {symbol.upper()} | PnL: {pnl:.2f} USDT", "success"
\ No newline at end of file
+        color = "success" if pnl > 0 else "error"
+        return f"🏁 KAPANDI: {symbol.upper()} ({reason}) | PnL: {pnl:.2f} USDT", color
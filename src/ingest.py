@@ -0,0 +1,72 @@
+import asyncio
+from config import INGEST_MAX_PENDING_SYMBOLS
+
+
+class TickIngest:
+    """
+    Websocket okuyucu ile piyasa/pozisyon güncellemeleri arasındaki sınırlı tampon.
+    Sembol başına tek "son değer" slotu tutulur: Tüketici geride kalırsa aynı sembolün
+    ara tick'leri birleştirilir (coalesce). Kapanan mumlar birleştirilmez, sırayla uygulanır.
+    Bekleyen sembol sayısı max_pending'i aşarsa yeni sembolün tick'i düşürülür (drop).
+    """
+
+    def __init__(self, max_pending=INGEST_MAX_PENDING_SYMBOLS):
+        self.max_pending = max_pending
+        self.pending = {}  # pair -> [kapanan mumlar listesi, (kind, payload) son canlı tick]
+        self.event = asyncio.Event()
+
+        # Sayaçlar (Dashboard'da gösterilir)
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.applied = 0
+        self.max_depth = 0
+
+    def _slot(self, pair):
+        slot = self.pending.get(pair)
+        if slot is None:
+            if len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                return None
+            slot = self.pending[pair] = [[], None]
+            if len(self.pending) > self.max_depth:
+                self.max_depth = len(self.pending)
+            self.event.set()
+        return slot
+
+    def put(self, pair, kind, payload, is_closed=False):
+        """Okuyucu tarafı (Senkron, beklemez)."""
+        self.received += 1
+        slot = self._slot(pair)
+        if slot is None: return
+
+        if slot[1] is not None:
+            # Uygulanmamış canlı tick'in üzerine yazılıyor (veya kapanan mum onu geçersiz kılıyor)
+            self.coalesced += 1
+            slot[1] = None
+        if is_closed:
+            slot[0].append(payload)
+        else:
+            slot[1] = (kind, payload)
+
+    async def drain(self):
+        """Tüketici tarafı: Bekleyen tüm sembolleri tek seferde alır."""
+        while not self.pending:
+            self.event.clear()
+            await self.event.wait()
+        batch, self.pending = self.pending, {}
+        return batch.items()
+
+    @property
+    def depth(self):
+        return len(self.pending)
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "received": self.received,
+            "applied": self.applied,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,296 @@
+import json
+import os
+import shutil
+import numpy as np
+
+STORE_PATH = "data/market_cache/store"
+CATALOG_FILE = "catalog.json"
+
+# Kolon düzeni: Sabit genişlikli ikili dosyalar (Başlık yok, memmap ile sıfır ayrıştırma)
+COLUMNS = (
+    ("ts", np.int64),   # Mum açılış zamanı (ms)
+    ("o", np.float64),
+    ("h", np.float64),
+    ("l", np.float64),
+    ("c", np.float64),
+    ("v", np.float64),  # Quote volume (USDT)
+)
+FUNDING_COLUMNS = (
+    ("funding_ts", np.int64),      # fundingTime (ms)
+    ("funding_rate", np.float64),  # Oran (Binance'deki gibi kesir: 0.0001 = %0.01)
+)
+
+
+class KlineSeries:
+    """
+    Tek sembolün 1m mumları (Kolonlar numpy.memmap, salt okunur).
+    ts artan sıradadır -> Zaman aramaları searchsorted ile O(log n).
+    """
+    __slots__ = ("symbol", "ts", "o", "h", "l", "c", "v")
+
+    def __init__(self, symbol, columns):
+        self.symbol = symbol
+        for name, _ in COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.ts)
+
+    def index_at(self, ts_ms, side='right'):
+        """
+        side='right': ts_ms anında/öncesinde açılmış son mumun indeksi (-1: Yok). (pandas 'pad' karşılığı)
+        side='left':  ts_ms anında/sonrasında açılan ilk mumun indeksi (len: Yok).
+        ts_ms tek değer veya dizi olabilir.
+        """
+        idx = np.searchsorted(self.ts, ts_ms, side=side)
+        return idx - 1 if side == 'right' else idx
+
+    def window(self, start_ms, end_ms):
+        """[start_ms, end_ms] aralığındaki mumların dilim indeksleri."""
+        return slice(int(np.searchsorted(self.ts, start_ms, side='left')),
+                     int(np.searchsorted(self.ts, end_ms, side='right')))
+
+
+class KlineStore:
+    """
+    Disk üzerinde kolonlu 1m kline deposu.
+    path/catalog.json        -> {SYMBOL: {"rows": n, "first": ts, "last": ts, "funding": {"rows": n, "last": ts}}}
+    path/{SYMBOL}/{kolon}.bin -> Sabit genişlikli dizi (ts int64, OHLCV float64, funding_ts/funding_rate)
+    path/{SYMBOL}/g{n}/{kolon}.bin -> merge sonrası mum kolonları (Katalogdaki "gen" hangi nesil olduğunu tutar)
+    Okuma numpy.memmap ile yapılır (Yükleme maliyeti yok, sayfalar ihtiyaç oldukça RAM'e gelir).
+    Yazma normalde sona ekleme (append); araya giren mumlar (boşluk doldurma) merge ile yazılır.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.catalog = {}
+        self._series = {}
+        self._funding = {}
+        if os.path.exists(self._catalog_path()):
+            with open(self._catalog_path(), "r", encoding="utf-8") as f:
+                self.catalog = json.load(f)
+
+    def _catalog_path(self):
+        return os.path.join(self.path, CATALOG_FILE)
+
+    def _gen_dir(self, symbol, gen=0):
+        """Mum kolonlarının klasörü. gen 0: Sembol klasörü (İlk yazım), n: merge ile yazılan nesil."""
+        base = os.path.join(self.path, symbol)
+        return os.path.join(base, f"g{gen}") if gen else base
+
+    def _column_path(self, symbol, name, gen=0):
+        return os.path.join(self._gen_dir(symbol, gen), f"{name}.bin")
+
+    def _meta(self, symbol):
+        return self.catalog.setdefault(symbol, {"rows": 0, "first": None, "last": None})
+
+    def _write_columns(self, symbol, columns, values, rows, gen=0):
+        """Kolonların sonuna ekler; katalogda olmayan (yarım kalmış yazımdan artan) baytları önce atar."""
+        os.makedirs(self._gen_dir(symbol, gen), exist_ok=True)
+        for (name, dtype), col in zip(columns, values):
+            with open(self._column_path(symbol, name, gen), "ab") as f:
+                size = rows * np.dtype(dtype).itemsize
+                if f.tell() != size:
+                    f.truncate(size)
+                    f.seek(size)
+                f.write(np.ascontiguousarray(col, dtype=dtype).tobytes())
+
+    def save_catalog(self):
+        # Atomik yazım: Yarım kalan yazma kataloğu bozmasın
+        tmp = self._catalog_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.catalog, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._catalog_path())
+
+    # --- OKUMA ---
+    def symbols(self):
+        """Mum verisi olan semboller."""
+        return sorted(sym for sym, meta in self.catalog.items() if meta["rows"])
+
+    def __contains__(self, symbol):
+        meta = self.catalog.get(symbol.upper())
+        return bool(meta and meta["rows"])
+
+    def last_ts(self, symbol):
+        """Depodaki son mumun açılış zamanı (ms) veya None."""
+        meta = self.catalog.get(symbol.upper())
+        return meta["last"] if meta and meta["rows"] else None
+
+    def get(self, symbol):
+        """Sembolün KlineSeries'i veya None. memmap'ler sembol başına bir kez açılır."""
+        symbol = symbol.upper()
+        meta = self.catalog.get(symbol)
+        if not meta or not meta["rows"]:
+            return None
+        series = self._series.get(symbol)
+        if series is None or len(series) != meta["rows"]:
+            columns = {
+                name: np.memmap(self._column_path(symbol, name, meta.get("gen", 0)), dtype=dtype, mode="r",
+                                shape=(meta["rows"],))
+                for name, dtype in COLUMNS
+            }
+            series = self._series[symbol] = KlineSeries(symbol, columns)
+        return series
+
+    # --- YAZMA ---
+    def append(self, symbol, ts, o, h, l, c, v, save=True):
+        """
+        Mumları sembolün sonuna ekler. Depodaki son mumdan eski/aynı zamanlı satırlar atlanır.
+        Dönüş: Eklenen satır sayısı.
+        """
+        symbol = symbol.upper()
+        ts = np.asarray(ts, dtype=np.int64)
+        meta = self._meta(symbol)
+        keep = ts > meta["last"] if meta["rows"] else np.ones(len(ts), dtype=bool)
+        if not keep.all():
+            ts, o, h, l, c, v = (np.asarray(col)[keep] for col in (ts, o, h, l, c, v))
+        if len(ts) == 0:
+            return 0
+        if np.any(ts[1:] <= ts[:-1]):
+            raise ValueError(f"{symbol}: Zaman damgaları artan sırada olmalı")
+
+        self._write_columns(symbol, COLUMNS, (ts, o, h, l, c, v), meta["rows"], meta.get("gen", 0))
+
+        if not meta["rows"]:
+            meta["first"] = int(ts[0])
+        meta["rows"] += len(ts)
+        meta["last"] = int(ts[-1])
+        if save:
+            self.save_catalog()
+        return len(ts)
+
+    def merge(self, symbol, ts, o, h, l, c, v):
+        """
+        Mumları zaman sırasına göre araya yerleştirir (Boşluk doldurma).
+        Sembolün kolonları yeniden yazılır; depoda zaten olan zamanlar değişmez.
+        Dönüş: Eklenen satır sayısı.
+        """
+        symbol = symbol.upper()
+        ts = np.asarray(ts, dtype=np.int64)
+        last = self.last_ts(symbol)
+        if last is None or (len(ts) and ts.min() > last):
+            return self.append(symbol, ts, o, h, l, c, v)
+
+        series = self.get(symbol)
+        new = (ts, o, h, l, c, v)
+        merged = [np.concatenate((getattr(series, name), np.asarray(col, dtype=dtype)))
+                  for (name, dtype), col in zip(COLUMNS, new)]
+        # Stabil sıralama: Aynı zamanlı satırlarda depodaki (önce gelen) kalır
+        order = np.argsort(merged[0], kind="stable")
+        merged = [col[order] for col in merged]
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = merged[0][1:] != merged[0][:-1]
+        merged = [col[keep] for col in merged]
+        added = len(merged[0]) - len(series)
+        if not added:
+            return 0
+
+        # Yeni nesil klasörüne yaz; geçiş tek atomik adım (Katalog kaydı). Yarıda kalırsa
+        # katalog eski nesli gösterir, kolonlar hep birbiriyle tutarlı kalır.
+        meta = self.catalog[symbol]
+        old_gen = meta.get("gen", 0)
+        new_gen = old_gen + 1
+        gen_dir = self._gen_dir(symbol, new_gen)
+        shutil.rmtree(gen_dir, ignore_errors=True)  # Önceki yarım kalmış deneme
+        os.makedirs(gen_dir)
+        for (name, _), col in zip(COLUMNS, merged):
+            with open(self._column_path(symbol, name, new_gen), "wb") as f:
+                f.write(np.ascontiguousarray(col).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        # Eski nesle açık memmap'i bırak (Dosyalar silinecek)
+        series = None
+        self._series.pop(symbol, None)
+
+        meta["gen"] = new_gen
+        meta["rows"] = len(merged[0])
+        meta["first"] = int(merged[0][0])
+        meta["last"] = int(merged[0][-1])
+        self.save_catalog()
+        self._drop_generations(symbol, keep=new_gen)
+        return added
+
+    def _drop_generations(self, symbol, keep):
+        """Katalogun göstermediği mum kolonu nesillerini siler (Funding dosyalarına dokunmaz)."""
+        base = self._gen_dir(symbol)
+        if keep:
+            for name, _ in COLUMNS:
+                try:
+                    os.remove(self._column_path(symbol, name))
+                except OSError:
+                    pass
+        for entry in os.listdir(base):
+            if entry.startswith("g") and entry[1:].isdigit() and int(entry[1:]) != keep:
+                shutil.rmtree(os.path.join(base, entry), ignore_errors=True)
+
+    def gaps(self, symbol, step_ms=60_000):
+        """Depodaki eksik aralıklar: [(başlangıç_ms, bitiş_ms), ...] (Dahil, eksik ilk ve son mum)."""
+        series = self.get(symbol)
+        if series is None or len(series) < 2:
+            return []
+        ts = np.asarray(series.ts)
+        idx = np.flatnonzero(np.diff(ts) > step_ms)
+        return [(int(ts[i]) + step_ms, int(ts[i + 1]) - step_ms) for i in idx]
+
+    # --- FUNDING RATE ---
+    def funding_last_ts(self, symbol):
+        meta = self.catalog.get(symbol.upper(), {}).get("funding")
+        return meta["last"] if meta and meta["rows"] else None
+
+    def append_funding(self, symbol, ts, rates, save=True):
+        """Funding kayıtlarını sona ekler (Son kayıttan eski/aynı zamanlılar atlanır). Dönüş: Eklenen sayı."""
+        symbol = symbol.upper()
+        ts = np.asarray(ts, dtype=np.int64)
+        rates = np.asarray(rates, dtype=np.float64)
+        meta = self._meta(symbol).setdefault("funding", {"rows": 0, "last": None})
+        if meta["rows"]:
+            keep = ts > meta["last"]
+            ts, rates = ts[keep], rates[keep]
+        if len(ts) == 0:
+            return 0
+        if np.any(ts[1:] <= ts[:-1]):
+            raise ValueError(f"{symbol}: Funding zamanları artan sırada olmalı")
+
+        self._write_columns(symbol, FUNDING_COLUMNS, (ts, rates), meta["rows"])
+        meta["rows"] += len(ts)
+        meta["last"] = int(ts[-1])
+        if save:
+            self.save_catalog()
+        return len(ts)
+
+    def funding(self, symbol):
+        """(funding_ts, funding_rate) memmap çifti veya None."""
+        symbol = symbol.upper()
+        meta = self.catalog.get(symbol, {}).get("funding")
+        if not meta or not meta["rows"]:
+            return None
+        cols = self._funding.get(symbol)
+        if cols is None or len(cols[0]) != meta["rows"]:
+            cols = self._funding[symbol] = tuple(
+                np.memmap(self._column_path(symbol, name), dtype=dtype, mode="r", shape=(meta["rows"],))
+                for name, dtype in FUNDING_COLUMNS
+            )
+        return cols
+
+    def funding_at(self, symbol, ts_ms, default=None):
+        """
+        ts_ms anında geçerli funding oranı (O ana kadar uygulanmış son oran). O(log n).
+        ts_ms dizi ise dizi döner (Kayıt öncesi zamanlar için default, dizide NaN).
+        """
+        cols = self.funding(symbol)
+        scalar = np.ndim(ts_ms) == 0
+        if cols is None:
+            return default if scalar else np.full(np.shape(ts_ms), np.nan if default is None else default)
+        ts, rates = cols
+        idx = np.searchsorted(ts, ts_ms, side='right') - 1
+        if scalar:
+            return float(rates[idx]) if idx >= 0 else default
+        return np.where(idx >= 0, rates[np.maximum(idx, 0)], np.nan if default is None else default)
+
+    def import_pickle(self, symbol, file):
+        """Eski {symbol}_1m.pkl DataFrame'ini depoya aktarır (Tek seferlik göç)."""
+        import pandas as pd
+        df = pd.read_pickle(file).sort_values('ts').drop_duplicates('ts')
+        return self.append(symbol, df['ts'].to_numpy(), df['o'].to_numpy(), df['h'].to_numpy(),
+                           df['l'].to_numpy(), df['c'].to_numpy(), df['v'].to_numpy())
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import LLM_CACHE_TTL_SEC, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH
+
+
+class LLMCache:
+    """
+    İçerik adresli LLM yanıt önbelleği.
+    Anahtar: sha256(model, prompt, temperature, json_mode, ...) -> Aynı girdi her yerden aynı anahtar
+    (Telegram + RSS'ten gelen aynı başlık, aynı metinle detect_symbol/generate_search_query).
+    İki katman:
+      - RAM: LRU (OrderedDict), max_entries dolunca en uzun süredir kullanılmayan atılır
+      - Disk (Opsiyonel, path): SQLite; yeniden başlatmada korunur (Backtest tekrarları bedava)
+        Yazma write-behind: put RAM'e yazar, INSERT/commit arka plandaki thread'de (Event loop beklemez)
+        Okuma ayrı bağlantıdan (WAL): aget disk sorgusunu thread'de yapar, yazıcının commit'ini beklemez
+    TTL çağrı türüne göre (ttls[kind]); TTL'i olmayan tür önbelleğe alınmaz.
+    """
+
+    def __init__(self, ttls=LLM_CACHE_TTL_SEC, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 path=LLM_CACHE_PATH, clock=time.time):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.clock = clock
+        self.mem = OrderedDict()  # key -> (value, expires)
+
+        self.conn = None
+        self.writer_thread = None
+        if path:
+            self.lock = threading.Lock()         # Yazma bağlantısı (Yazıcı thread + purge)
+            self.reader_lock = threading.Lock()  # Okuma bağlantısı (get/aget thread'leri)
+            self.write_queue = queue.Queue()
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, kind TEXT, value TEXT, expires REAL)'
+            )
+            self.purge_expired()
+            self.reader_conn = sqlite3.connect(path, check_same_thread=False)
+            self.writer_thread = threading.Thread(target=self._writer_loop, name="llm-cache-writer", daemon=True)
+            self.writer_thread.start()
+
+        # Sayaçlar
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model, prompt, temperature, json_mode, *extra):
+        payload = json.dumps([model, prompt, float(temperature), bool(json_mode), *extra], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Geçerli yanıt veya None (Senkron; event loop'tan aget kullanılmalı)."""
+        value = self._get_mem(key)
+        if value is None and self.conn is not None:
+            value = self._from_disk(key, self._read_disk(key))
+        if value is None:
+            self.misses += 1
+        return value
+
+    async def aget(self, key):
+        """get'in async hali: RAM'de yoksa disk sorgusu thread'de (Event loop bloklanmaz)."""
+        value = self._get_mem(key)
+        if value is None and self.conn is not None:
+            value = self._from_disk(key, await asyncio.to_thread(self._read_disk, key))
+        if value is None:
+            self.misses += 1
+        return value
+
+    def _get_mem(self, key):
+        entry = self.mem.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= self.clock():
+            del self.mem[key]
+            return None
+        self.mem.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _read_disk(self, key):
+        with self.reader_lock:
+            return self.reader_conn.execute('SELECT value, expires FROM llm_cache WHERE key = ?', (key,)).fetchone()
+
+    def _from_disk(self, key, row):
+        if row is None or row[1] <= self.clock():
+            return None
+        self._remember(key, row[0], row[1])
+        self.disk_hits += 1
+        return row[0]
+
+    def put(self, kind, key, value):
+        ttl = self.ttls.get(kind)
+        if not ttl or value is None:
+            return
+        expires = self.clock() + ttl
+        self._remember(key, value, expires)
+        if self.conn is not None:
+            self.write_queue.put((key, kind, value, expires))
+
+    def _writer_loop(self):
+        """Kuyruktaki kayıtları gruplar halinde yazar, her grup için tek commit."""
+        while True:
+            batch = [self.write_queue.get()]
+            while True:
+                try:
+                    batch.append(self.write_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [entry for entry in batch if entry is not None]
+            if rows:
+                try:
+                    with self.lock, self.conn:
+                        self.conn.executemany(
+                            'INSERT OR REPLACE INTO llm_cache (key, kind, value, expires) VALUES (?, ?, ?, ?)', rows
+                        )
+                except Exception as e:
+                    print(f"❌ LLM Cache Yazma Hatası: {e}")
+
+            for _ in batch:
+                self.write_queue.task_done()
+            if len(rows) != len(batch):
+                return
+
+    def flush(self):
+        """Kuyruktaki tüm yazmaların diske inmesini bekler (Senkron)."""
+        if self.conn is not None:
+            self.write_queue.join()
+
+    def _remember(self, key, value, expires):
+        self.mem[key] = (value, expires)
+        self.mem.move_to_end(key)
+        while len(self.mem) > self.max_entries:
+            self.mem.popitem(last=False)
+            self.evictions += 1
+
+    def purge_expired(self):
+        """Diskteki süresi dolmuş kayıtları siler (Açılışta)."""
+        if self.conn is None:
+            return 0
+        with self.lock, self.conn:
+            return self.conn.execute('DELETE FROM llm_cache WHERE expires <= ?', (self.clock(),)).rowcount
+
+    def close(self):
+        """Kuyruğu boşaltır ve bağlantıyı kapatır (Kapanışta çağrılır)."""
+        if self.conn is not None:
+            if self.writer_thread.is_alive():
+                self.write_queue.put(None)
+                self.writer_thread.join()
+            with self.reader_lock:
+                self.reader_conn.close()
+            self.conn.close()
+            self.conn = None
+
+    def stats(self):
+        return {
+            "size": len(self.mem),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
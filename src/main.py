@@ -1,5 +1,5 @@
 import asyncio
-from collections import defaultdict, deque  # <--- 'deque' EKLENDİ
+from collections import deque  # <--- 'deque' EKLENDİ
 import time
 import os
 from nicegui import ui, app
@@ -28,7 +28,9 @@ from config import (
 )
 from exchange import PaperExchange
 from brain import AgentBrain
-from price_buffer import PriceBuffer
+from market_memory import MarketMemory
+from stream_manager import StreamManager
+from ingest import TickIngest
 from binance_client import BinanceExecutionEngine
 from data_collector import TrainingDataCollector
 from dataset_manager import DatasetManager
@@ -62,7 +64,8 @@ if __name__ == "__main__":
     # --- INITIALIZATION ---
     # 1. Objects
     ctx.app_state = SharedState()
-    ctx.market_memory = defaultdict(PriceBuffer)
+    ctx.market_memory = MarketMemory()
+    ctx.ingest = TickIngest()
     ctx.exchange = PaperExchange(STARTING_BALANCE)
     ctx.brain = AgentBrain(
         use_groqcloud=USE_GROQCLOUD,
@@ -76,7 +79,8 @@ if __name__ == "__main__":
     ctx.telegram_client = TelegramClient(
         SESSION_PATH, API_ID, API_HASH, use_ipv6=False, timeout=10
     )
-    ctx.stream_command_queue = None
+    ctx.streams = None
+    ctx.news = None
     ctx.memory = MemoryManager()
 
 
@@ -110,8 +114,9 @@ if __name__ == "__main__":
 
     # --- STARTUP TASKS ---
     async def start_tasks():
-        ctx.memory.load_recent_history(ctx)
-        ctx.stream_command_queue = asyncio.Queue()
+        await ctx.memory.load_recent_history(ctx)
+        ctx.streams = StreamManager(log=ctx.log_ui)
+        ctx.news = services.create_news_pipeline(ctx).start()
         # 1. API Connection & Sync
         if REAL_TRADING_ENABLED:
             await ctx.real_exchange.connect()
@@ -138,16 +143,18 @@ if __name__ == "__main__":
         # 2. Launch Loops
         # asyncio.create_task(services.rss_loop(ctx)) # RSS Loopü devre dışı bırakıldı
         asyncio.create_task(services.websocket_loop(ctx))
+        asyncio.create_task(services.ingest_consumer_loop(ctx))
         asyncio.create_task(services.collector_loop(ctx))
         asyncio.create_task(services.telegram_loop(ctx))
         asyncio.create_task(services.position_monitor_loop(ctx))
+        asyncio.create_task(services.retention_loop(ctx))
 
 
     # --- UI ENTRY POINT ---
     @ui.page("/")
     def index():
         async def manual_news_handler(text, source="MANUAL"):
-            await services.process_news(text, source, ctx)
+            ctx.news.submit(text, source)
 
         # Dashboard'a artık 'ctx' nesnesini de gönderiyoruz
         ctx.log_container = create_dashboard(
@@ -158,4 +165,6 @@ if __name__ == "__main__":
 
 
     app.on_startup(start_tasks)
+    app.on_shutdown(ctx.memory.close)  # DB kuyruğunu boşalt
+    app.on_shutdown(ctx.brain.llm_cache.close)
     ui.run(title="Crypto AI", host="0.0.0.0", dark=True, port=8080, reload=False)
\ No newline at end of file
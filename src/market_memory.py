@@ -0,0 +1,511 @@
+import time
+import numpy as np
+
+
+class CandleView:
+    """
+    Bir sembolün ring buffer'ının eski deque API'si ile uyumlu görünümü.
+    candles[-1] -> (timestamp_minute, close_price), len(), bool(), clear() çalışır.
+    """
+    __slots__ = ("_mem", "_row")
+
+    def __init__(self, mem, row):
+        self._mem = mem
+        self._row = row
+
+    def __len__(self):
+        return int(self._mem.count[self._row])
+
+    def __bool__(self):
+        return bool(self._mem.count[self._row] > 0)
+
+    def __getitem__(self, i):
+        count = len(self)
+        if i < 0: i += count
+        if not 0 <= i < count:
+            raise IndexError("candle index out of range")
+        col = self._mem._col(self._row, i)
+        return int(self._mem.minutes[self._row, col]), float(self._mem.closes[self._row, col])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def clear(self):
+        self._mem.clear_row(self._row)
+
+
+class SymbolView:
+    """
+    MarketMemory içindeki tek bir satırın PriceBuffer API'si.
+    (update_candle, get_change, get_all_changes, calculate_rsi, candles, current_price...)
+    """
+    __slots__ = ("_mem", "_row")
+
+    def __init__(self, mem, row):
+        self._mem = mem
+        self._row = row
+
+    @property
+    def current_price(self):
+        return float(self._mem.current[self._row])
+
+    @current_price.setter
+    def current_price(self, price):
+        self._mem.current[self._row] = price
+
+    @property
+    def change_24h(self):
+        return self._mem._row_change_24h(self._row)
+
+    @property
+    def candles(self):
+        return CandleView(self._mem, self._row)
+
+    def update_candle(self, price, timestamp, is_closed, open_=None, high=None, low=None, volume=0.0):
+        self._mem._update_row(self._row, price, timestamp, is_closed, open_, high, low, volume)
+
+    def load_history(self, candles, hourly=None):
+        self._mem._load_row(self._row, candles, hourly)
+
+    def set_24h_change(self, percent):
+        self._mem.change_24h[self._row] = percent
+
+    def get_change(self, minutes):
+        return self._mem._row_change(self._row, minutes)
+
+    def get_all_changes(self):
+        """Tüm periyotları toplu döndürür"""
+        return {
+            "1m": self.get_change(1),
+            "10m": self.get_change(10),
+            "1h": self.get_change(60),
+            "24h": self.change_24h
+        }
+
+    def calculate_rsi(self, period=14):
+        return self._mem._row_rsi(self._row, period)
+
+    def get_bars(self, timeframe=1, n=None):
+        return self._mem._row_bars(self._row, timeframe, n)
+
+    def atr(self, period=14, timeframe=1):
+        return self._mem._row_atr(self._row, period, timeframe)
+
+    def atr_pct(self, period=14, timeframe=1):
+        price = self.current_price
+        return (self.atr(period, timeframe) / price) * 100 if price else 0.0
+
+    def volatility(self, minutes=60):
+        return self._mem._row_volatility(self._row, minutes)
+
+    def volume_spike(self, lookback=20):
+        return self._mem._row_volume_spike(self._row, lookback)
+
+    def quote_volume_24h(self):
+        return self._mem._row_quote_volume_24h(self._row)
+
+    def get_technicals(self):
+        """Karar anı için hazır volatilite/hacim okumaları (REST çağrısı yok)"""
+        return {
+            "atr_5m": self.atr_pct(14, 5),
+            "volatility_1h": self.volatility(60),
+            "volume_spike": self.volume_spike(20),
+        }
+
+
+class RollupBars:
+    """
+    Tek bir üst zaman dilimi (5m/15m/1h) için OHLCV ring buffer'ı (satır = sembol).
+    1m mumlar kapandıkça artımlı olarak birleştirilir; son bar o anki kısmi bardır.
+    """
+    _ARRAYS = ("buckets", "opens", "highs", "lows", "closes", "volumes", "head", "count", "floor")
+
+    def __init__(self, minutes, capacity, rows):
+        self.minutes = minutes
+        self.capacity = capacity
+        self._alloc(rows)
+
+    def _alloc(self, rows):
+        cap = self.capacity
+        self.buckets = np.zeros((rows, cap), dtype=np.int64)  # dakika // zaman dilimi
+        self.opens = np.zeros((rows, cap), dtype=np.float64)
+        self.highs = np.zeros((rows, cap), dtype=np.float64)
+        self.lows = np.zeros((rows, cap), dtype=np.float64)
+        self.closes = np.zeros((rows, cap), dtype=np.float64)
+        self.volumes = np.zeros((rows, cap), dtype=np.float64)
+        self.head = np.zeros(rows, dtype=np.int64)
+        self.count = np.zeros(rows, dtype=np.int64)
+        self.floor = np.zeros(rows, dtype=np.int64)  # Bu dakikadan eski 1m mumlar yok sayılır
+
+    def grow(self, rows):
+        old = {name: getattr(self, name) for name in self._ARRAYS}
+        n = len(self.count)
+        self._alloc(rows)
+        for name, arr in old.items():
+            getattr(self, name)[:n] = arr
+
+    def clear_row(self, row):
+        self.head[row] = 0
+        self.count[row] = 0
+        self.floor[row] = 0
+
+    def _push(self, row, bucket, o, h, l, c, v):
+        head = self.head[row]
+        self.buckets[row, head] = bucket
+        self.opens[row, head] = o
+        self.highs[row, head] = h
+        self.lows[row, head] = l
+        self.closes[row, head] = c
+        self.volumes[row, head] = v
+        self.head[row] = (head + 1) % self.capacity
+        if self.count[row] < self.capacity:
+            self.count[row] += 1
+
+    def add(self, row, minute_ts, o, h, l, c, v):
+        if minute_ts < self.floor[row]: return
+        bucket = minute_ts // self.minutes
+        last = (self.head[row] - 1) % self.capacity
+        if self.count[row] and self.buckets[row, last] == bucket:
+            # Aynı bar: High/Low/Close/Volume birleştir
+            if h > self.highs[row, last]: self.highs[row, last] = h
+            if l < self.lows[row, last]: self.lows[row, last] = l
+            self.closes[row, last] = c
+            self.volumes[row, last] += v
+        else:
+            self._push(row, bucket, o, h, l, c, v)
+
+    def load(self, row, bars, floor):
+        """bars: [(open_time_sec, o, h, l, c, v), ...] -> REST'ten hazır barlar"""
+        self.clear_row(row)
+        for t, o, h, l, c, v in bars:
+            self._push(row, int(t / 60) // self.minutes, o, h, l, c, v)
+        self.floor[row] = floor
+
+    def ordered(self, row, field, n=None):
+        """Son n barın 'field' değerleri (eskiden yeniye)."""
+        count = int(self.count[row])
+        n = count if n is None else min(n, count)
+        cols = (self.head[row] - n + np.arange(n)) % self.capacity
+        return getattr(self, field)[row, cols]
+
+
+class MarketMemory:
+    """
+    Tüm semboller için kolon bazlı piyasa hafızası.
+    Satırlar semboller, kolonlar son 'capacity' dakikanın kapanışları (ring buffer).
+    Toplu sorgular (tüm fiyatlar, tüm 1h değişimler, bayat semboller) tek dizi işlemidir.
+    Semboller küçük harfe normalize edilir ('BTCUSDT' ve 'btcusdt' aynı satır).
+    1m OHLCV tutulur; 5m/15m/1h barlar 1m mumlar kapandıkça artımlı güncellenir.
+    """
+
+    # Zaman dilimi (dakika) -> tutulacak bar sayısı
+    ROLLUPS = {5: 48, 15: 32, 60: 24}
+
+    def __init__(self, capacity=60, rsi_period=14, initial_rows=128):
+        self.capacity = capacity
+        self.rsi_period = rsi_period
+        self.index = {}    # sembol -> satır
+        self.symbols = []  # satır -> sembol
+        rows = max(1, initial_rows)
+        self._alloc(rows)
+        self.rollups = {tf: RollupBars(tf, cap, rows) for tf, cap in self.ROLLUPS.items()}
+
+    # --- DEPOLAMA ---
+    def _alloc(self, rows):
+        cap = self.capacity
+        self.minutes = np.zeros((rows, cap), dtype=np.int64)
+        self.opens = np.zeros((rows, cap), dtype=np.float64)
+        self.highs = np.zeros((rows, cap), dtype=np.float64)
+        self.lows = np.zeros((rows, cap), dtype=np.float64)
+        self.closes = np.zeros((rows, cap), dtype=np.float64)
+        self.volumes = np.zeros((rows, cap), dtype=np.float64)  # Quote (USDT) hacmi
+        self.head = np.zeros(rows, dtype=np.int64)   # Bir sonraki yazılacak kolon
+        self.count = np.zeros(rows, dtype=np.int64)
+        self.current = np.zeros(rows, dtype=np.float64)
+        self.change_24h = np.zeros(rows, dtype=np.float64)
+        # Wilder RSI durumu (Her kapanan mumda bir kez güncellenir)
+        self.n_deltas = np.zeros(rows, dtype=np.int64)
+        self.gain_sum = np.zeros(rows, dtype=np.float64)
+        self.loss_sum = np.zeros(rows, dtype=np.float64)
+        self.avg_gain = np.zeros(rows, dtype=np.float64)
+        self.avg_loss = np.zeros(rows, dtype=np.float64)
+
+    _ARRAYS = (
+        "minutes", "opens", "highs", "lows", "closes", "volumes", "head", "count", "current", "change_24h",
+        "n_deltas", "gain_sum", "loss_sum", "avg_gain", "avg_loss",
+    )
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name in self._ARRAYS}
+        rows = len(self.current)
+        self._alloc(rows * 2)
+        for name, arr in old.items():
+            getattr(self, name)[:rows] = arr
+        for bars in self.rollups.values():
+            bars.grow(rows * 2)
+
+    def row_for(self, symbol, create=True):
+        symbol = symbol.lower()
+        row = self.index.get(symbol)
+        if row is None and create:
+            row = len(self.symbols)
+            if row >= len(self.current):
+                self._grow()
+            self.index[symbol] = row
+            self.symbols.append(symbol)
+        return row
+
+    # --- SÖZLÜK UYUMLULUĞU (Eski defaultdict(PriceBuffer) kullanımı) ---
+    def __getitem__(self, symbol):
+        # defaultdict gibi: Yoksa oluşturur
+        return SymbolView(self, self.row_for(symbol))
+
+    def get(self, symbol, default=None):
+        row = self.row_for(symbol, create=False)
+        return default if row is None else SymbolView(self, row)
+
+    def __contains__(self, symbol):
+        return symbol.lower() in self.index
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __iter__(self):
+        return iter(list(self.symbols))
+
+    def keys(self):
+        return list(self.symbols)
+
+    def items(self):
+        return [(sym, SymbolView(self, row)) for row, sym in enumerate(self.symbols)]
+
+    # --- SATIR İŞLEMLERİ ---
+    def _col(self, row, i):
+        """Mantıksal indeks (0 = en eski) -> kolon."""
+        return (self.head[row] - self.count[row] + i) % self.capacity
+
+    def _close_at(self, row, minutes_back):
+        """[-minutes_back] elemanının kapanışı (1 = son mum)."""
+        return float(self.closes[row, (self.head[row] - minutes_back) % self.capacity])
+
+    def clear_row(self, row):
+        self.head[row] = 0
+        self.count[row] = 0
+        self.n_deltas[row] = 0
+        self.gain_sum[row] = 0.0
+        self.loss_sum[row] = 0.0
+        self.avg_gain[row] = 0.0
+        self.avg_loss[row] = 0.0
+        for bars in self.rollups.values():
+            bars.clear_row(row)
+
+    def _append(self, row, minute_ts, price, open_, high, low, volume):
+        # RSI: Önceki kapanışa göre delta (Wilder smoothing)
+        if self.count[row]:
+            delta = price - self._close_at(row, 1)
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+            period = self.rsi_period
+            n = int(self.n_deltas[row]) + 1
+            self.n_deltas[row] = n
+            if n <= period:
+                # Başlangıç: İlk 'period' deltanın basit ortalaması
+                self.gain_sum[row] += gain
+                self.loss_sum[row] += loss
+                if n == period:
+                    self.avg_gain[row] = self.gain_sum[row] / period
+                    self.avg_loss[row] = self.loss_sum[row] / period
+            else:
+                self.avg_gain[row] = (self.avg_gain[row] * (period - 1) + gain) / period
+                self.avg_loss[row] = (self.avg_loss[row] * (period - 1) + loss) / period
+
+        head = self.head[row]
+        self.minutes[row, head] = minute_ts
+        self.opens[row, head] = open_
+        self.highs[row, head] = high
+        self.lows[row, head] = low
+        self.closes[row, head] = price
+        self.volumes[row, head] = volume
+        self.head[row] = (head + 1) % self.capacity
+        if self.count[row] < self.capacity:
+            self.count[row] += 1
+
+        for bars in self.rollups.values():
+            bars.add(row, minute_ts, open_, high, low, price, volume)
+
+    def _update_row(self, row, price, timestamp, is_closed, open_=None, high=None, low=None, volume=0.0):
+        """
+        Websocket'ten gelen mum verisini işler.
+        is_closed: Mum kapandı mı? (True ise listeye ekle, False ise sadece anlık fiyatı güncelle)
+        open_/high/low/volume verilmezse kapanış fiyatı kullanılır (Eski çağrılar için).
+        """
+        self.current[row] = price
+
+        if is_closed:
+            # Dakikayı yuvarla (Timestamp -> Dakika)
+            minute_ts = int(timestamp / 60)
+            # Eğer son eklenen veri bu dakika değilse ekle (Çift eklemeyi önle)
+            if not self.count[row] or self.minutes[row, (self.head[row] - 1) % self.capacity] != minute_ts:
+                self._append(
+                    row, minute_ts, price,
+                    price if open_ is None else open_,
+                    price if high is None else high,
+                    price if low is None else low,
+                    volume,
+                )
+
+    def update_candle(self, symbol, price, timestamp, is_closed, open_=None, high=None, low=None, volume=0.0):
+        self._update_row(self.row_for(symbol), price, timestamp, is_closed, open_, high, low, volume)
+
+    def update_ticker(self, symbol, price, open_24h):
+        """miniTicker: Sadece anlık fiyat ve 24h değişim (Mum eklemez)"""
+        row = self.row_for(symbol)
+        self.current[row] = price
+        if open_24h:
+            self.change_24h[row] = (price - open_24h) / open_24h * 100
+
+    def _load_row(self, row, candles, hourly=None):
+        """
+        REST backfill: candles/hourly -> [(open_time_sec, o, h, l, c, v), ...]
+        hourly verilirse 1h barlar (24h değişim/hacim) doğrudan yüklenir,
+        1m mumlar sadece 5m/15m barları ve 1h'in canlı kısmını besler.
+        """
+        self.clear_row(row)
+        if hourly and candles:
+            # REST'in son 1h barı o ana kadarki dakikaları zaten içeriyor
+            self.rollups[60].load(row, hourly, int(candles[-1][0] / 60) + 1)
+        for t, o, h, l, c, v in candles:
+            self._update_row(row, c, t, True, o, h, l, v)
+        if candles:
+            self.current[row] = candles[-1][4]
+
+    def load_history(self, symbol, candles, hourly=None):
+        self._load_row(self.row_for(symbol), candles, hourly)
+
+    def _row_change(self, row, minutes):
+        count = int(self.count[row])
+        current = float(self.current[row])
+        if not count or current == 0:
+            return 0.0
+        # Yeterli veri yoksa en eski veriyi kullan, varsa [-minutes] elemanı
+        old_price = self._close_at(row, min(minutes, count))
+        if old_price == 0: return 0.0
+        return ((current - old_price) / old_price) * 100
+
+    def _row_rsi(self, row, period=14):
+        count = int(self.count[row])
+        if count < period + 1: return 50.0 # Veri yoksa nötr
+
+        if period == self.rsi_period and self.n_deltas[row] >= period:
+            avg_gain, avg_loss = float(self.avg_gain[row]), float(self.avg_loss[row])
+        else:
+            # Farklı periyot istendiyse buffer üzerinden Wilder hesabı (Nadir yol)
+            closes = self.closes[row, [self._col(row, i) for i in range(count)]]
+            deltas = np.diff(closes)
+            gains = np.clip(deltas, 0, None)
+            losses = np.clip(-deltas, 0, None)
+            avg_gain = gains[:period].mean()
+            avg_loss = losses[:period].mean()
+            for g, l in zip(gains[period:], losses[period:]):
+                avg_gain = (avg_gain * (period - 1) + g) / period
+                avg_loss = (avg_loss * (period - 1) + l) / period
+
+        if avg_loss == 0: return 100.0
+        rs = avg_gain / avg_loss
+        return float(100 - (100 / (1 + rs)))
+
+    # --- OHLCV OKUMALARI ---
+    def _ordered(self, row, arr, n=None):
+        """1m dizisinin son n elemanı (eskiden yeniye)."""
+        count = int(self.count[row])
+        n = count if n is None else min(n, count)
+        cols = (self.head[row] - n + np.arange(n)) % self.capacity
+        return arr[row, cols]
+
+    def _row_bars(self, row, timeframe=1, n=None):
+        """(minute, open, high, low, close, volume) dizileri; timeframe: 1, 5, 15, 60"""
+        if timeframe == 1:
+            return tuple(
+                self._ordered(row, arr, n)
+                for arr in (self.minutes, self.opens, self.highs, self.lows, self.closes, self.volumes)
+            )
+        bars = self.rollups[timeframe]
+        return (bars.ordered(row, "buckets", n) * timeframe,) + tuple(
+            bars.ordered(row, field, n) for field in ("opens", "highs", "lows", "closes", "volumes")
+        )
+
+    def _row_atr(self, row, period=14, timeframe=1):
+        _, _, highs, lows, closes, _ = self._row_bars(row, timeframe, period + 1)
+        if len(closes) < 2: return 0.0
+        prev_close = closes[:-1]
+        tr = np.maximum(highs[1:] - lows[1:], np.maximum(np.abs(highs[1:] - prev_close), np.abs(lows[1:] - prev_close)))
+        return float(tr.mean())
+
+    def _row_volatility(self, row, minutes=60):
+        """1m log getirilerinin standart sapması (%)"""
+        closes = self._ordered(row, self.closes, minutes + 1)
+        if len(closes) < 3 or np.any(closes <= 0): return 0.0
+        return float(np.diff(np.log(closes)).std() * 100)
+
+    def _row_volume_spike(self, row, lookback=20):
+        """Son kapanan 1m hacmi / önceki 'lookback' mumun ortalama hacmi"""
+        volumes = self._ordered(row, self.volumes, lookback + 1)
+        if len(volumes) < 2: return 0.0
+        base = volumes[:-1].mean()
+        return float(volumes[-1] / base) if base > 0 else 0.0
+
+    def _row_quote_volume_24h(self, row):
+        bars = self.rollups[60]
+        if bars.count[row] < bars.capacity: return None
+        return float(bars.volumes[row].sum())
+
+    def _row_change_24h(self, row):
+        """1h barlar 24 saati kapsıyorsa yerelden, yoksa Binance'den gelen değer"""
+        bars = self.rollups[60]
+        current = self.current[row]
+        if bars.count[row] >= bars.capacity and current:
+            old_open = bars.ordered(row, "opens", bars.capacity)[0]
+            if old_open:
+                return float((current - old_open) / old_open * 100)
+        return float(self.change_24h[row])
+
+    # --- TOPLU (VEKTÖREL) SORGULAR ---
+    def _used(self):
+        return len(self.symbols)
+
+    def current_prices(self):
+        """Fiyatı olan tüm semboller: {sembol: fiyat}"""
+        n = self._used()
+        prices = self.current[:n]
+        rows = np.flatnonzero(prices > 0)
+        return dict(zip([self.symbols[r] for r in rows], prices[rows].tolist()))
+
+    def changes(self, minutes):
+        """Tüm semboller için yüzde değişim dizisi (satır sırasıyla)."""
+        n = self._used()
+        count = self.count[:n]
+        current = self.current[:n]
+        back = np.minimum(minutes, np.maximum(count, 1))
+        cols = (self.head[:n] - back) % self.capacity
+        old = self.closes[np.arange(n), cols]
+        valid = (count > 0) & (current != 0) & (old != 0)
+        out = np.zeros(n, dtype=np.float64)
+        np.divide((current - old) * 100, old, out=out, where=valid)
+        return out
+
+    def stale_symbols(self, max_age_minutes, now=None):
+        """Son kapanan mumu max_age_minutes'tan eski (veya hiç mumu olmayan) semboller."""
+        n = self._used()
+        current_minute = int((now or time.time()) / 60)
+        last_minute = self.minutes[np.arange(n), (self.head[:n] - 1) % self.capacity]
+        stale = (self.count[:n] == 0) | ((current_minute - last_minute) > max_age_minutes)
+        return [self.symbols[r] for r in np.flatnonzero(stale)]
+
+    def snapshot(self, minutes=60):
+        """Dashboard için: Fiyatı olan semboller [(sembol, fiyat, değişim%), ...]"""
+        n = self._used()
+        prices = self.current[:n]
+        chg = self.changes(minutes)
+        rows = np.flatnonzero(prices > 0)
+        return [(self.symbols[r], float(prices[r]), float(chg[r])) for r in rows]
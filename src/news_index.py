@@ -0,0 +1,121 @@
+import re
+import time
+import random
+from collections import deque
+
+# TF-IDF'in 'english' listesinin en sık geçen kısmı (Benzerliği bunlar şişirmesin)
+STOP_WORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'if', 'of', 'to', 'in', 'on', 'at', 'by', 'for',
+    'with', 'from', 'as', 'is', 'are', 'was', 'were', 'be', 'been', 'has', 'have', 'had',
+    'it', 'its', 'this', 'that', 'these', 'those', 'will', 'would', 'can', 'could', 'not',
+    'no', 'so', 'than', 'then', 'there', 'their', 'they', 'he', 'she', 'we', 'you', 'i',
+    'his', 'her', 'our', 'your', 'after', 'before', 'over', 'into', 'about', 'up', 'out',
+    'just', 'more', 'most', 'new', 'now', 'all', 'also', 'which', 'who', 'what', 'when',
+}
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+class NewsIndex:
+    """
+    Yakın-kopya haber tespiti için bellek içi MinHash/LSH indeksi.
+    - add(): O(1) (haber başına sabit sayıda bant güncellemesi)
+    - query(): Sadece aynı LSH kovasına düşen adaylarla kesin benzerlik hesaplar
+    - window_sec dışına çıkan haberler otomatik olarak düşer
+    """
+
+    def __init__(self, window_sec=24 * 60 * 60, bands=16, rows=3, seed=42):
+        self.window_sec = window_sec
+        self.bands = bands
+        self.rows = rows
+
+        # MinHash permütasyonları: (a * h + b) mod p
+        rnd = random.Random(seed)
+        self.perms = [
+            (rnd.randrange(1, _MERSENNE_PRIME), rnd.randrange(0, _MERSENNE_PRIME))
+            for _ in range(bands * rows)
+        ]
+
+        self.entries = deque()  # (id, timestamp, tokens, band_keys) -> zaman sıralı
+        self.buckets = {}       # band_key -> {id: tokens}
+        self.next_id = 0
+
+    # --- METİN HAZIRLIĞI ---
+    @staticmethod
+    def clean_text(text):
+        text = text.lower()
+        text = re.sub(r'http\S+', '', text)
+        text = re.sub(r'[^\w\s]', '', text)
+        return text
+
+    def tokenize(self, text):
+        return frozenset(w for w in self.clean_text(text).split() if w not in STOP_WORDS)
+
+    def _band_keys(self, tokens):
+        hashes = [hash(t) & 0xFFFFFFFF for t in tokens]
+        signature = [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self.perms]
+        return [
+            (band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    # --- ZAMAN PENCERESİ ---
+    def expire(self, now=None):
+        limit_time = (now or time.time()) - self.window_sec
+        while self.entries and self.entries[0][1] <= limit_time:
+            entry_id, _, _, band_keys = self.entries.popleft()
+            for key in band_keys:
+                bucket = self.buckets.get(key)
+                if bucket is None: continue
+                bucket.pop(entry_id, None)
+                if not bucket:
+                    del self.buckets[key]
+
+    # --- ANA API ---
+    def add(self, text, timestamp=None):
+        tokens = self.tokenize(text)
+        if not tokens: return
+
+        timestamp = timestamp or time.time()
+        if timestamp <= time.time() - self.window_sec: return
+        self.expire()
+
+        entry_id = self.next_id
+        self.next_id += 1
+        band_keys = self._band_keys(tokens)
+        for key in band_keys:
+            self.buckets.setdefault(key, {})[entry_id] = tokens
+        self.entries.append((entry_id, timestamp, tokens, band_keys))
+
+    def query(self, text):
+        """En benzer haberin skorunu döndürür (Binary vektörlerde cosine benzerliği)."""
+        tokens = self.tokenize(text)
+        if not tokens: return None
+
+        self.expire()
+        if not self.entries: return 0.0
+
+        seen = set()
+        best = 0.0
+        for key in self._band_keys(tokens):
+            bucket = self.buckets.get(key)
+            if not bucket: continue
+            for entry_id, other in bucket.items():
+                if entry_id in seen: continue
+                seen.add(entry_id)
+                common = len(tokens & other)
+                if not common: continue
+                score = common / (len(tokens) * len(other)) ** 0.5
+                if score > best:
+                    best = score
+        return best
+
+    def rebuild(self, rows):
+        """rows: [(content, timestamp), ...] -> İndeksi sıfırdan kurar (Açılışta DB'den)."""
+        self.entries.clear()
+        self.buckets.clear()
+        for content, timestamp in sorted(rows, key=lambda r: r[1]):
+            self.add(content, timestamp)
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,260 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter, deque
+
+from config import NEWS_STAGE_WORKERS, NEWS_STAGE_BUDGET_SEC, NEWS_QUEUE_MAX, NEWS_MAX_AGE_SEC
+
+# Aşamalar (Sırayla): Tespit -> Veri toplama -> LLM kararı -> İşlem
+DETECT, ENRICH, DECIDE, EXECUTE = "detect", "enrich", "decide", "execute"
+STAGES = (DETECT, ENRICH, DECIDE, EXECUTE)
+
+
+class Abort(Exception):
+    """Aşama işi bilerek bırakır. kind: Sayaç anahtarı, reason: Kaydedilen açıklama."""
+
+    def __init__(self, kind, reason):
+        super().__init__(reason)
+        self.kind = kind
+        self.reason = reason
+
+
+class NewsItem:
+    """Kuyruğa giren tek haber. deadline geçtiyse hiçbir aşamada işlenmez."""
+    __slots__ = ("msg", "source", "received_at", "deadline", "shared",
+                 "enqueued_at", "stage_deadline", "timings")
+
+    def __init__(self, msg, source, received_at, deadline):
+        self.msg = msg
+        self.source = source
+        self.received_at = received_at
+        self.deadline = deadline
+        self.shared = {}  # Haberin tüm pariteleri için ortak işler (BTC trendi, coin listesi)
+        self.enqueued_at = received_at
+        self.stage_deadline = deadline  # Çalışan aşamanın bitmesi gereken an
+        self.timings = {}               # aşama -> (kuyrukta bekleme, çalışma) sn
+
+
+class PairJob:
+    """Haberde tespit edilen tek parite. Aşamalar sonuçlarını data'ya yazar."""
+    __slots__ = ("item", "pair", "data", "enqueued_at", "stage_deadline", "timings")
+
+    def __init__(self, item, pair):
+        self.item = item
+        self.pair = pair
+        self.data = {}
+        self.enqueued_at = item.received_at
+        self.stage_deadline = item.deadline
+        self.timings = {}
+
+    def time_left(self, clock=time.time):
+        """Çalışan aşamanın kalan süresi (sn)."""
+        return self.stage_deadline - clock()
+
+
+class StageQueue:
+    """
+    Sınırlı öncelik kuyruğu (Küçük anahtar önce çıkar).
+    Dolunca en düşük öncelikli iş düşürülür (Yeni gelen daha kötüyse kendisi).
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.heap = []
+        self.seq = itertools.count()  # Eşit anahtarlarda FIFO
+        self.event = asyncio.Event()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def put(self, key, job):
+        """Dönüş: Yer açmak için düşürülen iş veya None."""
+        entry = (key, next(self.seq), job)
+        if len(self.heap) < self.maxsize:
+            heapq.heappush(self.heap, entry)
+            self.event.set()
+            return None
+        worst = max(range(len(self.heap)), key=self.heap.__getitem__)
+        if entry >= self.heap[worst]:
+            return job
+        dropped = self.heap[worst][2]
+        self.heap[worst] = entry
+        heapq.heapify(self.heap)
+        return dropped
+
+    async def get(self):
+        while not self.heap:
+            self.event.clear()
+            await self.event.wait()
+        return heapq.heappop(self.heap)[2]
+
+
+class NewsPipeline:
+    """
+    Haber işleme hattı: detect -> enrich -> decide -> execute.
+    Her aşamanın kendi öncelik kuyruğu ve sabit sayıda worker'ı var; aşama başına
+    eşzamanlılık sınırlı olduğu için yoğunlukta LLM/Borsa yükü artmaz, iş kuyrukta bekler.
+
+    Öncelik: Taze haber önce. Parite aşamalarında boost(pair) saniyesi kadar "daha taze"
+    sayılır (Açık pozisyon, büyük market cap). Son tarihi (deadline) geçen iş kuyruktan
+    çıktığında düşürülür -> Karar süresi kuyruk uzunluğuyla değil, max_age ile sınırlı.
+
+    Süre bütçesi: Her aşama en fazla budgets[aşama] sn (ve haberin kalan süresi kadar) çalışır,
+    aşılırsa iptal edilir (None: Sınırsız). İş job.stage_deadline ile kalan süreyi görür (Opsiyonel adımları
+    atlamak için). Her iptal/düşürme sebebiyle kaydedilir (aborts, abort_log).
+
+    handlers: {aşama: async fn(iş)}
+      detect(NewsItem) -> PairJob listesi
+      enrich/decide(PairJob) -> Bir sonraki aşamaya geçecekse True
+      execute(PairJob) -> Dönüş önemsiz
+      Aşamalar Abort(tür, sebep) fırlatarak işi bilerek bırakabilir.
+    """
+
+    def __init__(self, handlers, workers=NEWS_STAGE_WORKERS, budgets=NEWS_STAGE_BUDGET_SEC,
+                 max_queue=NEWS_QUEUE_MAX, max_age=NEWS_MAX_AGE_SEC, boost=None, log=print,
+                 clock=time.time):
+        self.handlers = handlers
+        self.workers = workers
+        self.budgets = budgets
+        self.max_age = max_age
+        self.boost = boost or (lambda pair: 0.0)
+        self.log = log
+        self.clock = clock
+        self.queues = {stage: StageQueue(max_queue) for stage in STAGES}
+        self.tasks = []
+
+        # Sayaçlar (Dashboard'da gösterilir)
+        self.received = 0
+        self.busy = dict.fromkeys(STAGES, 0)
+        self.done = dict.fromkeys(STAGES, 0)
+        self.dropped = 0
+        self.failed = 0
+        self.aborts = Counter()                    # (aşama, sebep türü) -> adet
+        self.abort_log = deque(maxlen=100)         # (zaman, aşama, parite, sebep, geçen sn)
+        self.decision_latency = deque(maxlen=200)  # Haber -> LLM kararı (sn)
+        self.stage_latency = {stage: deque(maxlen=200) for stage in STAGES}  # Aşama çalışma süresi
+
+    # --- GİRİŞ ---
+    def submit(self, msg, source):
+        """Telegram/RSS/Manuel girişi (Senkron, beklemez)."""
+        now = self.clock()
+        self.received += 1
+        self._put(DETECT, NewsItem(msg, source, now, now + self.max_age))
+
+    def _priority(self, stage, job):
+        if stage == DETECT:
+            return -job.received_at
+        return -(job.item.received_at + self.boost(job.pair))
+
+    def _put(self, stage, job):
+        job.enqueued_at = self.clock()
+        dropped = self.queues[stage].put(self._priority(stage, job), job)
+        if dropped is not None:
+            self.dropped += 1
+            self._abort(stage, dropped, "queue_full", "Kuyruk dolu, düşük öncelikli iş atıldı")
+
+    def _abort(self, stage, job, kind, reason):
+        """İptali kaydeder. kind: Sayaç anahtarı (deadline/budget/queue_full/Abort sebebi)."""
+        item = job if stage == DETECT else job.item
+        pair = getattr(job, "pair", "-")
+        elapsed = self.clock() - item.received_at
+        self.aborts[(stage, kind)] += 1
+        self.abort_log.append((time.strftime("%H:%M:%S"), stage, pair, reason, round(elapsed, 2)))
+        self.log(f"⌛ [PIPELINE] İptal ({stage}, {pair}, {elapsed:.1f}s): {reason} | {item.msg[:40]}...", "warning")
+
+    # --- WORKER'LAR ---
+    def start(self):
+        for stage in STAGES:
+            for _ in range(self.workers[stage]):
+                self.tasks.append(asyncio.create_task(self._worker(stage)))
+        return self
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    @staticmethod
+    async def _run(handler, job):
+        """
+        İşin kendi içinden kaçan TimeoutError (Örn. ağ zaman aşımı) bütçe aşımıyla karışmasın:
+        wait_for dışında görülen TimeoutError sadece aşama bütçesinden gelir.
+        """
+        try:
+            return await handler(job)
+        except asyncio.TimeoutError as e:
+            raise RuntimeError(f"İç zaman aşımı: {e!r}") from e
+
+    async def _worker(self, stage):
+        handler = self.handlers[stage]
+        queue = self.queues[stage]
+        while True:
+            job = await queue.get()
+            item = job if stage == DETECT else job.item
+            started = self.clock()
+            remaining = item.deadline - started
+            if remaining <= 0:
+                self._abort(stage, job, "deadline", f"Haber {self.max_age}s süresini kuyrukta doldurdu")
+                continue
+
+            # Aşama bütçesi: Kendi limiti veya haberin kalan süresi (Hangisi kısaysa)
+            # None: Zaman aşımı yok (Örn. gönderilmiş emir yarıda kesilmez)
+            budget = self.budgets.get(stage, remaining)
+            timeout = None if budget is None else min(budget, remaining)
+            job.stage_deadline = started + (remaining if timeout is None else timeout)
+            self.busy[stage] += 1
+            try:
+                result = await asyncio.wait_for(self._run(handler, job), timeout)
+            except asyncio.TimeoutError as e:
+                # Bütçe aşımı: Süre tanımlı ve gerçekten dolmuş (Loop saati ile clock arası küçük pay)
+                if timeout is not None and self.clock() >= job.stage_deadline - 0.05:
+                    self._abort(stage, job, "budget", f"{stage} bütçesi aşıldı ({timeout:.1f}s)")
+                else:
+                    self.failed += 1
+                    self.log(f"💥 [PIPELINE] {stage} hatası: {e!r}", "error")
+                continue
+            except Abort as e:
+                self._abort(stage, job, e.kind, e.reason)
+                continue
+            except Exception as e:
+                # Tek işin hatası worker'ı öldürmez
+                self.failed += 1
+                self.log(f"💥 [PIPELINE] {stage} hatası: {e}", "error")
+                continue
+            finally:
+                self.busy[stage] -= 1
+                run = self.clock() - started
+                job.timings[stage] = (started - job.enqueued_at, run)
+                self.stage_latency[stage].append(run)
+            self.done[stage] += 1
+
+            if stage == DETECT:
+                for pair_job in result or ():
+                    self._put(ENRICH, pair_job)
+            elif stage == ENRICH and result:
+                self._put(DECIDE, job)
+            elif stage == DECIDE:
+                self.decision_latency.append(self.clock() - item.received_at)
+                if result:
+                    self._put(EXECUTE, job)
+
+    def stats(self):
+        lat = sorted(self.decision_latency)
+        return {
+            "received": self.received,
+            "depth": {stage: len(q) for stage, q in self.queues.items()},
+            "busy": dict(self.busy),
+            "done": dict(self.done),
+            "aborted": sum(self.aborts.values()),
+            "aborts": {f"{stage}:{kind}": n for (stage, kind), n in self.aborts.items()},
+            "last_abort": self.abort_log[-1] if self.abort_log else None,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "stage_p50": {
+                stage: sorted(d)[len(d) // 2] if d else 0.0 for stage, d in self.stage_latency.items()
+            },
+            "latency_p50": lat[len(lat) // 2] if lat else 0.0,
+            "latency_max": lat[-1] if lat else 0.0,
+        }
@@ -1,78 +1,20 @@
-from collections import deque
+from market_memory import MarketMemory, SymbolView
 
-class PriceBuffer:
-    def __init__(self):
-        # Sadece son 60 dakikanın kapanış fiyatlarını tutar.
-        # Her eleman: (timestamp_minute, close_price)
-        self.candles = deque(maxlen=60) 
-        self.current_price = 0.0
-        self.change_24h = 0.0 # Binance'den hazır gelecek
 
-    def update_candle(self, price, timestamp, is_closed):
-        """
-        Websocket'ten gelen mum verisini işler.
-        is_closed: Mum kapandı mı? (True ise listeye ekle, False ise sadece anlık fiyatı güncelle)
-        """
-        self.current_price = price
-        
-        # Eğer mum kapandıysa listeye kalıcı olarak ekle (Tarihçeyi oluştur)
-        if is_closed:
-            # Dakikayı yuvarla (Timestamp -> Dakika)
-            minute_ts = int(timestamp / 60)
-            
-            # Eğer son eklenen veri bu dakika değilse ekle (Çift eklemeyi önle)
-            if not self.candles or self.candles[-1][0] != minute_ts:
-                self.candles.append((minute_ts, price))
+class PriceBuffer(SymbolView):
+    """
+    Tek sembollük bağımsız buffer (Son 60 dakikanın kapanışları).
+    Depolama ve RSI hesabı MarketMemory ile aynıdır; tek satırlık özel bir hafıza kullanır.
+    """
+    __slots__ = ()
 
-    def set_24h_change(self, percent):
-        self.change_24h = percent
+    def __init__(self, capacity=60, rsi_period=14):
+        mem = MarketMemory(capacity=capacity, rsi_period=rsi_period, initial_rows=1)
+        super().__init__(mem, mem.row_for("_"))
 
-    def get_change(self, minutes):
-        """
-        Geçmişe bakıp yüzde değişimini hesaplar.
-        minutes: 1, 10, 60 gibi.
-        """
-        if not self.candles or self.current_price == 0:
-            return 0.0
-            
-        # Hedeflenen eski fiyatı bulmaya çalış
-        # Listemiz [(ts, price), (ts, price)...] şeklinde sondan başa doğru
-        # Şu anki zamandan 'minutes' kadar geriye gitmemiz lazım ama 
-        # en basiti listenin sonundan 'minutes' kadar gerideki elemanı almak.
-        
-        if len(self.candles) < minutes:
-            # Yeterli veri yoksa en eski veriyi kullan
-            old_price = self.candles[0][1]
-        else:
-            # [-1] son dakika, [-minutes] istenen dakika
-            old_price = self.candles[-minutes][1]
-            
-        if old_price == 0: return 0.0
-        
-        return ((self.current_price - old_price) / old_price) * 100
-    
-    def get_all_changes(self):
-        """Tüm periyotları toplu döndürür"""
-        return {
-            "1m": self.get_change(1),
-            "10m": self.get_change(10),
-            "1h": self.get_change(60),
-            "24h": self.change_24h
-        }
+    @property
+    def capacity(self):
+        return self._mem.capacity
 
-    def calculate_rsi(self, period=14):
-        if len(self.candles) < period + 1: return 50.0 # Veri yoksa nötr
-        
-        # Kapanış fiyatlarını al
-        closes = [c[1] for c in self.candles]
-        
-        deltas = [closes[i+1] - closes[i] for i in range(len(closes)-1)]
-        gains = [d if d > 0 else 0 for d in deltas]
-        losses = [-d if d < 0 else 0 for d in deltas]
-
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
-        
-        if avg_loss == 0: return 100.0
-        rs = avg_gain / avg_loss
-        return 100 - (100 / (1 + rs))
\ No newline at end of file
+    def clear(self):
+        self._mem.clear_row(self._row)
@@ -35,6 +35,7 @@ ANALYZE_SPECIFIC_PROMPT = """
 - **TIME CHECK:** Current Time: {current_time_str}
 - **TECHNICALS:** RSI: {rsi_val:.1f} | Funding: {funding_rate:.4f}% | BTC 1h Trend: {btc_trend:.2f}%
 - **MOMENTUM:** 1h: {change_1h:.2f}% | 24h: {change_24h:.2f}%
+- **VOLATILITY:** ATR(14, 5m): {atr_5m:.2f}% | 1h Volatility: {volatility_1h:.2f}% | Volume Spike: {volume_spike:.1f}x
 - **SOURCE INTEL:** "{news}"
 - **SEARCH CONTEXT:** "{search_context}"
 
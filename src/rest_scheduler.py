@@ -0,0 +1,192 @@
+import asyncio
+import heapq
+import itertools
+import time
+from config import (
+    REST_WEIGHT_LIMIT_1M,
+    REST_WEIGHT_SAFETY,
+    REST_BULK_WEIGHT_SHARE,
+    REST_MAX_CONCURRENCY,
+)
+
+# Öncelikler (Küçük = önce)
+PRIORITY_ORDER = 0     # Emir açma/kapama, TP/SL, kaldıraç
+PRIORITY_BALANCE = 1   # Bakiye / pozisyon bilgisi
+PRIORITY_METRICS = 2   # Karar anı verileri (Ticker, funding, derinlik, backfill)
+PRIORITY_HISTORY = 3   # Toplu geçmiş indirme (data_prepare, miner'lar)
+
+
+def _klines_weight(kw):
+    limit = kw.get("limit", 500)
+    if limit < 100: return 1
+    if limit < 500: return 2
+    if limit <= 1000: return 5
+    return 10
+
+
+def _depth_weight(kw):
+    limit = kw.get("limit", 500)
+    if limit <= 50: return 2
+    if limit <= 100: return 5
+    if limit <= 500: return 10
+    return 20
+
+
+# Binance Futures endpoint ağırlıkları (IP limiti). Emir uç noktaları IP ağırlığı tüketmez.
+ENDPOINT_WEIGHTS = {
+    "futures_exchange_info": 1,
+    "futures_klines": _klines_weight,
+    "futures_order_book": _depth_weight,
+    "futures_symbol_ticker": lambda kw: 1 if "symbol" in kw else 2,
+    "futures_orderbook_ticker": lambda kw: 2 if "symbol" in kw else 5,
+    "futures_ticker": lambda kw: 1 if "symbol" in kw else 40,
+    "futures_mark_price": lambda kw: 1 if "symbol" in kw else 10,
+    "futures_funding_rate": 1,
+    "futures_account_balance": 5,
+    "futures_position_information": 5,
+    "futures_change_leverage": 1,
+    "futures_cancel_all_open_orders": 1,
+    "futures_create_order": 0,
+    "futures_create_algo_order": 0,
+}
+
+
+class RestScheduler:
+    """
+    AsyncClient etrafında ağırlık bilinçli, öncelikli REST kuyruğu.
+    - Dakikalık ağırlık bütçesi tutulur; yanıt header'ı (X-MBX-USED-WEIGHT-1M) varsa onunla düzeltilir
+    - Bekleyen istekler önceliğe göre sıralanır; bütçe ve eşzamanlılık izin verdiği kadar paralel çalışır
+    - Toplu indirme (HISTORY) bütçenin sadece bir kısmını kullanır, emirler hiçbir zaman onu beklemez
+    """
+
+    def __init__(self, client, weight_limit=REST_WEIGHT_LIMIT_1M, safety=REST_WEIGHT_SAFETY,
+                 bulk_share=REST_BULK_WEIGHT_SHARE, max_concurrency=REST_MAX_CONCURRENCY):
+        self.client = client
+        self.weight_limit = weight_limit
+        self.safety = safety
+        self.bulk_share = bulk_share
+        self.max_concurrency = max_concurrency
+
+        self.window = int(time.time() // 60)
+        self.used = 0          # Bu dakika harcanan (tahmini + header)
+        self.in_flight = 0
+        self.blocked_until = 0.0  # 429/418 sonrası bekleme
+        self.waiters = []      # heap: (priority, seq, weight, future)
+        self.seq = itertools.count()
+        self.timer = None
+
+        # İstatistik
+        self.calls = 0
+        self.waited = 0
+
+    # --- BÜTÇE ---
+    def _budget(self, priority):
+        budget = self.weight_limit * self.safety
+        return budget * self.bulk_share if priority >= PRIORITY_HISTORY else budget
+
+    def _roll_window(self, now):
+        window = int(now // 60)
+        if window != self.window:
+            self.window = window
+            self.used = 0
+
+    @staticmethod
+    def weight_of(method, kwargs):
+        weight = ENDPOINT_WEIGHTS.get(method, 1)
+        return weight(kwargs) if callable(weight) else weight
+
+    def _admissible(self, priority, weight, now):
+        if priority == PRIORITY_ORDER and weight == 0:
+            return True  # Emirler IP bütçesinden ve kuyruktan bağımsız
+        if now < self.blocked_until:
+            return False
+        if self.in_flight >= self.max_concurrency and priority != PRIORITY_ORDER:
+            return False
+        return self.used + weight <= self._budget(priority)
+
+    def _dispatch(self):
+        """Kuyruğun başından, izin verildiği kadar isteği serbest bırakır."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        now = time.time()
+        self._roll_window(now)
+        while self.waiters:
+            priority, _, weight, fut = self.waiters[0]
+            if fut.done():  # İptal edilmiş
+                heapq.heappop(self.waiters)
+                continue
+            if not self._admissible(priority, weight, now):
+                break
+            heapq.heappop(self.waiters)
+            self._admit(weight)
+            fut.set_result(None)
+
+        if self.waiters and self.timer is None and self.in_flight < self.max_concurrency:
+            # Bütçe dolu: Bir sonraki dakika (veya ban bitişi) ile tekrar dene
+            wake = max((self.window + 1) * 60, self.blocked_until) - now
+            self.timer = asyncio.get_running_loop().call_later(max(wake, 0.05), self._dispatch)
+
+    def _admit(self, weight):
+        self.used += weight
+        self.in_flight += 1
+
+    def _observe(self):
+        """Son yanıtın header'ından borsanın gördüğü kullanımı al."""
+        response = getattr(self.client, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers: return
+        used = headers.get("X-MBX-USED-WEIGHT-1M") or headers.get("x-mbx-used-weight-1m")
+        if used is not None:
+            self.used = max(self.used, int(used))
+
+    # --- ÇAĞRI ---
+    async def call(self, method, priority=PRIORITY_METRICS, weight=None, **kwargs):
+        """client.<method>(**kwargs) çağrısını bütçe ve öncelik sırasına göre yapar."""
+        if weight is None:
+            weight = self.weight_of(method, kwargs)
+        now = time.time()
+        self._roll_window(now)
+        self.calls += 1
+
+        # Önünde bekleyen yoksa ve bütçe izin veriyorsa hemen çalış
+        if (not self.waiters or priority == PRIORITY_ORDER) and self._admissible(priority, weight, now):
+            self._admit(weight)
+        else:
+            self.waited += 1
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (priority, next(self.seq), weight, fut))
+            self._dispatch()
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # Kabul edildikten hemen sonra iptal: Ayrılan slotu geri ver
+                    self.in_flight -= 1
+                    self._dispatch()
+                raise
+
+        try:
+            return await getattr(self.client, method)(**kwargs)
+        except Exception as e:
+            status = getattr(e, "status_code", None)
+            if status in (429, 418):
+                # Limit aşıldı / IP ban: Retry-After kadar (yoksa dakika sonuna kadar) dur
+                response = getattr(e, "response", None)
+                retry = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+                self.blocked_until = time.time() + (float(retry) if retry else 60 - time.time() % 60)
+            raise
+        finally:
+            self.in_flight -= 1
+            self._observe()
+            self._dispatch()
+
+    def stats(self):
+        return {
+            "used_weight": self.used,
+            "budget": int(self.weight_limit * self.safety),
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "calls": self.calls,
+            "waited": self.waited,
+        }
@@ -36,7 +36,7 @@ class RSSMonitor:
                     
                     full_text = f"{title}. {summary}"
                     
-                    # Main.py'daki process_news'i çağır
+                    # Haber hattına (NewsPipeline) gönder
                     print(f"📡 [RSS] Yeni Haber: {title[:50]}...")
                     await self.callback(full_text, "RSS")
                     
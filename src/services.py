@@ -1,26 +1,34 @@
 import asyncio
 import time
-import json
 import re
 import datetime
 import os
-import websockets
+import math
 from telethon import events
 
 from rss_listener import RSSMonitor
-from utils import get_top_100_map, perform_research, find_coins
+from utils import get_top_100_map, perform_research, find_coins, check_is_stablecoin
+from stream_manager import StreamManager
+from news_pipeline import NewsPipeline, PairJob, Abort, DETECT, ENRICH, DECIDE, EXECUTE
+from ws_decoder import decode_frame, KLINE, MINI_TICKERS
 from config import (
     TARGET_CHANNELS,
     RSS_FEEDS,
-    WEBSOCKET_URL,
+    WS_STREAM_ALL_TARGETS,
     REAL_TRADING_ENABLED,
     IGNORE_KEYWORDS,
     FIXED_TRADE_AMOUNT,
     LEVERAGE,
+    DECISION_RETENTION_DAYS,
+    RETENTION_INTERVAL_SEC,
+    NEWS_HELD_PRIORITY_SEC,
+    NEWS_CAP_PRIORITY_SEC,
+    NEWS_OPTIONAL_BUDGET_SEC,
+    NEWS_TRADE_MAX_AGE_SEC,
 )
-from price_buffer import PriceBuffer
 
 TARGET_PAIRS = get_top_100_map()
+RESEARCH_SKIPPED = "RESEARCH SKIPPED (LATENCY BUDGET). DECIDE BASED ON NEWS AND TECH DATA ONLY."
 
 
 def log_txt(message, filename="trade_logs.txt"):
@@ -98,14 +106,11 @@ async def ensure_fresh_data(ctx, pair):
     # Bayatsa çek
     if is_stale:
         ctx.log_ui(f"⚠️ {pair} Verisi Bayat/Yok. Taze veri çekiliyor...", "warning")
-        hist_data, chg_24h = await ctx.real_exchange.fetch_missing_data(pair)
-
-        if hist_data:
-            stats.candles.clear()
-            for c, t in hist_data:
-                stats.update_candle(c, t, True)
-            stats.set_24h_change(chg_24h)
-            stats.current_price = hist_data[-1][0]
+        candles, hourly = await ctx.real_exchange.fetch_missing_data(pair)
+
+        if candles:
+            # OHLCV + 5m/15m/1h barları tek seferde yükle
+            stats.load_history(candles, hourly)
             return True  # Veri başarıyla güncellendi
         else:
             return False  # Veri çekilemedi
@@ -196,25 +201,186 @@ async def execute_trade_logic(ctx, pair, dec, stats, source, msg, changes, searc
         asyncio.create_task(send_telegram_alert(ctx, full_log))
 
         # WebSocket Takibi Başlat
-        subscribe_msg = {
-            "method": "SUBSCRIBE",
-            "params": [f"{pair.lower()}@kline_1m"],
-            "id": int(time.time()),
-        }
-        await ctx.stream_command_queue.put(subscribe_msg)
+        ctx.streams.subscribe([StreamManager.kline_stream(pair)], owner="positions")
 
 
-async def process_news(msg, source, ctx):
-    """Haber akışını yöneten ana orkestra şefi."""
-    start_time = time.time()
-    if not ctx.app_state.is_running:
+def format_coin_meta(coin_map, pair):
+    """Parite için (Tam isim, Market Cap metni)."""
+    clean_symbol = pair.replace("usdt", "").lower()
+
+    # Güvenli Sözlük Erişimi
+    c_data = coin_map.get(clean_symbol)
+    if isinstance(c_data, dict):
+        coin_full_name = c_data.get("name", "Unknown").title()
+        m_cap = c_data.get("cap", 0)
+    else:
+        coin_full_name = "Unknown"
+        m_cap = 0
+
+    # Market Cap Formatlama
+    if m_cap > 1_000_000_000:
+        cap_str = f"${m_cap / 1_000_000_000:.2f} BILLION"
+    elif m_cap > 1_000_000:
+        cap_str = f"${m_cap / 1_000_000:.2f} MILLION"
+    else:
+        cap_str = "UNKNOWN/SMALL"
+    return coin_full_name, cap_str
+
+
+async def refresh_btc_trend(ctx):
+    """BTC 1h trendi (Bayatsa önce veri çekilir). Haber başına bir kez çalışır, tüm pariteler paylaşır."""
+    btc_pair = "btcusdt"
+    btc_stats = ctx.market_memory.get(btc_pair)
+
+    btc_is_stale = False
+    if not btc_stats or not btc_stats.candles:
+        btc_is_stale = True
+    elif (int(time.time() / 60) - btc_stats.candles[-1][0]) > 5:
+        btc_is_stale = True
+
+    if btc_is_stale:
+        # BTC verisi çekiliyor...
+        btc_hist, btc_hourly = await ctx.real_exchange.fetch_missing_data(btc_pair)
+        if btc_hist:
+            # Hafızayı doldur (Satır yoksa MarketMemory oluşturur)
+            btc_stats = ctx.market_memory[btc_pair]
+            btc_stats.load_history(btc_hist, btc_hourly)
+
+    return btc_stats.get_change(60) if btc_stats else 0.0
+
+
+async def research_pair(ctx, msg, pair):
+    """Arama sorgusu üret -> Web araştırması (Sıralı bağımlılık)."""
+    smart_query = await ctx.brain.generate_search_query(msg, pair.replace("usdt", ""))
+    ctx.log_ui(f"🌍 Araştırılıyor: '{smart_query}'", "info")
+    return await perform_research(smart_query)
+
+
+async def fetch_pair_metrics(ctx, pair, fresh_task):
+    """Hacim/Funding (Hacim hafızadaki 1h barlardan gelir -> Taze veriyi bekler)."""
+    if not await fresh_task:
+        return None
+    stats = ctx.market_memory[pair]
+    return await ctx.real_exchange.get_extended_metrics(
+        pair, volume_usdt=stats.quote_volume_24h()
+    )
+
+
+async def apply_order_book_guard(ctx, pair, dec):
+    """
+    MENTÖR GÜNCELLEMESİ: DERİNLİK KONTROLÜ (DUVAR KORUMASI)
+    Tahta veya spread uygun değilse kararı yerinde HOLD'a çevirir.
+    """
+    # Sadece LONG veya SHORT kararı varsa tahtaya bak (HOLD için bakmaya gerek yok)
+    if dec["action"] not in ["LONG", "SHORT"] or not REAL_TRADING_ENABLED:
         return
 
+    # Derinlik ve spread birbirinden bağımsız: İkisi birlikte çekilir
+    depth_task = asyncio.create_task(ctx.real_exchange.get_order_book_imbalance(pair))
+    ticker_task = asyncio.create_task(
+        ctx.real_exchange.rest.call("futures_orderbook_ticker", symbol=pair.upper())
+    )
+
+    try:
+        imbalance, depth_info = await depth_task
+        ctx.log_ui(
+            f"📊 Derinlik Analizi ({pair}): Oran {imbalance:.2f} | {depth_info}",
+            "info",
+        )
+
+        # KURAL 1: LONG girmek istiyorsun ama Satıcılar (Asks) çok baskın
+        # Eğer imbalance < -0.4 ise (Satıcılar %70'ten fazla), LONG girme!
+        if dec["action"] == "LONG" and imbalance < -0.5:
+            ctx.log_ui(
+                f"🛑 DUVAR TESPİT EDİLDİ: Aşırı Satış Baskısı ({imbalance:.2f}). LONG İptal.",
+                "warning",
+            )
+            dec["action"] = "HOLD"  # Kararı zorla HOLD'a çevir
+            dec["reason"] += " [CANCELLED: Sell Wall Detected]"
+
+        # KURAL 2: SHORT girmek istiyorsun ama Alıcılar (Bids) çok baskın
+        # Eğer imbalance > 0.4 ise (Alıcılar %70'ten fazla), SHORT girme!
+        elif dec["action"] == "SHORT" and imbalance > 0.5:
+            ctx.log_ui(
+                f"🛑 DUVAR TESPİT EDİLDİ: Aşırı Alış Baskısı ({imbalance:.2f}). SHORT İptal.",
+                "warning",
+            )
+            dec["action"] = "HOLD"  # Kararı zorla HOLD'a çevir
+            dec["reason"] += " [CANCELLED: Buy Wall Detected]"
+
+        # ------------------------------------------------------------------
+        # ADIM 4: SPREAD KONTROLÜ (GİZLİ MALİYET FİLTRESİ)
+        # ------------------------------------------------------------------
+        # Spread > %0.3 ise girme.
+        # Çünkü kar etmek için fiyatın Spread + Komisyon kadar gitmesi gerekir.
+        try:
+            # Anlık Ticker verisi (En güncel Bid/Ask)
+            ticker = await ticker_task
+            bid = float(ticker["bidPrice"])
+            ask = float(ticker["askPrice"])
+
+            # Spread Hesapla: (Ask - Bid) / Ask
+            spread_pct = ((ask - bid) / ask) * 100
+
+            ctx.log_ui(f"📏 Spread Analizi ({pair}): %{spread_pct:.3f}", "info")
+
+            if spread_pct > 0.3:  # Eşik Değer: %0.3 (Bu HFT için çoktur)
+                ctx.log_ui(
+                    f"🛑 SPREAD ÇOK YÜKSEK (%{spread_pct:.2f}). Makas açık, girilmez.",
+                    "warning",
+                )
+                dec["action"] = "HOLD"  # Kararı iptal et
+                dec["reason"] += f" [CANCELLED: High Spread {spread_pct:.2f}%]"
+
+        except Exception as e:
+            # Veri çekemiyorsak risk almayalım
+            ctx.log_ui(f"⚠️ Spread verisi alınamadı: {e}", "warning")
+    finally:
+        # Zaman aşımında (execute_stage) yarım kalan istekler
+        _cancel_pending(depth_task, ticker_task)
+
+
+def _cancel_pending(*tasks):
+    """Bitmemiş dalları iptal eder; bitmiş dalların hatası 'alındı' sayılır (Sahipsiz hata logu olmasın)."""
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+
+
+# --- HABER HATTI AŞAMALARI (news_pipeline.NewsPipeline) ---
+
+
+def _shared_task(coro):
+    """Haberin tüm pariteleri için ortak iş. Kimse beklemezse hatası sessizce alınır."""
+    task = asyncio.create_task(coro)
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+
+def news_priority_boost(ctx, pair):
+    """Parite önceliği (sn): Açık pozisyon ve büyük market cap haberi bu kadar 'taze' gösterir."""
+    boost = NEWS_HELD_PRIORITY_SEC if pair in ctx.exchange.positions else 0.0
+    c_data = TARGET_PAIRS.get(pair.lower().replace("usdt", ""))
+    m_cap = c_data.get("cap", 0) if isinstance(c_data, dict) else 0
+    if m_cap > 0:
+        # 100M -> 0, 1T -> Tam bonus (Logaritmik)
+        boost += NEWS_CAP_PRIORITY_SEC * min(1.0, max(0.0, (math.log10(m_cap) - 8) / 4))
+    return boost
+
+
+async def detect_stage(ctx, item):
+    """1) Filtreleme + Coin tespiti. Dönüş: Parite işleri (PairJob)."""
+    msg, source = item.msg, item.source
+    if not ctx.app_state.is_running:
+        return []
+
     # --- 1. FİLTRELEME & HAZIRLIK ---
     is_dup, score = ctx.memory.is_duplicate(msg)
     if is_dup:
         ctx.log_ui(f"♻️ [TEKRAR] Haber engellendi (Benzerlik: {score:.2f})", "warning")
-        return
+        return []
 
     ctx.memory.add_news(source, msg)
     clean_msg = msg.replace("— link", "").replace("Link:", "")
@@ -225,7 +391,7 @@ async def process_news(msg, source, ctx):
     for word in IGNORE_KEYWORDS:
         if word in msg_lower:
             ctx.log_ui(f"🛑 [FİLTRE] Bayat haber: '{word}'", "warning")
-            return
+            return []
 
     ctx.log_ui(f"[{source}] Taranıyor: {msg[:40]}...", "info")
 
@@ -241,313 +407,335 @@ async def process_news(msg, source, ctx):
                 ctx.log_ui(f"🕵️ AJAN BULDU: {found_symbol}", "success")
                 detected_pairs.append(pot_pair)
 
-    # --- 3. ANALİZ DÖNGÜSÜ ---
-    coin_map = (
-        get_top_100_map()
-    )  # Global cache olsa iyi olur ama şimdilik burada kalsın.
+    if detected_pairs:
+        # Coin listesi ve BTC trendi tüm pariteler için ortak: Haber başına bir kez
+        item.shared["coin_map"] = _shared_task(asyncio.to_thread(get_top_100_map))
+        item.shared["btc"] = _shared_task(refresh_btc_trend(ctx))
+    return [PairJob(item, pair) for pair in detected_pairs]
 
-    for pair in detected_pairs:
-        # A) Veri Tazeleme (Yardımcı Fonksiyon Çağrısı)
-        data_ready = await ensure_fresh_data(ctx, pair)
-        if not data_ready:
-            ctx.log_ui(f"❌ {pair} verisi çekilemedi, analiz iptal.", "error")
-            continue
 
-        stats = ctx.market_memory[pair]
+async def _optional_step(ctx, job, task, deadline, fallback, name):
+    """Opsiyonel adım: deadline'a kadar bitmezse (veya hata verirse) iptal edilir, fallback kullanılır."""
+    try:
+        return await asyncio.wait_for(task, max(0.0, deadline - time.time()))
+    except asyncio.TimeoutError:
+        reason = "süre bitti"
+    except Exception as e:
+        reason = f"hata: {e}"
+    job.data.setdefault("skipped", []).append(f"{name} ({reason})")
+    ctx.log_ui(f"⏭️ {job.pair} {name} atlandı: {reason}", "warning")
+    return fallback
 
-        # B) Araştırma
-        smart_query = await ctx.brain.generate_search_query(
-            msg, pair.replace("usdt", "")
-        )
-        ctx.log_ui(f"🌍 Araştırılıyor: '{smart_query}'", "info")
-        search_res = await perform_research(smart_query)
 
-        # C) Metadata ve Teknik Veriler
-        clean_symbol = pair.replace("usdt", "").lower()
+async def enrich_stage(ctx, job):
+    """
+    2) Veri toplama. Bağımsız adımlar aynı anda başlar:
+        ensure_fresh_data ──> get_extended_metrics ─┐
+        generate_search_query ──> perform_research ─┤ (Opsiyonel)
+        get_coin_profile ───────────────────────────┼──> decide (Opsiyonel)
+        BTC trendi (Haber başına ortak) ────────────┘
+    Opsiyonel adımlar NEWS_OPTIONAL_BUDGET_SEC içinde bitmezse atlanır.
+    """
+    msg, pair = job.item.msg, job.pair
+    optional_deadline = min(job.stage_deadline, time.time() + NEWS_OPTIONAL_BUDGET_SEC)
+    fresh_task = asyncio.create_task(ensure_fresh_data(ctx, pair))
+    research_task = asyncio.create_task(research_pair(ctx, msg, pair))
+    profile_task = asyncio.create_task(ctx.brain.get_coin_profile(pair))
+    metrics_task = asyncio.create_task(fetch_pair_metrics(ctx, pair, fresh_task))
 
-        # Güvenli Sözlük Erişimi
-        c_data = coin_map.get(clean_symbol)
-        if isinstance(c_data, dict):
-            coin_full_name = c_data.get("name", "Unknown").title()
-            m_cap = c_data.get("cap", 0)
-        else:
-            coin_full_name = "Unknown"
-            m_cap = 0
-
-        # Market Cap Formatlama
-        if m_cap > 1_000_000_000:
-            cap_str = f"${m_cap / 1_000_000_000:.2f} BILLION"
-        elif m_cap > 1_000_000:
-            cap_str = f"${m_cap / 1_000_000:.2f} MILLION"
-        else:
-            cap_str = "UNKNOWN/SMALL"
-
-        rsi_val = stats.calculate_rsi()
-        changes = stats.get_all_changes()
-
-        # BTC Trend
-        btc_pair = "btcusdt"
-        btc_stats = ctx.market_memory.get(btc_pair)
-
-        btc_is_stale = False
-        if not btc_stats or not btc_stats.candles:
-            btc_is_stale = True
-        elif (int(time.time() / 60) - btc_stats.candles[-1][0]) > 5:
-            btc_is_stale = True
-
-        if btc_is_stale:
-            # BTC verisi çekiliyor...
-            btc_hist, btc_24h = await ctx.real_exchange.fetch_missing_data(btc_pair)
-            if btc_hist:
-                if btc_pair not in ctx.market_memory:
-                    ctx.market_memory[btc_pair] = PriceBuffer()
-
-                # Hafızayı doldur
-                ctx.market_memory[btc_pair].candles.clear()
-                for c, t in btc_hist:
-                    ctx.market_memory[btc_pair].update_candle(c, t, True)
-                ctx.market_memory[btc_pair].current_price = btc_hist[-1][0]
-                btc_stats = ctx.market_memory[btc_pair]
-
-        # Artık btc_stats dolu, hesapla
-        btc_trend = btc_stats.get_change(60) if btc_stats else 0.0
-
-        ctx.log_ui(f"🔍 Analiz Fiyatı ({pair}): {stats.current_price}", "info")
-
-        # D) Yapay Zeka Kararı
-        volume_24h, funding_rate = await ctx.real_exchange.get_extended_metrics(pair)
-        
-        dec = await ctx.brain.analyze_specific(
-            msg,
-            pair,
-            stats.current_price,
-            changes,
-            search_res,
-            coin_full_name,
-            cap_str,
-            rsi_val,
-            btc_trend,
-            volume_24h,
-            funding_rate,
+    try:
+        # A) Veri Tazeleme
+        if not await fresh_task:
+            raise Abort("no_data", f"{pair} verisi çekilemedi, analiz iptal.")
+
+        # B) Metadata (Ortak işler shield ile: Bu parite iptal olursa diğerleri etkilenmez)
+        data = job.data
+        data["coin_full_name"], data["cap_str"] = format_coin_meta(
+            await asyncio.shield(job.item.shared["coin_map"]), pair
         )
+        data["btc_trend"] = await asyncio.shield(job.item.shared["btc"])
+        data["volume_24h"], data["funding_rate"] = await metrics_task
 
-        # for testing
-        """
-        dec = {
-            "symbol": pair,
-            "action": "LONG",
-            "confidence": 100,
-            "reason": "Test",
-            "validity_minutes": 1,
-            "tp_pct": 1.5,
-            "sl_pct": 1.5,
-        }"""
-
-        # Data Collector Kaydı
-        ctx.collector.log_decision(msg, pair, stats.current_price, str(changes), dec)
-
-        # Dashboard Karar Günlüğü Kaydı
-        decision_record = {
-            "time": datetime.datetime.now().strftime("%H:%M:%S"),
-            "symbol": pair.upper().replace("USDT", ""),
-            "action": dec.get("action", "HOLD"),
-            "confidence": dec.get("confidence", 0),
-            "reason": dec.get("reason", "N/A"),
-            "price": stats.current_price,
-            "news_snippet": msg[:60] + "...",
-            "validity": dec.get("validity_minutes", 0),
-            "tp_pct": dec.get("tp_pct", 0.0),
-            "sl_pct": dec.get("sl_pct", 0.0),
-        }
-        ctx.ai_decisions.append(decision_record)
-        decision_id = ctx.memory.log_decision(decision_record)  # <--- DB ID GELDİ
-        dec["db_id"] = decision_id
-        # ----------------------------------------------------------------------
-        # MENTÖR GÜNCELLEMESİ: DERİNLİK KONTROLÜ (DUVAR KORUMASI)
-        # ----------------------------------------------------------------------
-        # Sadece LONG veya SHORT kararı varsa tahtaya bak (HOLD için bakmaya gerek yok)
-        is_order_book_safe = True
-
-        if dec["action"] in ["LONG", "SHORT"] and REAL_TRADING_ENABLED:
-            imbalance, depth_info = await ctx.real_exchange.get_order_book_imbalance(
-                pair
-            )
-            ctx.log_ui(
-                f"📊 Derinlik Analizi ({pair}): Oran {imbalance:.2f} | {depth_info}",
-                "info",
-            )
+        # C) Araştırma ve Profil (Opsiyonel)
+        data["search_res"] = await _optional_step(
+            ctx, job, research_task, optional_deadline, RESEARCH_SKIPPED, "research"
+        )
+        data["coin_category"] = await _optional_step(
+            ctx, job, profile_task, optional_deadline, "Unknown", "profile"
+        )
+        return True
+    finally:
+        # Erken çıkışta (Veri yok/Hata/Bütçe) boşa çalışan dalları durdur
+        _cancel_pending(research_task, profile_task, metrics_task)
 
-            # KURAL 1: LONG girmek istiyorsun ama Satıcılar (Asks) çok baskın
-            # Eğer imbalance < -0.4 ise (Satıcılar %70'ten fazla), LONG girme!
-            if dec["action"] == "LONG" and imbalance < -0.5:
-                ctx.log_ui(
-                    f"🛑 DUVAR TESPİT EDİLDİ: Aşırı Satış Baskısı ({imbalance:.2f}). LONG İptal.",
-                    "warning",
-                )
-                dec["action"] = "HOLD"  # Kararı zorla HOLD'a çevir
-                dec["reason"] += " [CANCELLED: Sell Wall Detected]"
-                is_order_book_safe = False
 
-            # KURAL 2: SHORT girmek istiyorsun ama Alıcılar (Bids) çok baskın
-            # Eğer imbalance > 0.4 ise (Alıcılar %70'ten fazla), SHORT girme!
-            elif dec["action"] == "SHORT" and imbalance > 0.5:
-                ctx.log_ui(
-                    f"🛑 DUVAR TESPİT EDİLDİ: Aşırı Alış Baskısı ({imbalance:.2f}). SHORT İptal.",
-                    "warning",
-                )
-                dec["action"] = "HOLD"  # Kararı zorla HOLD'a çevir
-                dec["reason"] += " [CANCELLED: Buy Wall Detected]"
-                is_order_book_safe = False
-
-            # ------------------------------------------------------------------
-            # ADIM 4: SPREAD KONTROLÜ (GİZLİ MALİYET FİLTRESİ)
-            # ------------------------------------------------------------------
-            # Spread > %0.3 ise girme.
-            # Çünkü kar etmek için fiyatın Spread + Komisyon kadar gitmesi gerekir.
-            try:
-                # Anlık Ticker verisini çek (En güncel Bid/Ask)
-                ticker = await ctx.real_exchange.client.futures_orderbook_ticker(
-                    symbol=pair.upper()
-                )
-                bid = float(ticker["bidPrice"])
-                ask = float(ticker["askPrice"])
-
-                # Spread Hesapla: (Ask - Bid) / Ask
-                spread_pct = ((ask - bid) / ask) * 100
-
-                ctx.log_ui(f"📏 Spread Analizi ({pair}): %{spread_pct:.3f}", "info")
-
-                if spread_pct > 0.3:  # Eşik Değer: %0.3 (Bu HFT için çoktur)
-                    ctx.log_ui(
-                        f"🛑 SPREAD ÇOK YÜKSEK (%{spread_pct:.2f}). Makas açık, girilmez.",
-                        "warning",
-                    )
-                    dec["action"] = "HOLD"  # Kararı iptal et
-                    dec["reason"] += f" [CANCELLED: High Spread {spread_pct:.2f}%]"
-                    is_order_book_safe = False
-
-            except Exception as e:
-                # Veri çekemiyorsak risk almayalım
-                ctx.log_ui(f"⚠️ Spread verisi alınamadı: {e}", "warning")
-                # is_order_book_safe = False # (İsteğe bağlı: Veri yoksa girme diyebilirsin)
-
-        # ----------------------------------------------------------------------
-        # E) Karar Uygulama (Yardımcı Fonksiyon Çağrısı)
-        if dec["confidence"] >= 65 and dec["action"] in ["LONG", "SHORT"]:
-            await execute_trade_logic(
-                ctx, pair, dec, stats, source, msg, changes, search_res
-            )
-        else:
-            log = f"🛑 Pas: {pair.upper()} ({coin_full_name}) | {dec['action']} | (G: %{dec['confidence']}) | Reason : {dec.get('reason')}\nNews: {msg}"
-            ctx.log_ui(log, "warning")
-            log_txt(log)
-            asyncio.create_task(send_telegram_alert(ctx, log))
+async def decide_stage(ctx, job):
+    """3) Yapay Zeka Kararı + Kayıt. Dönüş: İşlem aşamasına geçecekse True."""
+    item, pair, data = job.item, job.pair, job.data
+    msg = item.msg
+
+    # C) Teknik Veriler (Hafızadan, karardan hemen önce -> En güncel)
+    stats = ctx.market_memory[pair]
+    rsi_val = stats.calculate_rsi()
+    changes = stats.get_all_changes()
+    technicals = stats.get_technicals()
+
+    ctx.log_ui(f"🔍 Analiz Fiyatı ({pair}): {stats.current_price}", "info")
+
+    # D) Yapay Zeka Kararı
+    dec = await ctx.brain.analyze_specific(
+        msg,
+        pair,
+        stats.current_price,
+        changes,
+        data["search_res"],
+        data["coin_full_name"],
+        data["cap_str"],
+        rsi_val,
+        data["btc_trend"],
+        data["volume_24h"],
+        data["funding_rate"],
+        technicals,
+        coin_category=data["coin_category"],
+    )
 
-    end_time = time.time()
+    # for testing
+    """
+    dec = {
+        "symbol": pair,
+        "action": "LONG",
+        "confidence": 100,
+        "reason": "Test",
+        "validity_minutes": 1,
+        "tp_pct": 1.5,
+        "sl_pct": 1.5,
+    }"""
+
+    # Bayat karar kayda LONG/SHORT olarak geçmesin: Kontrol kayıtlardan önce
+    stale = None
+    if dec["confidence"] >= 65 and dec["action"] in ["LONG", "SHORT"]:
+        stale = mark_if_stale(job, dec)
+
+    # Data Collector Kaydı
+    ctx.collector.log_decision(msg, pair, stats.current_price, str(changes), dec)
+
+    # Dashboard Karar Günlüğü Kaydı
+    decision_record = {
+        "time": datetime.datetime.now().strftime("%H:%M:%S"),
+        "symbol": pair.upper().replace("USDT", ""),
+        "action": dec.get("action", "HOLD"),
+        "confidence": dec.get("confidence", 0),
+        "reason": dec.get("reason", "N/A"),
+        "price": stats.current_price,
+        "news_snippet": msg[:60] + "...",
+        "validity": dec.get("validity_minutes", 0),
+        "tp_pct": dec.get("tp_pct", 0.0),
+        "sl_pct": dec.get("sl_pct", 0.0),
+    }
+    ctx.ai_decisions.append(decision_record)
+    decision_id = ctx.memory.log_decision(decision_record)  # <--- DB ID GELDİ
+    dec["db_id"] = decision_id
+    data.update(dec=dec, stats=stats, changes=changes, record=decision_record)
+
+    # Aşama süreleri: bekleme+çalışma (decide henüz kaydedilmedi -> toplamdan)
+    timings = {**item.timings, **job.timings}
+    breakdown = " ".join(f"{st}:{w + r:.1f}" for st, (w, r) in timings.items())
+    skipped = f" | Atlanan: {', '.join(data['skipped'])}" if data.get("skipped") else ""
     ctx.log_ui(
-        f"[{source}] Haber İşleme Süresi: {end_time - start_time:.2f} saniye.", "info"
+        f"[{item.source}] {pair} Karar Süresi: {time.time() - item.received_at:.2f} saniye ({breakdown}){skipped}",
+        "info",
+    )
+
+    if stale is not None:
+        raise stale
+    if dec["confidence"] >= 65 and dec["action"] in ["LONG", "SHORT"]:
+        return True
+    log_pass(ctx, job)
+    return False
+
+
+def mark_if_stale(job, dec):
+    """
+    Haberden bu yana NEWS_TRADE_MAX_AGE_SEC geçtiyse kararı HOLD'a çevirir (Sebebe iptal notu eklenir).
+    Dönüş: Fırlatılacak Abort veya None.
+    """
+    elapsed = time.time() - job.item.received_at
+    if elapsed <= NEWS_TRADE_MAX_AGE_SEC:
+        return None
+    dec["action"] = "HOLD"
+    dec["reason"] = f"{dec.get('reason', 'N/A')} [CANCELLED: Stale Decision {elapsed:.0f}s]"
+    return Abort(
+        "stale_trade",
+        f"{job.pair} kararı {elapsed:.1f}s sonra hâlâ emir bekliyordu (Limit {NEWS_TRADE_MAX_AGE_SEC}s)",
+    )
+
+
+def check_trade_age(ctx, job):
+    """İşlem aşamasında bayat karar iptali; kaydedilmiş kararı (Dashboard + DB) da günceller."""
+    dec = job.data["dec"]
+    stale = mark_if_stale(job, dec)
+    if stale is None:
+        return
+    job.data["record"].update(action=dec["action"], reason=dec["reason"])
+    ctx.memory.update_decision(dec.get("db_id"), dec["action"], dec["reason"])
+    raise stale
+
+
+async def execute_stage(ctx, job):
+    """4) Derinlik/Spread kontrolü + İşlem (Real/Paper)."""
+    pair, data = job.pair, job.data
+    dec = data["dec"]
+    check_trade_age(ctx, job)
+
+    # Tahta kontrolü kalan süreyle sınırlı (Bitmezse tahta bilinmiyor -> Girme)
+    try:
+        await asyncio.wait_for(
+            apply_order_book_guard(ctx, pair, dec),
+            max(0.0, job.item.received_at + NEWS_TRADE_MAX_AGE_SEC - time.time()),
+        )
+    except asyncio.TimeoutError:
+        raise Abort("guard_timeout", f"{pair} derinlik/spread kontrolü süresinde bitmedi")
+    check_trade_age(ctx, job)
+
+    # ----------------------------------------------------------------------
+    # E) Karar Uygulama (Yardımcı Fonksiyon Çağrısı)
+    # Bu noktadan sonra iptal yok: Emir gönderildiyse paper/log tarafı da tamamlanmalı
+    if dec["action"] in ["LONG", "SHORT"]:
+        await execute_trade_logic(
+            ctx, pair, dec, data["stats"], job.item.source, job.item.msg,
+            data["changes"], data["search_res"],
+        )
+    else:
+        log_pass(ctx, job)
+
+
+def log_pass(ctx, job):
+    dec = job.data["dec"]
+    log = f"🛑 Pas: {job.pair.upper()} ({job.data['coin_full_name']}) | {dec['action']} | (G: %{dec['confidence']}) | Reason : {dec.get('reason')}\nNews: {job.item.msg}"
+    ctx.log_ui(log, "warning")
+    log_txt(log)
+    asyncio.create_task(send_telegram_alert(ctx, log))
+
+
+def create_news_pipeline(ctx):
+    """Telegram/RSS/Manuel haberler ctx.news.submit(msg, source) ile hatta girer."""
+    return NewsPipeline(
+        {
+            DETECT: lambda item: detect_stage(ctx, item),
+            ENRICH: lambda job: enrich_stage(ctx, job),
+            DECIDE: lambda job: decide_stage(ctx, job),
+            EXECUTE: lambda job: execute_stage(ctx, job),
+        },
+        boost=lambda pair: news_priority_boost(ctx, pair),
+        log=ctx.log_ui,
     )
 
 
 # --- LOOPS ---
 
 
+def tracked_streams():
+    """Top 100 listesindeki (stablecoin hariç) pariteler için 1m kline stream'leri."""
+    symbols = {v["symbol"] for v in TARGET_PAIRS.values() if isinstance(v, dict)}
+    return sorted(
+        StreamManager.kline_stream(f"{sym}usdt")
+        for sym in symbols
+        if not check_is_stablecoin(sym.upper())
+    )
+
+
+async def check_position_tick(ctx, pair, price):
+    """Bu coinde açık işlemimiz varsa, Exchange'e haber ver (TP, SL, Trailing, Time Limit)."""
+    log, color, closed_sym, pnl, peak_price, decision_id = (
+        ctx.exchange.check_positions(pair, price)
+    )
+    if log:
+        ctx.log_ui(log, color)
+        log_txt(log)
+        if closed_sym:
+            await handle_closed_position(
+                ctx, closed_sym, pnl, peak_price, log, decision_id
+            )
+
+
+async def handle_ws_message(ctx, msg):
+    """
+    Combined stream'den gelen tek bir mesajı çözer ve ingest tamponuna koyar.
+    Okuyucu asla DB/Telegram işini beklemez; uygulama ingest_consumer_loop'ta yapılır.
+    """
+    try:
+        # Sadece kullanılan alanlar çözülür, sembol küçük harf ve interned gelir
+        kind, payload = decode_frame(msg)
+
+        if kind == KLINE:
+            ctx.ingest.put(payload[0], kind, payload, is_closed=payload[6])
+        elif kind == MINI_TICKERS:
+            # Tüm piyasa tek mesajda
+            for ticker in payload:
+                ctx.ingest.put(ticker[0], kind, ticker)
+
+    except Exception as e:
+        # Tek bir mesajın bozuk olması tüm bağlantıyı koparmamalı
+        # Sadece logla ve devam et
+        ctx.log_ui(f"⚠️ WS Msg İşleme Hatası: {e}", "warning")
+
+
+def apply_tick(ctx, kind, payload):
+    """Tick'i hafızaya yazar, pozisyon kontrolü için fiyatı döndürür."""
+    if kind == KLINE:
+        pair, price, open_, high, low, quote_volume, is_closed, ts = payload
+        # Coin hafızada yoksa MarketMemory satırını anında oluşturur
+        ctx.market_memory.update_candle(
+            pair, price, ts, is_closed, open_, high, low, quote_volume
+        )
+    else:
+        pair, price, open_24h = payload[0], payload[1], payload[2]
+        ctx.market_memory.update_ticker(pair, price, open_24h)
+    return price
+
+
+async def ingest_consumer_loop(ctx):
+    """Ingest tamponunu boşaltır: Hafıza güncellemesi + pozisyon/PnL kontrolü."""
+    ctx.log_ui("📥 Ingest Tüketicisi Aktif", "success")
+    while True:
+        try:
+            batch = await ctx.ingest.drain()
+            # Duraklatıldıysa tampon boşaltılır ama uygulanmaz (Tampon dolmaz, döngü ölmez)
+            if not ctx.app_state.is_running:
+                continue
+            for pair, (closed, live) in batch:
+                price = None
+                # 1. HAFIZAYI GÜNCELLE (Önce kapanan mumlar, sonra son canlı tick)
+                for payload in closed:
+                    price = apply_tick(ctx, KLINE, payload)
+                if live is not None:
+                    price = apply_tick(ctx, *live)
+                ctx.ingest.applied += len(closed) + (live is not None)
+
+                # 2. POZİSYON VE PNL KONTROLÜ
+                if price is not None and pair in ctx.exchange.positions:
+                    await check_position_tick(ctx, pair, price)
+
+            # Büyük batch'lerde event loop'u bloklama
+            await asyncio.sleep(0)
+        except Exception as e:
+            ctx.log_ui(f"⚠️ Ingest Hatası: {e}", "warning")
+
+
 async def websocket_loop(ctx):
     """
     Binance Websocket verilerini yöneten ana döngü.
-    Hatalara karşı korumalı, otomatik hafıza başlatan ve PnL güncelleyen versiyon.
+    Abonelikler StreamManager'da tutulur; yeniden bağlanınca geri yüklenir,
+    stream limiti dolunca yeni bağlantılara dağıtılır.
     """
     ctx.log_ui("🔌 Websocket Bağlantısı Başlatılıyor (Sniper Mode)...", "info")
 
-    # Ana Reconnection Döngüsü (Koparsa tekrar bağlanır)
-    while ctx.app_state.is_running:
-        try:
-            async with websockets.connect(WEBSOCKET_URL) as ws:
-                ctx.log_ui("✅ Websocket Bağlandı.", "success")
-
-                # --- ALT GÖREV 1: GÖNDERİCİ (Sender) ---
-                # Abonelik (Subscribe) emirlerini Binance'e iletir
-                async def sender():
-                    while ctx.app_state.is_running:
-                        try:
-                            # Kuyruktan emir gelmesini bekle
-                            command = await ctx.stream_command_queue.get()
-                            await ws.send(json.dumps(command))
-                            # Log kirliliği olmaması için print kapalı, gerekirse aç:
-                            # print(f"📡 Stream Komutu Gönderildi: {command}")
-                        except Exception as e:
-                            ctx.log_ui(f"⚠️ WS Sender Hatası: {e}", "error")
-                            break  # Hata varsa döngüyü kır ki ana döngü yeniden bağlansın
-
-                # --- ALT GÖREV 2: ALICI (Receiver) ---
-                # Binance'den gelen fiyatları işler
-                async def receiver():
-                    async for msg in ws:
-                        try:
-                            raw_data = json.loads(msg)
-
-                            # Veri formatını ayıkla ('data' içinde veya direkt gelebilir)
-                            if "data" in raw_data:
-                                data = raw_data["data"]
-                            else:
-                                data = raw_data
-
-                            # Kline (Mum) verisi mi?
-                            if isinstance(data, dict) and data.get("e") == "kline":
-                                # 1. SEMBOLÜ KÜÇÜLT (Hayati Düzeltme)
-                                # Binance 'BTCUSDT' yollar, biz 'btcusdt' kullanıyoruz.
-                                pair = data["s"].lower()
-                                k = data["k"]
-                                price = float(k["c"])
-                                is_closed = k["x"]
-                                ts = k["t"] / 1000
-
-                                # 2. HAFIZA KONTROLÜ (KeyError Çözümü)
-                                # Eğer bu coin hafızada yoksa, anında oluştur!
-                                if pair not in ctx.market_memory:
-                                    ctx.market_memory[pair] = PriceBuffer()
-
-                                # 3. HAFIZAYI GÜNCELLE
-                                ctx.market_memory[pair].update_candle(
-                                    price, ts, is_closed
-                                )
-
-                                # 4. POZİSYON VE PNL KONTROLÜ
-                                # Eğer bu coinde açık işlemimiz varsa, Exchange'e haber ver
-                                if pair in ctx.exchange.positions:
-                                    log, color, closed_sym, pnl, peak_price, decision_id = (
-                                        ctx.exchange.check_positions(pair, price)
-                                    )
-
-                                    if log:
-                                        # Log varsa (TP, SL, Trailing, Time Limit tetiklendiyse)
-                                        ctx.log_ui(log, color)
-                                        log_txt(log)
-
-                                        if log:
-                                            ctx.log_ui(log, color)
-                                            log_txt(log)
-                                            if closed_sym:
-                                                await handle_closed_position(
-                                                    ctx, closed_sym, pnl, peak_price, log, decision_id
-                                                )
-
-
-                        except Exception as e:
-                            # Tek bir mesajın bozuk olması tüm bağlantıyı koparmamalı
-                            # Sadece logla ve devam et
-                            ctx.log_ui(f"⚠️ WS Msg İşleme Hatası: {e}", "warning")
-                            continue
-
-                # Gönderici ve Alıcıyı paralel çalıştır
-                await asyncio.gather(sender(), receiver())
+    if WS_STREAM_ALL_TARGETS:
+        streams = tracked_streams()
+        ctx.streams.subscribe(streams, owner="universe")
+        ctx.log_ui(f"📡 {len(streams)} parite sürekli dinleniyor.", "info")
 
-        except Exception as e:
-            ctx.log_ui(
-                f"❌ Websocket Bağlantısı Koptu: {e}. 5sn içinde yeniden bağlanılıyor...",
-                "error",
-            )
-            await asyncio.sleep(5)
+    await ctx.streams.run(lambda msg: handle_ws_message(ctx, msg))
 
 
 async def position_monitor_loop(ctx):
@@ -564,20 +752,16 @@ async def position_monitor_loop(ctx):
             if not ctx.exchange.positions:
                 continue
 
-            # Sözlük değişirken hata almamak için listeye çevirip dönüyoruz
-            # Keys zaten küçük harf ('btcusdt') olmalı
-            open_symbols = list(ctx.exchange.positions.keys())
-
-            for pair in open_symbols:
+            # Tüm pozisyonları taramak yerine süresi dolanları heap'ten çek
+            # (TP/SL/Trailing zaten her tick'te trigger index ile kontrol ediliyor)
+            for pair in ctx.exchange.pop_expired():
                 # Hafızadaki son fiyatı al
-                if pair not in ctx.market_memory:
-                    continue
-
-                current_price = ctx.market_memory[pair].current_price
+                current_price = ctx.market_memory.get(pair)
+                current_price = current_price.current_price if current_price else 0.0
 
-                # Fiyat 0 ise pas geç
+                # Fiyat yoksa pozisyonun son bilinen fiyatıyla kapat
                 if current_price == 0:
-                    continue
+                    current_price = ctx.exchange.positions[pair].current_price
 
                 # Kontrol Et
                 log, color, closed_sym, pnl, peak, decision_id = (
@@ -614,17 +798,11 @@ async def handle_closed_position(ctx, symbol, pnl, peak_price, log_msg, decision
         # 2. SQLite Veritabanı Kaydı (Artık bu satıra ulaşılabilecek)
         if ctx.exchange.history:
             last_trade = ctx.exchange.history[-1]
-            last_trade["peak_price"] = peak_price
             ctx.memory.log_trade(last_trade, decision_id)
 
         # 4. Stream İptal ve Bakiye Güncelleme
         try:
-            unsubscribe_msg = {
-                "method": "UNSUBSCRIBE",
-                "params": [f"{symbol.lower()}@kline_1m"],
-                "id": int(time.time()),
-            }
-            await ctx.stream_command_queue.put(unsubscribe_msg)
+            ctx.streams.unsubscribe([StreamManager.kline_stream(symbol)], owner="positions")
         except:
             pass
         
@@ -650,7 +828,7 @@ async def telegram_loop(ctx):
         @ctx.telegram_client.on(events.NewMessage(chats=TARGET_CHANNELS))
         async def handler(event):
             if event.message.message:
-                await process_news(event.message.message, "TELEGRAM", ctx)
+                ctx.news.submit(event.message.message, "TELEGRAM")
 
         # 🔴 BURASI SİLİNDİ
         # await ctx.telegram_client.run_until_disconnected()
@@ -663,19 +841,39 @@ async def collector_loop(ctx):
     ctx.log_ui("Data Collector Active 💾", "success")
     while True:
         await asyncio.sleep(60)
-        curr_prices = {
-            p: ctx.market_memory[p].current_price
-            for p in TARGET_PAIRS
-            if ctx.market_memory[p].current_price > 0
-        }
+        # Tek vektörel okuma (Boş buffer oluşturmaz)
+        curr_prices = ctx.market_memory.current_prices()
         if curr_prices:
             await ctx.collector.check_outcomes(curr_prices)
 
 
+async def retention_loop(ctx):
+    """Eski haber/karar kayıtlarını arşivleyip DB'yi küçük tutar (Saatte bir)."""
+    ctx.log_ui("DB Retention Görevi Aktif 🗄️", "success")
+    while True:
+        # Duraklatıldıysa bu turu atla (Döngü ölmez)
+        if not ctx.app_state.is_running:
+            await asyncio.sleep(RETENTION_INTERVAL_SEC)
+            continue
+        try:
+            counts = await asyncio.to_thread(
+                ctx.memory.run_retention, decision_retention_days=DECISION_RETENTION_DAYS
+            )
+            if any(counts.values()):
+                ctx.log_ui(
+                    f"🗄️ Arşivlendi: {counts['news']} haber, {counts['decisions']} karar, {counts['trades']} işlem",
+                    "info",
+                )
+        except Exception as e:
+            ctx.log_ui(f"⚠️ Retention Hatası: {e}", "error")
+        await asyncio.sleep(RETENTION_INTERVAL_SEC)
+
+
 async def rss_loop(ctx):
     ctx.log_ui("RSS Modülü Başlatılıyor... 📡", "info")
     # RSSMonitor'a bir loglama ekleyemiyoruz ama başlatıldığını buradan logluyoruz.
-    rss_bot = RSSMonitor(
-        callback_func=lambda msg, src: asyncio.create_task(process_news(msg, src, ctx))
-    )
+    async def enqueue(msg, src):
+        ctx.news.submit(msg, src)
+
+    rss_bot = RSSMonitor(callback_func=enqueue)
     await rss_bot.start_loop()
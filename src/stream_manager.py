@@ -0,0 +1,182 @@
+import asyncio
+import json
+import time
+import websockets
+from config import (
+    COMBINED_STREAM_URL,
+    WS_MAX_STREAMS_PER_CONN,
+    WS_MAX_PARAMS_PER_MESSAGE,
+    WS_MAX_MESSAGES_PER_SEC,
+)
+
+
+class _Shard:
+    """Tek bir websocket bağlantısı ve ona atanmış stream'ler."""
+
+    def __init__(self, index):
+        self.index = index
+        self.streams = set()   # Olması gereken abonelikler
+        self.active = set()    # Borsaya gerçekten gönderilmiş abonelikler
+        self.wake = asyncio.Event()
+        self.ws = None
+        self.task = None
+
+
+class StreamManager:
+    """
+    Binance combined-stream abonelik yöneticisi.
+    - İstenen stream kümesini tutar, bağlantı başına farkı (diff) toplu SUBSCRIBE/UNSUBSCRIBE ile yollar
+    - Yeniden bağlanınca tüm abonelikleri geri yükler
+    - Bir bağlantı stream limitine ulaşınca yeni bağlantı (shard) açar
+    Aynı stream'i birden fazla sahip (owner) isteyebilir; son sahip bırakınca iptal edilir.
+    """
+
+    def __init__(self, on_message=None, url=COMBINED_STREAM_URL, log=print,
+                 max_streams_per_conn=WS_MAX_STREAMS_PER_CONN,
+                 max_params_per_message=WS_MAX_PARAMS_PER_MESSAGE,
+                 max_messages_per_sec=WS_MAX_MESSAGES_PER_SEC):
+        self.on_message = on_message
+        self.url = url
+        self.log = log
+        self.max_streams_per_conn = max_streams_per_conn
+        self.max_params_per_message = max_params_per_message
+        self.min_send_interval = 1.0 / max_messages_per_sec
+
+        self.owners = {}        # stream -> {owner, ...}
+        self.stream_shard = {}  # stream -> _Shard
+        self.shards = []
+        self.is_running = False
+        self.next_id = 1
+
+    # --- ABONELİK API'Sİ (Senkron, her yerden çağrılabilir) ---
+    @staticmethod
+    def kline_stream(pair, interval="1m"):
+        return f"{pair.lower()}@kline_{interval}"
+
+    def subscribe(self, streams, owner="default"):
+        for stream in streams:
+            holders = self.owners.setdefault(stream, set())
+            holders.add(owner)
+            if stream not in self.stream_shard:
+                shard = self._shard_with_room()
+                shard.streams.add(stream)
+                self.stream_shard[stream] = shard
+                shard.wake.set()
+
+    def unsubscribe(self, streams, owner="default"):
+        for stream in streams:
+            holders = self.owners.get(stream)
+            if holders is None: continue
+            holders.discard(owner)
+            if holders: continue
+            del self.owners[stream]
+            shard = self.stream_shard.pop(stream)
+            shard.streams.discard(stream)
+            shard.wake.set()
+
+    @property
+    def desired(self):
+        return set(self.owners)
+
+    def stats(self):
+        return {
+            "streams": len(self.owners),
+            "shards": [
+                {"streams": len(s.streams), "active": len(s.active), "connected": s.ws is not None}
+                for s in self.shards
+            ],
+        }
+
+    def _shard_with_room(self):
+        for shard in self.shards:
+            if len(shard.streams) < self.max_streams_per_conn:
+                return shard
+        shard = _Shard(len(self.shards))
+        self.shards.append(shard)
+        if self.is_running:
+            shard.task = asyncio.create_task(self._run_shard(shard))
+        return shard
+
+    # --- BAĞLANTI YÖNETİMİ ---
+    async def run(self, on_message=None):
+        """Tüm shard'ları çalıştırır (stop() çağrılana kadar)."""
+        if on_message is not None:
+            self.on_message = on_message
+        self.is_running = True
+        if not self.shards:
+            self._shard_with_room()
+        for shard in self.shards:
+            if shard.task is None or shard.task.done():
+                shard.task = asyncio.create_task(self._run_shard(shard))
+        while self.is_running:
+            await asyncio.sleep(1)
+
+    async def stop(self):
+        self.is_running = False
+        for shard in self.shards:
+            if shard.ws is not None:
+                await shard.ws.close()
+            if shard.task is not None:
+                shard.task.cancel()
+
+    async def _run_shard(self, shard):
+        # Ana Reconnection Döngüsü (Koparsa tekrar bağlanır)
+        while self.is_running:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    shard.ws = ws
+                    shard.active = set()  # Yeni bağlantıda borsa tarafında abonelik yok
+                    shard.wake.set()      # Tüm stream'leri geri yükle
+                    self.log(f"✅ Websocket Bağlandı (Shard #{shard.index}, {len(shard.streams)} stream).", "success")
+                    # Biri biterse (hata/kopma) diğeri de iptal edilsin, eski bağlantıda iş kalmasın
+                    tasks = [asyncio.create_task(self._sync(shard, ws)), asyncio.create_task(self._receive(ws))]
+                    try:
+                        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        for task in tasks:
+                            task.cancel()
+                    for task in done:
+                        task.result()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log(
+                    f"❌ Websocket Bağlantısı Koptu (Shard #{shard.index}): {e}. 5sn içinde yeniden bağlanılıyor...",
+                    "error",
+                )
+            finally:
+                shard.ws = None
+            if self.is_running:
+                await asyncio.sleep(5)
+
+    async def _sync(self, shard, ws):
+        """İstenen küme ile aktif küme arasındaki farkı borsaya gönderir."""
+        last_send = 0.0
+        while self.is_running:
+            await shard.wake.wait()
+            shard.wake.clear()
+
+            to_remove = sorted(shard.active - shard.streams)
+            to_add = sorted(shard.streams - shard.active)
+            for method, streams in (("UNSUBSCRIBE", to_remove), ("SUBSCRIBE", to_add)):
+                for i in range(0, len(streams), self.max_params_per_message):
+                    batch = streams[i:i + self.max_params_per_message]
+                    # Borsanın mesaj/saniye limitini aşma
+                    wait = self.min_send_interval - (time.monotonic() - last_send)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    await ws.send(json.dumps({"method": method, "params": batch, "id": self.next_id}))
+                    self.next_id += 1
+                    last_send = time.monotonic()
+                    if method == "SUBSCRIBE":
+                        shard.active.update(batch)
+                    else:
+                        shard.active.difference_update(batch)
+
+    async def _receive(self, ws):
+        async for msg in ws:
+            if self.on_message is not None:
+                await self.on_message(msg)
+        # Sunucu bağlantıyı kapattı -> _run_shard yeniden bağlansın
+        if self.is_running:
+            raise ConnectionError("stream closed by server")
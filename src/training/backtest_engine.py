@@ -0,0 +1,183 @@
+import os
+import numpy as np
+
+# Proje Modülleri
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from exchange import settle_paths, EXIT_NONE, EXIT_REASONS
+from kline_store import KlineStore
+
+# --- AYARLAR ---
+HISTORY_MINUTES = 100    # Teknik analiz penceresi (RSI ısınması dahil)
+FORWARD_MINUTES = 61     # Giriş mumu + 60dk takip
+BTC_TREND_MINUTES = 60
+BUFFER_CAPACITY = 60     # Canlı PriceBuffer kapasitesi (Değişimler bununla sınırlı)
+TICK_SEC = 15            # Her mum O->H->L->C, 15sn arayla 4 tick
+
+
+def wilder_rsi(closes, period=14):
+    """(n, w) kapanış matrisi -> (n,) RSI. PriceBuffer.calculate_rsi ile aynı (İlk 'period' delta basit ortalama)."""
+    deltas = np.diff(closes, axis=1)
+    gains = np.clip(deltas, 0, None)
+    losses = np.clip(-deltas, 0, None)
+    avg_gain = gains[:, :period].mean(axis=1)
+    avg_loss = losses[:, :period].mean(axis=1)
+    # Olaylar boyunca vektörel, pencere boyunca sıralı (Wilder özyinelemeli)
+    for j in range(period, deltas.shape[1]):
+        avg_gain = (avg_gain * (period - 1) + gains[:, j]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[:, j]) / period
+    rsi = np.full(len(closes), 100.0)
+    nz = avg_loss != 0
+    rsi[nz] = 100 - (100 / (1 + avg_gain[nz] / avg_loss[nz]))
+    return rsi
+
+
+class BacktestEngine:
+    """
+    Yerel kline deposu (KlineStore, data_prepare.py) üzerinden çevrimdışı backtest.
+    - technicals(): Haber anlarındaki teknik veriler (Sembol başına tek searchsorted)
+    - settle(): Tüm işlemlerin TP/SL/Süre sonucu (Tek settle_paths çağrısı, PaperExchange ile aynı mantık)
+    """
+
+    def __init__(self, store=None, history=HISTORY_MINUTES, forward=FORWARD_MINUTES,
+                 btc_symbol="BTCUSDT", rsi_period=14):
+        self.store = store or KlineStore()
+        self.history = history
+        self.forward = forward
+        self.btc_symbol = btc_symbol
+        self.rsi_period = rsi_period
+
+    @staticmethod
+    def _group(symbols):
+        """Sembol -> olay indeksleri"""
+        groups = {}
+        for i, symbol in enumerate(symbols):
+            groups.setdefault(symbol.upper(), []).append(i)
+        return groups.items()
+
+    def _btc_trend(self, ms):
+        btc = self.store.get(self.btc_symbol)
+        trend = np.zeros(len(ms))
+        if btc is None: return trend
+        # REST karşılığı: endTime=haber anı, limit=60 -> İlk ve son kapanış
+        end = btc.index_at(ms, side='right')
+        ok = end >= 0
+        start = np.maximum(end - BTC_TREND_MINUTES + 1, 0)
+        c = btc.c
+        trend[ok] = (c[end[ok]] - c[start[ok]]) / c[start[ok]] * 100
+        return trend
+
+    def technicals(self, symbols, msg_ts):
+        """
+        symbols/msg_ts: Olay başına sembol ve haber zamanı (epoch saniye).
+        Dönüş: Olay başına get_historical_technicals sözlüğü ('price', 'rsi', 'changes', 'btc_trend') veya None.
+        """
+        msg_ts = np.asarray(msg_ts, dtype=np.float64)
+        ms = (msg_ts * 1000).astype(np.int64)
+        btc_trend = self._btc_trend(ms)
+        out = [None] * len(msg_ts)
+
+        for symbol, idx in self._group(symbols):
+            series = self.store.get(symbol)
+            if series is None: continue
+            idx = np.asarray(idx)
+            c = series.c
+
+            # Haber anına kadar açılmış son mum (REST endTime semantiği)
+            end = series.index_at(ms[idx], side='right')
+            ok = end >= self.history - 1
+            if not ok.any(): continue
+            idx, end = idx[ok], end[ok]
+
+            price = c[end]
+            window = c[end[:, None] + np.arange(-self.history + 1, 1)]
+            rsi = wilder_rsi(window, self.rsi_period)
+
+            def change(minutes):
+                old = c[end - min(minutes, BUFFER_CAPACITY) + 1]
+                return (price - old) / old * 100
+
+            ch_1m, ch_10m, ch_1h = change(1), change(10), change(60)
+            day_ago = end - 24 * 60 + 1
+            has_day = day_ago >= 0
+            ch_24h = np.zeros(len(end))
+            ch_24h[has_day] = (price[has_day] - series.o[day_ago[has_day]]) / series.o[day_ago[has_day]] * 100
+
+            for k, i in enumerate(idx):
+                out[i] = {
+                    'price': float(price[k]),
+                    'rsi': float(rsi[k]),
+                    'changes': {
+                        "1m": float(ch_1m[k]),
+                        "10m": float(ch_10m[k]),
+                        "1h": float(ch_1h[k]),
+                        "24h": float(ch_24h[k]),
+                    },
+                    'btc_trend': float(btc_trend[i]),
+                }
+        return out
+
+    def settle(self, symbols, msg_ts, sides, tp_pct, sl_pct, validity, amount_usdt=100.0, leverage=10):
+        """
+        Her işlem haber anında açılır (Giriş: Haber anından sonraki ilk mumun kapanışı),
+        sonraki FORWARD_MINUTES mum üzerinde kapatılır. İşlemler birbirinden bağımsızdır.
+        Dönüş: İşlem başına sözlük (entry, exit, pnl, peak, reason, closed_at) veya veri yoksa None.
+        """
+        n = len(symbols)
+        if n == 0: return []
+        msg_ts = np.asarray(msg_ts, dtype=np.float64)
+        ms = (msg_ts * 1000).astype(np.int64)
+        m = self.forward * 4
+
+        prices = np.zeros((n, m))
+        ticks = np.zeros((n, m))
+        lengths = np.zeros(n, dtype=np.int64)
+        entry = np.ones(n)
+        offsets = np.arange(4) * TICK_SEC
+
+        for symbol, idx in self._group(symbols):
+            series = self.store.get(symbol)
+            if series is None: continue
+            idx = np.asarray(idx)
+            ts = series.ts
+            # REST karşılığı: startTime=haber anı -> Haber anından sonra açılan ilk mum
+            start = series.index_at(ms[idx], side='left')
+            avail = np.clip(len(ts) - start, 0, self.forward)
+            rows = np.minimum(start[:, None] + np.arange(self.forward), len(ts) - 1)
+            ohlc = np.stack((series.o[rows], series.h[rows], series.l[rows], series.c[rows]), axis=2)
+            prices[idx] = ohlc.reshape(len(idx), m)
+            ticks[idx] = ((ts[rows] / 1000)[:, :, None] + offsets).reshape(len(idx), m)
+            lengths[idx] = avail * 4
+            has = avail > 0
+            entry[idx[has]] = series.c[start[has]]
+
+        is_long = np.asarray(sides) == 'LONG'
+        tp_pct = np.asarray(tp_pct, dtype=np.float64)
+        sl_pct = np.asarray(sl_pct, dtype=np.float64)
+        tp = np.where(is_long, entry * (1 + tp_pct / 100), entry * (1 - tp_pct / 100))
+        sl = np.where(is_long, entry * (1 - sl_pct / 100), entry * (1 + sl_pct / 100))
+        expiry = msg_ts + np.asarray(validity, dtype=np.float64) * 60
+
+        end, code, _, peak = settle_paths(prices, ticks, entry, is_long, tp, sl, expiry, lengths)
+        # Peak takibi giriş fiyatından başlar (Position.highest_price/lowest_price gibi)
+        peak = np.where(is_long, np.maximum(peak, entry), np.minimum(peak, entry))
+        rows = np.arange(n)
+        exit_price = prices[rows, end]
+        qty = np.asarray(amount_usdt, dtype=np.float64) * np.asarray(leverage, dtype=np.float64) / entry
+        pnl = np.where(is_long, exit_price - entry, entry - exit_price) * qty
+
+        results = []
+        for i in range(n):
+            if lengths[i] == 0:
+                results.append(None)
+                continue
+            results.append({
+                'entry': float(entry[i]),
+                'exit': float(exit_price[i]),
+                'pnl': float(pnl[i]),
+                'peak': float(peak[i]),
+                'reason': EXIT_REASONS[code[i]],
+                'closed': bool(code[i] != EXIT_NONE),
+                'closed_at': float(ticks[i, end[i]]),
+            })
+        return results
@@ -2,8 +2,7 @@ import asyncio
 import json
 import os
 import sys
-import glob
-import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta, timezone
 from telethon import TelegramClient
 import aiofiles
@@ -11,9 +10,9 @@ import aiofiles
 # Proje Modülleri
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import TARGET_CHANNELS, API_ID, API_HASH
-from utils import find_coins, get_top_100_map, coin_categories
-from binance_client import BinanceExecutionEngine
+from utils import find_coins_batch, get_top_100_map, coin_categories
 from main import BotContext
+from kline_store import KlineStore
 import random
 # --- AYARLAR ---
 LOOKBACK_DAYS = 225
@@ -21,38 +20,22 @@ OBSERVATION_WINDOW = 40
 MIN_ROI_THRESHOLD = 0.5
 STOP_LOSS_LIMIT = 0.5
 OUTPUT_FILE = "hold_data.jsonl"
-CACHE_PATH = "market_cache/klines"
 COIN_MAP = get_top_100_map()
 
 class RAMDataCenter:
-    def __init__(self, path):
-        self.path = path
-        self.klines = {} # { 'BTCUSDT': DataFrame }
-        self.btc_df = None
+    def __init__(self, store):
+        self.store = store
+        self.klines = {} # { 'BTCUSDT': KlineSeries (memmap) }
+        self.btc = None
         self.passed = 0
         self.passedCoins = []
 
     def load_all_to_ram(self):
-        print("🧠 Veriler RAM'e yükleniyor, kemerleri bağla...")
-        files = glob.glob(f"{self.path}/*.pkl")
-        for i, file in enumerate(files):
-            symbol = os.path.basename(file).split("_")[0]
-            try:
-                df = pd.read_pickle(file)
-                df.set_index('ts', inplace=True)
-                df.sort_index(inplace=True)
-                self.klines[symbol] = df
-                if symbol == "BTCUSDT":
-                    self.btc_df = df
-                
-                # Yükleme İlerlemesi
-                if i % 10 == 0:
-                    sys.stdout.write(f"\r📦 RAM Yüklemesi: %{(i/len(files))*100:.1f}")
-                    sys.stdout.flush()
-            except Exception as e:
-                print(f"\n⚠️ {symbol} yüklenemedi: {e}")
-        
-        print(f"\n✅ {len(self.klines)} Coin RAM'e alındı. Madencilik hazır!")
+        # Parse/sort yok: Kolonlar memmap ile açılır, sayfalar erişildikçe RAM'e gelir
+        for symbol in self.store.symbols():
+            self.klines[symbol] = self.store.get(symbol)
+        self.btc = self.klines.get("BTCUSDT")
+        print(f"✅ {len(self.klines)} Coin hazır (memmap). Madencilik hazır!")
 
     async def get_fast_outcome(self, ctx, symbol, msg_ts, btc_trend):
         """RAM üzerinden teknik analiz yapar. RSI ve çoklu momentum eklenmiştir."""
@@ -61,34 +44,33 @@ class RAMDataCenter:
             self.passedCoins.append(symbol)
             return None
         
-        df = self.klines[symbol]
+        series = self.klines[symbol]
         target_ts = (int(msg_ts) // 60) * 60 * 1000 
         
         try:
-            # 1. Haber Anı İndeksi
-            idx = df.index.get_indexer([target_ts], method='pad')[0]
-            if idx < 60 or idx + OBSERVATION_WINDOW >= len(df): return None
+            # 1. Haber Anı İndeksi (O(log n))
+            idx = int(series.index_at(target_ts))
+            if idx < 60 or idx + OBSERVATION_WINDOW >= len(series): return None
             
             # 2. Teknik Metrikler (Momentum)
-            entry_price = df.iloc[idx]['c']
-            ch_1m = ((entry_price - df.iloc[idx-1]['c']) / df.iloc[idx-1]['c']) * 100
-            ch_10m = ((entry_price - df.iloc[idx-10]['c']) / df.iloc[idx-10]['c']) * 100
-            ch_1h = ((entry_price - df.iloc[idx-60]['c']) / df.iloc[idx-60]['c']) * 100
+            c = series.c
+            entry_price = float(c[idx])
+            ch_1m = ((entry_price - c[idx-1]) / c[idx-1]) * 100
+            ch_10m = ((entry_price - c[idx-10]) / c[idx-10]) * 100
+            ch_1h = ((entry_price - c[idx-60]) / c[idx-60]) * 100
             
-            # 3. RSI Hesaplama (Son 14 periyot üzerinden manuel/hızlı)
-            # Daha verimli olması için Pandas rolling de kullanılabilir ama RAM miner için bu yeterli
-            delta = df.iloc[idx-20 : idx+1]['c'].diff()
-            up = delta.clip(lower=0)
-            down = -1 * delta.clip(upper=0)
-            ema_up = up.rolling(window=14).mean()
-            ema_down = down.rolling(window=14).mean()
-            rs = ema_up / ema_down
-            rsi_val = 100 - (100 / (1 + rs.iloc[-1]))
+            # 3. RSI Hesaplama (Son 14 periyodun basit ortalaması)
+            delta = np.diff(c[idx-20 : idx+1])
+            ema_up = np.clip(delta, 0, None)[-14:].mean()
+            ema_down = np.clip(-delta, 0, None)[-14:].mean()
+            if ema_down: rsi_val = 100 - (100 / (1 + ema_up / ema_down))
+            else: rsi_val = 100.0 if ema_up else float('nan')
 
             # 4. Performans Analizi (Gelecek 20 dk)
-            future_df = df.iloc[idx+1 : idx + OBSERVATION_WINDOW + 1]
-            max_h = ((future_df['h'].max() - entry_price) / entry_price) * 100
-            min_l = ((future_df['l'].min() - entry_price) / entry_price) * 100
+            future = slice(idx + 1, idx + OBSERVATION_WINDOW + 1)
+            future_h, future_l = series.h[future], series.l[future]
+            max_h = ((future_h.max() - entry_price) / entry_price) * 100
+            min_l = ((future_l.min() - entry_price) / entry_price) * 100
             
             # 5. Karar Mekanizması
             action = None
@@ -96,17 +78,13 @@ class RAMDataCenter:
             peak_min = 0
 
             if max_h >= MIN_ROI_THRESHOLD and abs(min_l) < STOP_LOSS_LIMIT:
-                funding = await ctx.real_exchange.client.futures_funding_rate(symbol=symbol.upper(), limit=1)
-                funding_rate = float(funding[0]['fundingRate']) if funding else 0.01
                 action = "LONG"
                 peak_pct = round(max_h, 2)
-                peak_min = int(future_df['h'].argmax()) + 1
+                peak_min = int(future_h.argmax()) + 1
             elif abs(min_l) >= MIN_ROI_THRESHOLD and max_h < STOP_LOSS_LIMIT:
-                funding = await ctx.real_exchange.client.futures_funding_rate(symbol=symbol.upper(), limit=1)
-                funding_rate = float(funding[0]['fundingRate']) if funding else 0.01
                 action = "SHORT"
                 peak_pct = round(min_l, 2)
-                peak_min = int(future_df['l'].argmin()) + 1
+                peak_min = int(future_l.argmin()) + 1
 
             if action: return None
 
@@ -115,14 +93,14 @@ class RAMDataCenter:
             lookup_symbol = clean_symbol[4:] if clean_symbol.startswith("1000") else clean_symbol
             
             coin_info = COIN_MAP.get(lookup_symbol.lower(), {})
-            funding = await ctx.real_exchange.client.futures_funding_rate(symbol=symbol.upper(), limit=1)
-            funding_rate = float(funding[0]['fundingRate']) if funding else 0.01
+            # Haber anında geçerli oran (Yerel depo, data_prepare.py)
+            funding_rate = self.store.funding_at(symbol, target_ts, default=0.01)
             return {
                 "symbol": symbol,
                 "price": round(entry_price, 6),
                 "market_cap": f"{coin_info.get('cap', 0)/1e9:.2f}B",
                 "category": coin_categories.get(lookup_symbol, "Unknown"),
-                "rsi": round(rsi_val, 2) if not pd.isna(rsi_val) else 50.0,
+                "rsi": round(rsi_val, 2) if not np.isnan(rsi_val) else 50.0,
                 "btc_trend": btc_trend,
                 "funding": funding_rate,
                 "momentum": {
@@ -140,25 +118,23 @@ class RAMDataCenter:
             return None
     
     def get_btc_trend_ram(self, msg_ts):
-        """BTC trendini RAM'den çeker."""
-        if self.btc_df is None: return 0.0
+        """BTC trendini depodan çeker."""
+        if self.btc is None: return 0.0
         target_ts = (int(msg_ts) // 60) * 60 * 1000
         try:
-            idx = self.btc_df.index.get_indexer([target_ts], method='pad')[0]
+            idx = int(self.btc.index_at(target_ts))
             if idx < 60: return 0.0
-            start_p = self.btc_df.iloc[idx - 60]['c']
-            end_p = self.btc_df.iloc[idx]['c']
-            return round(((end_p - start_p) / start_p) * 100, 2)
+            start_p = self.btc.c[idx - 60]
+            end_p = self.btc.c[idx]
+            return round(float((end_p - start_p) / start_p) * 100, 2)
         except: return 0.0
 
 async def main():
     # 1. RAM Hazırlığı
-    ram = RAMDataCenter(CACHE_PATH)
+    ram = RAMDataCenter(KlineStore())
     ram.load_all_to_ram()
     print("RAM Hazırlığı Bitti")
     ctx = BotContext()
-    ctx.real_exchange = BinanceExecutionEngine("", "")
-    await ctx.real_exchange.connect()
 
     # 2. Telegram Hazırlığı
     client = TelegramClient("crypto_agent_session", API_ID, API_HASH)
@@ -176,13 +152,13 @@ async def main():
                 all_msgs = await client.get_messages(channel, offset_date=start_date, limit=20000)
                 
                 random.shuffle(all_msgs)
+                processed += len(all_msgs)
+
+                # Coin tespiti tüm çekirdeklere dağıtılır, sadece coin bulunan mesajlar döner
+                texts = [m.text if m.text and len(m.text) >= 20 else None for m in all_msgs]
                 
-                for i, message in enumerate(all_msgs):
-                    processed += 1
-                    if not message.text or len(message.text) < 20: continue
-                    
-                    detected = find_coins(message.text, COIN_MAP)
-                    if not detected: continue
+                for i, (msg_idx, detected) in enumerate(find_coins_batch(texts, COIN_MAP)):
+                    message = all_msgs[msg_idx]
                     
                     # Trendi ve Outcome'ı RAM'den al (Neredeyse anlık)
                     btc_trend = ram.get_btc_trend_ram(message.date.timestamp())
@@ -197,7 +173,7 @@ async def main():
                     
                     # Progress log
                     if i % 100 == 0:
-                        sys.stdout.write(f"\r🚀 Kanal: {channel} | %{((i+1)/len(all_msgs))*100:.1f} | Toplam Bulunan: {found}")
+                        sys.stdout.write(f"\r🚀 Kanal: {channel} | Coinli Mesaj: {i+1} | Toplam Bulunan: {found}")
                         sys.stdout.flush()
 
     finally:
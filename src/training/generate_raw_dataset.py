@@ -11,9 +11,9 @@ import random
 # Proje Modülleri
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import TARGET_CHANNELS, API_ID, API_HASH
-from binance_client import BinanceExecutionEngine
-from utils import find_coins, get_top_100_map, coin_categories
+from utils import find_coins_batch, get_top_100_map, coin_categories
 from price_buffer import PriceBuffer
+from kline_store import KlineStore
 
 # --- AYARLAR ---
 LOOKBACK_DAYS = 175
@@ -31,37 +31,38 @@ async def get_market_outcome(ctx, pair, msg_ts, btc_trend): # btc_trend dışar
         # 1. FUNDING RATE
         
 
-        # 2. TEKNİK ANALİZ (100 dk geri)
-        klines_hist = await ctx.real_exchange.client.futures_klines(
-            symbol=pair.upper(), interval='1m', startTime=start_ms - 6000000, endTime=start_ms, limit=100
-        )
-        if not klines_hist: return None
+        # 2. TEKNİK ANALİZ (100 dk geri, yerel depodan)
+        series = ctx.klines.get(pair)
+        if series is None: return None
+        hist = series.window(start_ms - 6000000, start_ms)
+        hist = slice(hist.start, min(hist.stop, hist.start + 100)) # REST limit=100 karşılığı
+        closes_hist = series.c[hist]
+        if not len(closes_hist): return None
         
         pb = PriceBuffer()
-        for k in klines_hist: pb.update_candle(float(k[4]), k[0]/1000, True)
+        for t, c in zip(series.ts[hist], closes_hist): pb.update_candle(float(c), t/1000, True)
         rsi_val = pb.calculate_rsi(14)
-        entry_price = float(klines_hist[-1][4])
+        entry_price = float(closes_hist[-1])
         
         # Değişimler
-        price_1h_ago = float(klines_hist[-60][4]) if len(klines_hist) >= 60 else float(klines_hist[0][4])
+        price_1h_ago = float(closes_hist[-60]) if len(closes_hist) >= 60 else float(closes_hist[0])
         change_1h = ((entry_price - price_1h_ago) / price_1h_ago) * 100
 
         # 3. MARKET CAP & KATEGORİ
         clean_symbol = pair.upper().replace("USDT", "")
         coin_info = COIN_MAP.get(clean_symbol.lower(), {})
         mcap = coin_info.get("cap", 0)
-        category = coin_category.get(clean_symbol.upper(), "Unknown")
+        category = coin_categories.get(clean_symbol.upper(), "Unknown")
 
         # 4. HABER SONRASI (20 dk)
-        after_klines = await ctx.real_exchange.client.futures_klines(
-            symbol=pair.upper(), interval='1m', startTime=start_ms, limit=OBSERVATION_WINDOW + 1
-        )
+        start = int(series.index_at(start_ms, side='left'))
+        after = slice(start, start + OBSERVATION_WINDOW + 1)
         max_high, min_low = 0.0, 0.0
         p_high_min, p_low_min = 0, 0
         
-        for i, k in enumerate(after_klines):
-            h_move = ((float(k[2]) - entry_price) / entry_price) * 100
-            l_move = ((float(k[3]) - entry_price) / entry_price) * 100
+        for i, (h, l) in enumerate(zip(series.h[after], series.l[after])):
+            h_move = ((float(h) - entry_price) / entry_price) * 100
+            l_move = ((float(l) - entry_price) / entry_price) * 100
             if h_move > max_high: max_high, p_high_min = h_move, i
             if l_move < min_low: min_low, p_low_min = l_move, i
 
@@ -78,8 +79,8 @@ async def get_market_outcome(ctx, pair, msg_ts, btc_trend): # btc_trend dışar
             #return {**data_template, "action": "SHORT", "peak_pct": round(min_low, 2), "peak_min": p_low_min}
             return None
             
-        funding = await ctx.real_exchange.client.futures_funding_rate(symbol=pair.upper(), limit=1)
-        funding_rate = float(funding[0]['fundingRate']) if funding else 0.01
+        # Haber anında geçerli oran (Yerel depo, data_prepare.py)
+        funding_rate = ctx.klines.funding_at(pair, start_ms, default=0.01)
         return {
             **data_template,
             "action": "HOLD",
@@ -89,21 +90,21 @@ async def get_market_outcome(ctx, pair, msg_ts, btc_trend): # btc_trend dışar
         }
     except: return None
 
-async def get_btc_trend(ctx, msg_ts):
+def get_btc_trend(ctx, msg_ts):
     """Haber anındaki BTC 1 saatlik trendini tek seferde hesaplar."""
     try:
         start_ms = int(msg_ts * 1000)
-        klines = await ctx.real_exchange.client.futures_klines(
-            symbol="BTCUSDT", interval='1m', startTime=start_ms - 3600000, endTime=start_ms, limit=61
-        )
-        if not klines: return 0.0
-        start_p, end_p = float(klines[0][4]), float(klines[-1][4])
+        btc = ctx.klines.get("BTCUSDT")
+        if btc is None: return 0.0
+        closes = btc.c[btc.window(start_ms - 3600000, start_ms)]
+        if not len(closes): return 0.0
+        start_p, end_p = float(closes[0]), float(closes[-1])
         return round(((end_p - start_p) / start_p) * 100, 2)
     except: return 0.0
 
 async def main():
-    ctx = type('obj', (object,), {'real_exchange': BinanceExecutionEngine("", "")})
-    await ctx.real_exchange.connect()
+    # Tüm piyasa verisi yerel depodan (Örnek başına ağ çağrısı yok)
+    ctx = type('obj', (object,), {'klines': KlineStore()})
 
     client = TelegramClient(os.path.join("data", "crypto_agent_session"), API_ID, API_HASH)
     await client.connect()
@@ -123,18 +124,17 @@ async def main():
 
                 # 2. TUR: İşleme
                 random.shuffle(all_msgs)
-                for i, message in enumerate(all_msgs): # Eskiden yeniye
-                    processed += 1
-                    percent = ((i + 1) / chan_total) * 100
-                    sys.stdout.write(f"\r🚀 %{percent:.2f} | İncelenen: {processed} | Elmas: {found} | Kanal: {channel}")
+                texts = [m.text if m.text and len(m.text) >= 20 else None for m in all_msgs]
+                processed += chan_total
+
+                # Coin tespiti process pool'da, sadece coin bulunan mesajlar geri gelir
+                for i, (msg_idx, detected) in enumerate(find_coins_batch(texts, COIN_MAP)):
+                    message = all_msgs[msg_idx]
+                    sys.stdout.write(f"\r🚀 Coinli Mesaj: {i + 1} | İncelenen: {processed} | Elmas: {found} | Kanal: {channel}")
                     sys.stdout.flush()
 
-                    if not message.text or len(message.text) < 20: continue
-                    detected = find_coins(message.text, COIN_MAP)
-                    if not detected: continue
-                    
                     # BTC Trendini haber bazında BİR KERE hesapla
-                    btc_trend = await get_btc_trend(ctx, message.date.timestamp())
+                    btc_trend = get_btc_trend(ctx, message.date.timestamp())
                     
                     for pair in detected:
                         res = await get_market_outcome(ctx, pair, message.date.timestamp(), btc_trend)
@@ -145,12 +145,10 @@ async def main():
                             os.fsync(f.fileno())
                             found += 1
                             print(f"\n💎 [{res['action']}] {pair} | %{res['peak_pct']} | {message.date.strftime('%Y-%m-%d %H:%M')}")
-                        await asyncio.sleep(0.01)
 
     finally:
         print("\n🧹 Oturumlar kapatılıyor...")
         await client.disconnect()
-        if hasattr(ctx.real_exchange, 'client'): await ctx.real_exchange.client.close_connection()
         print("✅ Tamamlandı.")
 
 if __name__ == "__main__":
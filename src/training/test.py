@@ -10,12 +10,9 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import TARGET_CHANNELS, API_ID, API_HASH, TELETHON_SESSION_NAME, STARTING_BALANCE
 from main import BotContext, SharedState
-from binance_client import BinanceExecutionEngine
-from services import process_news, ensure_fresh_data
 from utils import find_coins, get_top_100_map
-from price_buffer import PriceBuffer
-from exchange import PaperExchange
 from brain import AgentBrain
+from backtest_engine import BacktestEngine
 from config import GROQCLOUD_API_KEY, GROQCLOUD_MODEL, GOOGLE_API_KEY, GEMINI_MODEL
 
 # 1. DATABASE'İ DEVRE DIŞI BIRAKAN MOCK
@@ -25,122 +22,77 @@ class MockMemory:
     def log_decision(self, record): return 999 # Fake ID
     def log_trade(self, record, decision_id=None): pass
 
-async def get_historical_technicals(ctx, pair, msg_ts):
-    """Haber anındaki teknik metrikleri hesaplar."""
-    # 1. Hedef Coin için geçmiş 100 dakikayı çek (RSI ve Changes için)
-    # 100 dakika çekiyoruz ki RSI (14) sağlıklı hesaplansın
-    klines = await ctx.real_exchange.client.futures_klines(
-        symbol=pair.upper(),
-        interval='1m',
-        endTime=int(msg_ts * 1000),
-        limit=100
-    )
-    
-    if not klines:
-        return None
-
-    # Buffer oluştur ve doldur
-    temp_buffer = PriceBuffer()
-    for k in klines:
-        # (price, timestamp, is_closed)
-        temp_buffer.update_candle(float(k[4]), k[0]/1000, True)
-    
-    # Anlık fiyatı son kapanışa eşitle
-    temp_buffer.current_price = float(klines[-1][4])
-    
-    # 2. BTC Trendi için aynı işlemi yap
-    btc_klines = await ctx.real_exchange.client.futures_klines(
-        symbol="BTCUSDT",
-        interval='1m',
-        endTime=int(msg_ts * 1000),
-        limit=60
-    )
-    
-    btc_trend = 0.0
-    if btc_klines:
-        btc_start = float(btc_klines[0][4])
-        btc_end = float(btc_klines[-1][4])
-        btc_trend = ((btc_end - btc_start) / btc_start) * 100
-
-    return {
-        'price': temp_buffer.current_price,
-        'rsi': temp_buffer.calculate_rsi(),
-        'changes': temp_buffer.get_all_changes(),
-        'btc_trend': btc_trend,
-    }
-
 coin_map = get_top_100_map()
-async def simulate_process_news(message, ctx, f_log):
+
+def coin_info(pair):
+    """Coin tam adı ve market cap metni"""
+    # Güvenli Sözlük Erişimi
+    clean_symbol = pair.lower().replace("usdt", "")
+    c_data = coin_map.get(clean_symbol)
+    if isinstance(c_data, dict):
+        coin_full_name = c_data.get("name", "Unknown").title()
+        m_cap = c_data.get("cap", 0)
+    else:
+        coin_full_name = "Unknown"
+        m_cap = 0
+
+    # Market Cap Formatlama
+    if m_cap > 1_000_000_000:
+        cap_str = f"${m_cap / 1_000_000_000:.2f} BILLION"
+    elif m_cap > 1_000_000:
+        cap_str = f"${m_cap / 1_000_000:.2f} MILLION"
+    else:
+        cap_str = "UNKNOWN/SMALL"
+    return coin_full_name, cap_str
+
+async def detect_pairs(message, ctx):
     """
-    services.py -> process_news() fonksiyonunun simülasyon versiyonu.
-    Araştırma (Research) kısmını atlar, teknik verileri geçmişten çeker.
+    services.py -> detect_stage() filtre + coin tespiti (Regex + AI Fallback).
     """
     msg_text = message.text
-    msg_ts = message.date.timestamp()
-    msg_dt = message.date.strftime("%Y-%m-%d %H:%M:%S")
+    if not msg_text: return []
 
     # --- 1. FİLTRELEME (is_duplicate benzeri) ---
-    # Simülasyonda aynı haberi tekrar işlememek için basit bir kontrol
     # (MockMemory zaten False dönecek şekilde ayarlandı)
     is_dup, _ = ctx.memory.is_duplicate(msg_text)
-    if is_dup: return
+    if is_dup: return []
 
-    # --- 2. COIN TESPİTİ (Regex + AI Fallback) ---
-    # services.py'daki mantığın aynısı
+    # --- 2. COIN TESPİTİ ---
     detected_pairs = find_coins(msg_text, coin_map=coin_map)
     
     if not detected_pairs:
         # Regex bulamazsa AI'ya sor (detect_symbol)
         found_symbol = await ctx.brain.detect_symbol(msg_text, coin_map)
         if found_symbol:
-            pot_pair = f"{found_symbol.lower()}usdt"
-            detected_pairs.append(pot_pair)
+            detected_pairs.append(f"{found_symbol.lower()}usdt")
 
-    if detected_pairs == None:
-        return # Hiç coin yoksa geç
+    return detected_pairs or []
 
-    # --- 3. ANALİZ DÖNGÜSÜ ---
-    for pair in detected_pairs:
+async def simulate_events(events, ctx, f_log):
+    """
+    services.py -> Haber hattının (enrich/decide/execute) toplu simülasyon versiyonu.
+    Araştırma (Research) kısmını atlar. Teknik veriler ve pozisyon sonuçları yerel kline
+    cache'ten (data_prepare.py) hesaplanır; borsaya REST çağrısı yapılmaz.
+    events: [(message, pair), ...] (Zaman sırasıyla)
+    """
+    if not events: return
+
+    # --- 3. TEKNİK VERİLER (Tüm haber anları, sembol başına tek arama) ---
+    pairs = [pair for _, pair in events]
+    stamps = [message.date.timestamp() for message, _ in events]
+    technicals = ctx.backtest.technicals(pairs, stamps)
+
+    # --- 4. AI KARARLARI ---
+    trades = []  # [(event_index, decision, report_entry)]
+    for i, ((message, pair), tech) in enumerate(zip(events, technicals)):
+        if not tech: continue
+        msg_text = message.text
+        msg_dt = message.date.strftime("%Y-%m-%d %H:%M:%S")
         try:
-            # A) Geçmiş Veri Çekme (Haber anındaki 1 saatlik veri)
-            # ensure_fresh_data'nın simülasyon karşılığı
-            klines = await ctx.real_exchange.client.futures_klines(
-                symbol=pair.upper(),
-                interval='1m',
-                startTime=int(msg_ts * 1000),
-                limit=61 # Analiz + 60dk takip
-            )
-            if not klines: continue
+            print(f"📊 Teknik Veriler ({pair}): RSI: {tech['rsi']:.2f} | BTC 1h: {tech['btc_trend']:.2f}%")
+            coin_full_name, cap_str = coin_info(pair)
 
-            # Haber anındaki fiyat (Entry)
-            entry_price = float(klines[0][4]) # Close
-            
-            # Analiz için gereken değişimler (Haber anında hepsi 0 varsayılıyor veya geçmiş kline ile hesaplanabilir)
-            # A) Teknik Verileri "Haber Anına" Göre Hazırla
-            tech = await get_historical_technicals(ctx, pair, msg_ts)
-            if not tech: continue
-
-            print(f"📊 Teknik Veriler Alındı ({pair}): RSI: {tech['rsi']:.2f} | BTC 1h: {tech['btc_trend']:.2f}%")
-
-            #Get coin full name
-            # Güvenli Sözlük Erişimi
-            clean_symbol = pair.lower().replace("usdt", "")
-            c_data = coin_map.get(clean_symbol)
-            if isinstance(c_data, dict):
-                coin_full_name = c_data.get("name", "Unknown").title()
-                m_cap = c_data.get("cap", 0)
-            else:
-                coin_full_name = "Unknown"
-                m_cap = 0
-
-            # Market Cap Formatlama
-            if m_cap > 1_000_000_000:
-                cap_str = f"${m_cap / 1_000_000_000:.2f} BILLION"
-            elif m_cap > 1_000_000:
-                cap_str = f"${m_cap / 1_000_000:.2f} MILLION"
-            else:
-                cap_str = "UNKNOWN/SMALL"
-            # B) AI Kararını Gerçek Teknik Verilerle Al
+            # AI Kararını Gerçek Teknik Verilerle Al
             dec = await ctx.brain.analyze_specific_no_research(
                 news=msg_text,
                 symbol=pair,
@@ -151,26 +103,13 @@ async def simulate_process_news(message, ctx, f_log):
                 rsi_val=tech['rsi'],     # Gerçek RSI
                 btc_trend=tech['btc_trend'], # Gerçek BTC Trendi
                 volume_24h="UNKNOWN", # Geçmiş hacmi çekmek zordur, opsiyonel
-                funding_rate=0.01      # Sabit veya anlık verilebilir
+                funding_rate=0.01,     # Sabit veya anlık verilebilir
+                current_time=message.date  # Haber anı (Tekrar koşumda karar önbellekten)
             )
             print(f"🧠 AI Karar: symbol: {pair}, action: {dec['action']}, confidence: {dec['confidence']}")
 
-            # C) Karar Uygulama (Confidence >= 65 Check)
+            # Karar Uygulama (Confidence >= 65 Check)
             if dec.get("confidence", 0) >= 65 and dec.get("action") in ["LONG", "SHORT"]:
-                
-                # --- SİMÜLASYON İŞLEM AÇILIŞI ---
-                # execute_trade_logic yerine test versiyonu
-                trade_amount = ctx.exchange.balance * 0.40 # Sabit test tutarı
-                leverage = 10
-                
-                if dec.get("confidence", 0) >= 75:
-                    trade_amount = ctx.exchange.balance * 0.60 # Sabit test tutarı
-                    leverage = 15
-                
-                if dec.get("confidence", 0) >= 90:
-                    trade_amount = ctx.exchange.balance * 0.80 # Sabit test tutarı
-                    leverage = 20
-                
                 report_entry = (
                     f"\n{'='*60}\n"
                     f"🔔 YENİ İŞLEM TESPİTİ | {msg_dt}\n"
@@ -178,7 +117,7 @@ async def simulate_process_news(message, ctx, f_log):
                     f"📰 HABER: {msg_text[:150]}...\n"
                     f"🎯 HEDEF: {pair.upper()} ({coin_full_name})\n"
                     f"📊 ANALİZ VERİLERİ:\n"
-                    f"   - Giriş Fiyatı: {entry_price}\n"
+                    f"   - Analiz Fiyatı: {tech['price']}\n"
                     f"   - RSI: {tech['rsi']:.2f}\n"
                     f"   - BTC Trend (1h): %{tech['btc_trend']:.2f}\n"
                     f"   - Market Cap: {cap_str}\n"
@@ -188,49 +127,43 @@ async def simulate_process_news(message, ctx, f_log):
                     f"   - Sebep: {dec.get('reason')}\n"
                     f"{'-'*60}\n"
                 )
-                
-                # İşlemi aç
-                open_log, _ = ctx.exchange.open_position_test(
-                    symbol=pair, side=dec["action"], price=entry_price,
-                    tp_pct=dec.get("tp_pct", 1.5), sl_pct=dec.get("sl_pct", 1.0),
-                    amount_usdt=100, leverage=10, validity=dec.get("validity_minutes", 15),
-                    app_state=ctx.app_state, decision_id=999, now_ts=msg_ts
-                )
-                
-                print(f"🚀 İşlem Açıldı: {pair} | {dec['action']}")
-
-                # --- 4. POZİSYON TAKİBİ (15sn Ticks) ---
-                # services.py'daki websocket_loop ve monitor_loop'un simülasyonu
-                for k in klines:
-                    minute_ts = k[0] / 1000
-                    # OHLC Verileriyle 15 saniyelik tick simülasyonu
-                    ticks = [float(k[1]), float(k[2]), float(k[3]), float(k[4])]
-                    
-                    for i, tick_price in enumerate(ticks):
-                        current_ts = minute_ts + (i * 15)
-                        # Pozisyonu kontrol et (Test versiyonu)
-                        res_log, _, sym, pnl, peak, _ = ctx.exchange.check_positions_test(
-                            pair, tick_price, now_ts=current_ts
-                        )
-                        
-                        if res_log:
-                            close_dt = datetime.fromtimestamp(current_ts).strftime("%Y-%m-%d %H:%M:%S")
-                            report_exit = (
-                                f"🏁 İŞLEM SONUCU ({close_dt}):\n"
-                                f"   - Durum: {res_log}\n"
-                                f"   - Kar/Zarar: {pnl:.2f} USDT\n"
-                                f"   - Görülen En İyi Fiyat (Peak): {peak}\n"
-                                f"{'='*60}\n"
-                            )
-                            
-                            f_log.write(report_entry + report_exit)
-                            f_log.flush() # Dosyaya anında yaz
-                            print(f"✅ İşlem Tamamlandı: {pair} | PnL: {pnl:.2f}")
-                            return # Pozisyon kapandı, bir sonraki habere geç
-
+                trades.append((i, dec, report_entry))
         except Exception as e:
             print(f"⚠️ Simülasyon Hatası ({pair}): {e}")
 
+    if not trades: return
+
+    # --- 5. POZİSYON SONUÇLARI (Tüm işlemler tek vektörel çağrıda) ---
+    # Her mum O->H->L->C sırasıyla 15sn arayla tick sayılır (websocket_loop + monitor_loop simülasyonu)
+    results = ctx.backtest.settle(
+        symbols=[pairs[i] for i, _, _ in trades],
+        msg_ts=[stamps[i] for i, _, _ in trades],
+        sides=[dec["action"] for _, dec, _ in trades],
+        tp_pct=[dec.get("tp_pct", 1.5) for _, dec, _ in trades],
+        sl_pct=[dec.get("sl_pct", 1.0) for _, dec, _ in trades],
+        validity=[dec.get("validity_minutes", 15) for _, dec, _ in trades],
+        amount_usdt=100, leverage=10,
+    )
+
+    total_pnl = 0.0
+    for (i, dec, report_entry), res in zip(trades, results):
+        pair = pairs[i]
+        if res is None or not res['closed']:
+            continue # Pencere içinde kapanmadı
+        total_pnl += res['pnl']
+        close_dt = datetime.fromtimestamp(res['closed_at']).strftime("%Y-%m-%d %H:%M:%S")
+        report_exit = (
+            f"🏁 İŞLEM SONUCU ({close_dt}):\n"
+            f"   - Durum: 🏁 KAPANDI: {pair.upper()} ({res['reason']}) | PnL: {res['pnl']:.2f} USDT | Enter: {res['entry']} | Close: {res['exit']}\n"
+            f"   - Kar/Zarar: {res['pnl']:.2f} USDT\n"
+            f"   - Görülen En İyi Fiyat (Peak): {res['peak']}\n"
+            f"{'='*60}\n"
+        )
+        f_log.write(report_entry + report_exit)
+        print(f"✅ İşlem Tamamlandı: {pair} | PnL: {res['pnl']:.2f}")
+    f_log.flush() # Dosyaya anında yaz
+    print(f"💰 Toplam PnL: {total_pnl:.2f} USDT ({len(trades)} işlem)")
+
 async def run_simulation(model = "LlamaTrader"):
     print("🚀 NEXUS BACKTEST SİMÜLASYONU BAŞLIYOR...")
     
@@ -238,7 +171,7 @@ async def run_simulation(model = "LlamaTrader"):
     ctx = BotContext()
     ctx.app_state = SharedState()
     ctx.memory = MockMemory() # DB susturuldu
-    ctx.exchange = PaperExchange(1000.0)
+    ctx.backtest = BacktestEngine() # Yerel kline cache (data_prepare.py)
     ctx.brain = AgentBrain(
         use_groqcloud=False,
         api_key=GROQCLOUD_API_KEY,
@@ -248,9 +181,6 @@ async def run_simulation(model = "LlamaTrader"):
         gemini_model=GEMINI_MODEL
     )
     ctx.brain.ollama_model = model
-    # Borsa bağlantısı (Sadece geçmiş veri çekmek için)
-    ctx.real_exchange = BinanceExecutionEngine("", "") 
-    await ctx.real_exchange.connect()
     
     # Telegram İstemcisi
     path = os.path.realpath(__file__)
@@ -268,18 +198,22 @@ async def run_simulation(model = "LlamaTrader"):
     if not os.path.exists(results_file):
         os.makedirs(os.path.dirname(results_file), exist_ok=True)
         
+    # Tüm haberleri topla (Coin tespiti dahil), sonra tek seferde simüle et
+    events = []
+    for channel in TARGET_CHANNELS:
+        print(f"📡 {channel} kanalı taranıyor...")
+        async for message in client.iter_messages(channel, offset_date=three_days_ago, reverse=True):
+            for pair in await detect_pairs(message, ctx):
+                events.append((message, pair))
+    await client.disconnect()
+    events.sort(key=lambda e: e[0].date)
+
     with open(results_file, "a", encoding="utf-8") as f:
         f.write(f"\n--- SIMULATION RUN: {datetime.now()} ---\n")
-
-        for channel in TARGET_CHANNELS:
-            print(f"📡 {channel} kanalı taranıyor...")
-            async for message in client.iter_messages(channel, offset_date=three_days_ago, reverse=True):
-                
-                await simulate_process_news(message, ctx, f)
+        await simulate_events(events, ctx, f)
     
     print(f"--- ✅ SİMÜLASYON BİTTİ. Sonuçlar: {results_file} ---")
-    await client.disconnect()
 
 if __name__ == "__main__":
     # Run the simulation for 2 different models
-    asyncio.run(run_simulation("LlamaTrader"))
\ No newline at end of file
+    asyncio.run(run_simulation("LlamaTrader"))
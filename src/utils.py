@@ -2,6 +2,10 @@ import requests
 from ddgs import DDGS # <--- YENİ IMPORT
 import asyncio
 import re
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
 from config import DANGEROUS_TICKERS, AMBIGUOUS_COINS
 
 def get_top_pairs(limit=50):
@@ -110,61 +114,192 @@ def clean_coin_map(raw_map):
             clean_map[str(key).upper()] = str(value).lower()
     return clean_map
 
+# Bağlam kelimeleri: DANGEROUS ticker'lar sadece bunlardan biriyle kabul edilir ("THE Protocol")
+CONTEXT_WORDS_RE = re.compile(r'\s+(protocol|network|token|coin|dao|chain|finance|labs|swap)', re.IGNORECASE)
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+class CoinMatcher:
+    """
+    Coin haritasından bir kez derlenen Aho-Corasick otomatı.
+    Mesajı tek geçişte tarar (O(len(msg))), ticker ve tam isimleri birlikte bulur.
+    Kelime sınırı ve bağlam kontrolleri eşleşmeden SONRA uygulanır.
+    """
+    TICKER = 0
+    DANGEROUS = 1
+    AMBIGUOUS = 2
+    NAME = 3
+
+    def __init__(self, coin_map):
+        # Düğüm başına: geçişler, fail linki, çıktılar [(uzunluk, sembol, tür)]
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+        ambiguous = {k.upper(): v for k, v in AMBIGUOUS_COINS.items()}
+
+        for symbol, full_name in clean_coin_map(coin_map).items():
+            # Kararlılık kontrolü: Stablecoin'leri ele
+            if check_is_stablecoin(symbol):
+                continue
+
+            # SENARYO 1: DANGEROUS TICKERS (THE, IS, A...) -> sadece sembol + bağlam kelimesi
+            if symbol in DANGEROUS_TICKERS:
+                self._add(symbol, symbol, self.DANGEROUS)
+                continue
+
+            # SENARYO 2: AMBIGUOUS COINS -> BÜYÜK harfle yazılmış sembol veya özel isim
+            if symbol in ambiguous:
+                self._add(symbol, symbol, self.AMBIGUOUS)
+                # İsim tickerla aynıysa (Just, Sun) isim yolu küçük harfi de kabul ederdi -> Sadece ticker kuralı
+                if ambiguous[symbol].upper() != symbol:
+                    self._add(ambiguous[symbol].upper(), symbol, self.NAME)
+                continue
+
+            # SENARYO 3: NORMAL COINLER -> sembol ya da tam isim (tam kelime olarak)
+            self._add(symbol, symbol, self.TICKER)
+            if full_name and len(full_name) > 2:
+                self._add(full_name.upper(), symbol, self.NAME)
+
+        self._build_fail_links()
+
+    def _add(self, pattern, symbol, kind):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append((len(pattern), symbol, kind))
+
+    def _build_fail_links(self):
+        # BFS: her düğümün fail linki en uzun uygun sonek düğümüdür
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                # Sonek çıktılarını birleştir ki tarama sırasında zincir yürümeyelim
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, msg):
+        """Mesajdaki coinleri ilk geçtikleri sırayla 'XXXUSDT' formatında döndürür."""
+        if not msg: return []
+
+        # Büyük harf üzerinde tarıyoruz (Eski regex mantığı da msg_upper kullanıyordu)
+        text = msg.upper()
+        # İ gibi harfler upper() sonrası uzunluğu değiştirebilir, o zaman orijinal hizalanamaz
+        aligned = len(text) == len(msg)
+        n = len(text)
+
+        goto, fail, out = self.goto, self.fail, self.out
+        detected = {}
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+
+            end = i + 1
+            for length, symbol, kind in out[node]:
+                if symbol in detected:
+                    continue
+                start = end - length
+                # Kelime sınırı (\b) kontrolü
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if end < n and _is_word_char(text[end]):
+                    continue
+
+                if kind == self.DANGEROUS:
+                    if not CONTEXT_WORDS_RE.match(text, end):
+                        continue
+                elif kind == self.AMBIGUOUS:
+                    # Örn: "Buy LINK" kabul, "link in bio" değil
+                    if not aligned or msg[start:end] != symbol:
+                        continue
+
+                detected[symbol] = True
+
+        # Sonuçları USDT pair formatına çevir
+        return [f"{s}USDT" for s in detected]
+
+# Son kullanılan harita için derlenmiş matcher (find_coins her çağrıda yeniden kurmasın)
+_matcher_cache = (None, None)
+
+def get_coin_matcher(coin_map):
+    global _matcher_cache
+    cached_map, matcher = _matcher_cache
+    if matcher is None or cached_map is not coin_map:
+        matcher = CoinMatcher(coin_map)
+        _matcher_cache = (coin_map, matcher)
+    return matcher
+
 def find_coins(msg, coin_map=None):
     if not msg: return []
-    
-    # 1. Veriyi standardize et (Sıfır karmaşa)
-    coin_map = clean_coin_map(coin_map)
-    detected_symbols = set()
-    
-    # Mesajı bir kez normalize et (Hız için)
-    msg_lower = msg.lower()
-    msg_upper = msg.upper()
-    
-    # Bağlam kelimeleri (Regex içinde kullanılacak)
-    context_pattern = r'(protocol|network|token|coin|dao|chain|finance|labs|swap)'
-
-    for symbol, full_name in coin_map.items():
-        # Kararlılık kontrolü: Stablecoin'leri ele
-        if check_is_stablecoin(symbol):
-            continue
-
-        # SENARYO 1: DANGEROUS TICKERS (THE, IS, A...)
-        # Kural: Sadece BÜYÜK HARF + Yanında bağlam kelimesi varsa.
-        if symbol in DANGEROUS_TICKERS:
-            # Örn: "THE Protocol" yakalar, "I went to the gym" yakalamaz.
-            strict_pattern = rf'\b{symbol}\b\s+{context_pattern}'
-            if re.search(strict_pattern, msg_upper, re.IGNORECASE):
-                detected_symbols.add(symbol)
-            continue
-
-        # SENARYO 2: AMBIGUOUS COINS (LINK, GAS, NEAR...)
-        if symbol in AMBIGUOUS_COINS:
-            # a) Sembol büyük yazılmışsa direkt kabul (Örn: "Buy LINK")
-            if rf'\b{symbol}\b' in msg_upper: # Regex'e bile gerek yok, düz string kontrolü daha hızlı
-                if re.search(rf'\b{symbol}\b', msg_upper):
-                    detected_symbols.add(symbol)
-                    continue
-            
-            # b) Tam isim geçiyorsa kabul (Örn: "chainlink is pumping")
-            special_name = AMBIGUOUS_COINS[symbol].lower()
-            if special_name in msg_lower:
-                detected_symbols.add(symbol)
-            continue
-
-        # SENARYO 3: NORMAL COINLER (BTC, ETH, SOL...)
-        # Kural: Ya sembol tam kelime olarak geçmeli YA DA tam isim geçmeli.
-        # Sembol kontrolü (Case-insensitive ama tam kelime: \b)
-        if re.search(rf'\b{symbol}\b', msg_upper):
-            detected_symbols.add(symbol)
-        
-        # Tam isim kontrolü
-        elif full_name and len(full_name) > 2:
-            if rf' {full_name} ' in f' {msg_lower} ': # Basit ama etkili boundary kontrolü
-                detected_symbols.add(symbol)
+    return get_coin_matcher(coin_map).find(msg)
+
+# --- TOPLU (PARALEL) TESPİT: Geçmiş mesaj madenciliği için ---
+_worker_matcher = None
+
+def _init_coin_worker(matcher):
+    """Her worker süreci matcher'ı başlangıçta BİR KEZ alır."""
+    global _worker_matcher
+    _worker_matcher = matcher
+
+def _find_coins_chunk(start, texts):
+    results = []
+    for offset, text in enumerate(texts):
+        if not text: continue
+        pairs = _worker_matcher.find(text)
+        if pairs:
+            results.append((start + offset, pairs))
+    return results
+
+def find_coins_batch(messages, coin_map=None, workers=None, chunk_size=500):
+    """
+    Mesajları parçalara bölüp process pool'a dağıtır.
+    Sonuçları (index, pairs) olarak akış halinde döndürür (sadece coin bulunanlar).
+    Sıra garantisi yok, index orijinal listedeki konumdur.
+    """
+    matcher = get_coin_matcher(coin_map)
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2  # Milyonlarca mesajı belleğe yığmamak için sınır
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_coin_worker, initargs=(matcher,)) as pool:
+        pending = set()
+        iterator = iter(messages)
+        start = 0
+        exhausted = False
+
+        while pending or not exhausted:
+            # Kuyruğu doldur
+            while not exhausted and len(pending) < max_pending:
+                chunk = list(islice(iterator, chunk_size))
+                if not chunk:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(_find_coins_chunk, start, chunk))
+                start += len(chunk)
+
+            if not pending:
+                break
 
-    # Sonuçları USDT pair formatına çevir
-    return [f"{s}USDT" for s in detected_symbols]
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
 
 def check_is_stablecoin(symbol):
     try:
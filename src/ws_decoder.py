@@ -0,0 +1,51 @@
+import json
+import sys
+
+try:
+    import orjson  # Varsa ~2x hızlı JSON çözümleme
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+KLINE = "kline"
+MINI_TICKERS = "miniTicker"
+
+# 'BTCUSDT' -> 'btcusdt' (interned). Her mesajda lower() + yeni string üretilmesin.
+_PAIRS = {}
+
+
+def intern_pair(symbol):
+    pair = _PAIRS.get(symbol)
+    if pair is None:
+        pair = _PAIRS[symbol] = sys.intern(symbol.lower())
+    return pair
+
+
+def decode_frame(msg):
+    """
+    Websocket mesajını çözer, sadece kullanılan alanları döndürür.
+    - KLINE:        (pair, close, open, high, low, quote_volume, is_closed, open_time_sec)
+    - MINI_TICKERS: [(pair, close, open, high, low, quote_volume, event_time_sec), ...]
+    Diğer mesajlar (abonelik cevapları vb.) için (None, None).
+    """
+    raw = loads(msg)
+    data = raw.get("data", raw) if type(raw) is dict else raw
+
+    if type(data) is dict:
+        if data.get("e") != "kline":
+            return None, None
+        k = data["k"]
+        return KLINE, (
+            intern_pair(data["s"]),
+            float(k["c"]), float(k["o"]), float(k["h"]), float(k["l"]), float(k["q"]),
+            k["x"], k["t"] / 1000,
+        )
+
+    # !miniTicker@arr -> Tüm piyasa tek mesajda
+    if type(data) is list and data and data[0].get("e") == "24hrMiniTicker":
+        return MINI_TICKERS, [
+            (intern_pair(t["s"]), float(t["c"]), float(t["o"]), float(t["h"]), float(t["l"]), float(t["q"]), t["E"] / 1000)
+            for t in data
+        ]
+
+    return None, None